@@ -0,0 +1,18 @@
+-- 为已有库创建预算告警表（新库由 init_wealth.sql 直接创建）
+USE wealth_app;
+
+CREATE TABLE IF NOT EXISTS budget_alerts (
+  alert_id        BIGINT PRIMARY KEY AUTO_INCREMENT,
+  budget_id       BIGINT NOT NULL,
+  user_id         BIGINT NOT NULL,
+  category_id     BIGINT NOT NULL,
+  period_start    DATE NOT NULL,
+  budget_amount   DECIMAL(12,2) NOT NULL,
+  alert_threshold DECIMAL(5,2)  NOT NULL,
+  spent_amount    DECIMAL(14,2) NOT NULL,
+  triggered_at    DATETIME DEFAULT CURRENT_TIMESTAMP,
+  acknowledged    BOOLEAN NOT NULL DEFAULT FALSE,
+  FOREIGN KEY (budget_id) REFERENCES budgets(budget_id) ON DELETE CASCADE,
+  UNIQUE KEY uniq_budget (budget_id),
+  INDEX idx_user_triggered (user_id, triggered_at)
+);
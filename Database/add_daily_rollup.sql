@@ -0,0 +1,19 @@
+-- 为已有库创建并回填每日分类汇总表（新库由 init_wealth.sql 直接创建）
+USE wealth_app;
+
+CREATE TABLE IF NOT EXISTS daily_category_rollup (
+  user_id      BIGINT NOT NULL,
+  category_id  BIGINT NOT NULL,
+  day          DATE   NOT NULL,
+  flow_type    ENUM('Income','Spending') NOT NULL,
+  total_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+  txn_count    INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, day, category_id, flow_type)
+);
+
+DELETE FROM daily_category_rollup;
+INSERT INTO daily_category_rollup
+  (user_id, category_id, day, flow_type, total_amount, txn_count)
+SELECT user_id, category_id, txn_date, flow_type, SUM(amount), COUNT(*)
+FROM transactions
+GROUP BY user_id, category_id, txn_date, flow_type;
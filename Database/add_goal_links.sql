@@ -0,0 +1,10 @@
+-- 为已有库的 goals 表增加关联账户 / 分类（新库由 init_wealth.sql 直接创建）
+USE wealth_app;
+
+ALTER TABLE goals
+  ADD COLUMN linked_account_id  BIGINT NULL AFTER is_active,
+  ADD COLUMN linked_category_id BIGINT NULL AFTER linked_account_id,
+  ADD FOREIGN KEY (linked_account_id) REFERENCES accounts(account_id),
+  ADD FOREIGN KEY (linked_category_id) REFERENCES categories(category_id),
+  ADD INDEX idx_linked_account (user_id, linked_account_id),
+  ADD INDEX idx_linked_category (user_id, linked_category_id);
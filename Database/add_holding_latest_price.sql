@@ -0,0 +1,16 @@
+-- 为已有库创建并回填持仓最新价格表（新库由 init_wealth.sql 直接创建）
+USE wealth_app;
+
+CREATE TABLE IF NOT EXISTS holding_latest_price (
+  holding_id  BIGINT PRIMARY KEY,
+  price_date  DATE   NOT NULL,
+  close_price DECIMAL(12,4) NOT NULL,
+  FOREIGN KEY (holding_id) REFERENCES holdings(holding_id)
+);
+
+DELETE FROM holding_latest_price;
+INSERT INTO holding_latest_price (holding_id, price_date, close_price)
+SELECT p.holding_id, p.price_date, p.close_price
+FROM holding_prices p
+JOIN (SELECT holding_id, MAX(price_date) AS price_date FROM holding_prices GROUP BY holding_id) latest
+  ON latest.holding_id = p.holding_id AND latest.price_date = p.price_date;
@@ -0,0 +1,19 @@
+-- 为已有库创建并回填月度分类汇总表（新库由 init_wealth.sql 直接创建）
+USE wealth_app;
+
+CREATE TABLE IF NOT EXISTS monthly_category_rollup (
+  user_id      BIGINT NOT NULL,
+  category_id  BIGINT NOT NULL,
+  month        DATE   NOT NULL,
+  flow_type    ENUM('Income','Spending') NOT NULL,
+  total_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+  txn_count    INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, month, category_id, flow_type)
+);
+
+DELETE FROM monthly_category_rollup;
+INSERT INTO monthly_category_rollup
+  (user_id, category_id, month, flow_type, total_amount, txn_count)
+SELECT user_id, category_id, DATE_FORMAT(txn_date, '%Y-%m-01'), flow_type, SUM(amount), COUNT(*)
+FROM transactions
+GROUP BY user_id, category_id, DATE_FORMAT(txn_date, '%Y-%m-01'), flow_type;
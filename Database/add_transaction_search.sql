@@ -0,0 +1,5 @@
+-- 为已有库补建交易全文索引（新库由 init_wealth.sql 直接创建）
+USE wealth_app;
+
+ALTER TABLE transactions
+  ADD FULLTEXT INDEX ft_txn_text (txn_name, merchant_name, description) WITH PARSER ngram;
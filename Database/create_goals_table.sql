@@ -11,11 +11,17 @@ CREATE TABLE IF NOT EXISTS goals (
   priority      ENUM('LOW','MEDIUM','HIGH') NOT NULL DEFAULT 'MEDIUM',
   goal_type     VARCHAR(50) NOT NULL,
   is_active     BOOLEAN NOT NULL DEFAULT TRUE,
+  linked_account_id  BIGINT NULL,   -- 关联账户：进度随该账户的交易自动更新
+  linked_category_id BIGINT NULL,   -- 关联储蓄分类：进度随该分类的交易自动更新
   created_at    DATETIME DEFAULT CURRENT_TIMESTAMP,
   updated_at    DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   FOREIGN KEY (user_id) REFERENCES users(user_id),
+  FOREIGN KEY (linked_account_id) REFERENCES accounts(account_id),
+  FOREIGN KEY (linked_category_id) REFERENCES categories(category_id),
   INDEX idx_user_active (user_id, is_active),
-  INDEX idx_deadline (deadline)
+  INDEX idx_deadline (deadline),
+  INDEX idx_linked_account (user_id, linked_account_id),
+  INDEX idx_linked_category (user_id, linked_category_id)
 );
 
 -- 插入一些测试数据
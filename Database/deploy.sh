@@ -62,6 +62,36 @@ with engine.begin() as conn:
         df.to_sql(table, conn, if_exists="append", index=False, chunksize=500)
         print(f"✅  {sheet} → {table} ({len(df)} 行)")
 
+    # 导入绕过了应用写路径，按交易重建月度 / 每日分类汇总
+    conn.execute(text("TRUNCATE TABLE monthly_category_rollup;"))
+    conn.execute(text("""
+        INSERT INTO monthly_category_rollup
+          (user_id, category_id, month, flow_type, total_amount, txn_count)
+        SELECT user_id, category_id, DATE_FORMAT(txn_date, '%Y-%m-01'), flow_type, SUM(amount), COUNT(*)
+        FROM transactions
+        GROUP BY user_id, category_id, DATE_FORMAT(txn_date, '%Y-%m-01'), flow_type
+    """))
+    conn.execute(text("TRUNCATE TABLE daily_category_rollup;"))
+    conn.execute(text("""
+        INSERT INTO daily_category_rollup
+          (user_id, category_id, day, flow_type, total_amount, txn_count)
+        SELECT user_id, category_id, txn_date, flow_type, SUM(amount), COUNT(*)
+        FROM transactions
+        GROUP BY user_id, category_id, txn_date, flow_type
+    """))
+    print("✅  monthly_category_rollup / daily_category_rollup 已重建")
+
+    # 同理按 holding_prices 重建持仓最新价格
+    conn.execute(text("TRUNCATE TABLE holding_latest_price;"))
+    conn.execute(text("""
+        INSERT INTO holding_latest_price (holding_id, price_date, close_price)
+        SELECT p.holding_id, p.price_date, p.close_price
+        FROM holding_prices p
+        JOIN (SELECT holding_id, MAX(price_date) AS price_date FROM holding_prices GROUP BY holding_id) latest
+          ON latest.holding_id = p.holding_id AND latest.price_date = p.price_date
+    """))
+    print("✅  holding_latest_price 已重建")
+
 print("🎉 全部数据导入成功！")
 PYCODE
 
@@ -8,6 +8,10 @@ USE wealth_app;
 SET FOREIGN_KEY_CHECKS = 0;
 
 /* --- DROP TABLES (子表→父表) --- */
+DROP TABLE IF EXISTS budget_alerts;
+DROP TABLE IF EXISTS monthly_category_rollup;
+DROP TABLE IF EXISTS daily_category_rollup;
+DROP TABLE IF EXISTS holding_latest_price;
 DROP TABLE IF EXISTS holding_prices;
 DROP TABLE IF EXISTS networth_daily;
 DROP TABLE IF EXISTS budgets;
@@ -61,7 +65,8 @@ CREATE TABLE transactions (
   FOREIGN KEY (user_id)     REFERENCES users(user_id),
   FOREIGN KEY (account_id)  REFERENCES accounts(account_id),
   FOREIGN KEY (category_id) REFERENCES categories(category_id),
-  INDEX idx_user_date (user_id, txn_date)
+  INDEX idx_user_date (user_id, txn_date),
+  FULLTEXT INDEX ft_txn_text (txn_name, merchant_name, description) WITH PARSER ngram
 );
 
 -- 4. 循环交易表
@@ -139,11 +144,64 @@ CREATE TABLE goals (
   priority      ENUM('LOW','MEDIUM','HIGH') NOT NULL DEFAULT 'MEDIUM',
   goal_type     VARCHAR(50) NOT NULL,
   is_active     BOOLEAN NOT NULL DEFAULT TRUE,
+  linked_account_id  BIGINT NULL,   -- 关联账户：进度随该账户的交易自动更新
+  linked_category_id BIGINT NULL,   -- 关联储蓄分类：进度随该分类的交易自动更新
   created_at    DATETIME DEFAULT CURRENT_TIMESTAMP,
   updated_at    DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   FOREIGN KEY (user_id) REFERENCES users(user_id),
+  FOREIGN KEY (linked_account_id) REFERENCES accounts(account_id),
+  FOREIGN KEY (linked_category_id) REFERENCES categories(category_id),
   INDEX idx_user_active (user_id, is_active),
-  INDEX idx_deadline (deadline)
+  INDEX idx_deadline (deadline),
+  INDEX idx_linked_account (user_id, linked_account_id),
+  INDEX idx_linked_category (user_id, linked_category_id)
+);
+
+-- 10. 月度分类汇总（由交易写路径增量维护，flask transactions rebuild-rollup 可全量重建）
+CREATE TABLE monthly_category_rollup (
+  user_id      BIGINT NOT NULL,
+  category_id  BIGINT NOT NULL,
+  month        DATE   NOT NULL,
+  flow_type    ENUM('Income','Spending') NOT NULL,
+  total_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+  txn_count    INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, month, category_id, flow_type)
+);
+
+-- 11. 每日分类汇总（与月度汇总同一写路径维护，供月底支出预测使用）
+CREATE TABLE daily_category_rollup (
+  user_id      BIGINT NOT NULL,
+  category_id  BIGINT NOT NULL,
+  day          DATE   NOT NULL,
+  flow_type    ENUM('Income','Spending') NOT NULL,
+  total_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+  txn_count    INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, day, category_id, flow_type)
+);
+
+-- 12. 预算告警（交易写入时按 budgets.alert_threshold 增量判定，每个预算最多一条）
+CREATE TABLE budget_alerts (
+  alert_id        BIGINT PRIMARY KEY AUTO_INCREMENT,
+  budget_id       BIGINT NOT NULL,
+  user_id         BIGINT NOT NULL,
+  category_id     BIGINT NOT NULL,
+  period_start    DATE NOT NULL,
+  budget_amount   DECIMAL(12,2) NOT NULL,
+  alert_threshold DECIMAL(5,2)  NOT NULL,
+  spent_amount    DECIMAL(14,2) NOT NULL,
+  triggered_at    DATETIME DEFAULT CURRENT_TIMESTAMP,
+  acknowledged    BOOLEAN NOT NULL DEFAULT FALSE,
+  FOREIGN KEY (budget_id) REFERENCES budgets(budget_id) ON DELETE CASCADE,
+  UNIQUE KEY uniq_budget (budget_id),
+  INDEX idx_user_triggered (user_id, triggered_at)
+);
+
+-- 13. 持仓最新价格（写入 holding_prices 时同步推进，flask investments rebuild-latest-prices 可全量重建）
+CREATE TABLE holding_latest_price (
+  holding_id  BIGINT PRIMARY KEY,
+  price_date  DATE   NOT NULL,
+  close_price DECIMAL(12,4) NOT NULL,
+  FOREIGN KEY (holding_id) REFERENCES holdings(holding_id)
 );
 
 -- 3) 重新开启外键检查
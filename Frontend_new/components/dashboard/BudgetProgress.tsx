@@ -33,7 +33,7 @@ export default function BudgetProgress() {
     data: dashboardData,
     loading,
     error,
-  } = useApi(dashboardApi.getDashboardData);
+  } = useApi(() => dashboardApi.getDashboardData(['budgetProgress']));
 
   if (loading) {
     return (
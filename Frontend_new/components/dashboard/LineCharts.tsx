@@ -10,29 +10,30 @@ import {
   CartesianGrid,
   Tooltip,
 } from "recharts";
+import { useApi } from "@/hooks/useApi";
+import { investmentsApi } from "@/lib/api";
 
-interface TotalAssetsTrendChartProps {
-  data: {
-    date: string;
-    value: number;
-  }[];
-}
-
-// Mock data for total assets trend
-const data = [
-  { date: "2024-01", value: 100000 },
-  { date: "2024-02", value: 110000 },
-  { date: "2024-03", value: 115000 },
-  { date: "2024-04", value: 120000 },
-  { date: "2024-05", value: 125000 },
-  { date: "2024-06", value: 130000 },
-];
+// Portfolio value sampled at each month end over the last two years
+const HISTORY_PARAMS = {
+  from: new Date(new Date().setFullYear(new Date().getFullYear() - 2))
+    .toISOString()
+    .slice(0, 10),
+  interval: "month" as const,
+};
 
 export default function LineCharts() {
+  const { data: history } = useApi(() =>
+    investmentsApi.getHistory(HISTORY_PARAMS)
+  );
+  const data = (history?.series ?? []).map((point) => ({
+    date: point.date.slice(0, 7),
+    value: point.value,
+  }));
+
   return (
     <div className="mb-6 bg-white rounded-xl shadow-sm border border-gray-100 p-6">
       <h4 className="text-lg font-semibold text-gray-900 mb-4">
-        Total Assets Trend
+        Portfolio Value Trend
       </h4>
       <div className="h-48">
         <ResponsiveContainer width="100%" height="100%">
@@ -43,7 +44,7 @@ export default function LineCharts() {
             <Tooltip
               formatter={(value: number) => [
                 `¥${value.toLocaleString()}`,
-                "Total Assets",
+                "Portfolio Value",
               ]}
               labelFormatter={(label) => `${label}`}
             />
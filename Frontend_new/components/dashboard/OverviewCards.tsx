@@ -13,7 +13,7 @@ import { dashboardApi } from "@/lib/api";
 import type { DashboardData } from "@/types";
 
 export default function OverviewCards() {
-  const { data: dashboardData, loading, error } = useApi(dashboardApi.getDashboardData);
+  const { data: dashboardData, loading, error } = useApi(() => dashboardApi.getDashboardData(['balance', 'monthly']));
 
   if (loading) {
     return (
@@ -50,7 +50,7 @@ export default function RecentTransactions() {
     data: dashboardData,
     loading,
     error,
-  } = useApi(dashboardApi.getDashboardData);
+  } = useApi(() => dashboardApi.getDashboardData(['recentTransactions']));
 
   if (loading) {
     return (
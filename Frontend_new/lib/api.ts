@@ -35,8 +35,18 @@ async function apiCall<T>(endpoint: string, options?: RequestInit): Promise<T> {
 }
 
 // Dashboard API
+// Sections can be requested individually so widgets only trigger the queries they render
+export type DashboardSection =
+  | 'balance'
+  | 'monthly'
+  | 'budgetProgress'
+  | 'recentTransactions'
+  | 'upcomingBills'
+  | 'investmentSummary';
+
 export const dashboardApi = {
-  getDashboardData: () => apiCall<DashboardData>('/dashboard'),
+  getDashboardData: (sections?: DashboardSection[]) =>
+    apiCall<DashboardData>(sections?.length ? `/dashboard?sections=${sections.join(',')}` : '/dashboard'),
 };
 
 // Budget API
@@ -57,6 +67,7 @@ export const transactionsApi = {
     type?: string;
     startDate?: string;
     endDate?: string;
+    q?: string;
   }) => {
     const searchParams = new URLSearchParams();
     if (params) {
@@ -71,6 +82,8 @@ export const transactionsApi = {
     return apiCall<any>(endpoint);
   },
   
+  getCalendar: (month: string) => apiCall<any>(`/transactions/calendar?month=${month}`),
+
   createTransaction: (data: any) => apiCall<any>('/transactions', {
     method: 'POST',
     body: JSON.stringify(data),
@@ -88,7 +101,7 @@ export const transactionsApi = {
 
 // Goals API
 export const goalsApi = {
-  getGoals: () => apiCall<{
+  getGoals: (projection = false) => apiCall<{
     goals: Array<{
       id: string;
       userId: string;
@@ -99,9 +112,16 @@ export const goalsApi = {
       priority: string;
       type: string;
       isActive: boolean;
+      linkedAccountId: number | null;
+      linkedCategoryId: number | null;
       percentage: number;
       remainingAmount: number;
       daysRemaining: number;
+      projection?: {
+        probability: number | null;
+        medianAmount: number | null;
+        monthsRemaining: number;
+      };
     }>;
     statistics: {
       totalGoals: number;
@@ -109,8 +129,9 @@ export const goalsApi = {
       totalTargetAmount: number;
       totalCurrentAmount: number;
       averageProgress: number;
+      monthlySavings?: { months: number; mean: number | null; std: number | null };
     };
-  }>('/goals'),
+  }>(projection ? '/goals?projection=true' : '/goals'),
   
   createGoal: (data: {
     name: string;
@@ -118,6 +139,8 @@ export const goalsApi = {
     deadline: string;
     priority: string;
     type: string;
+    linkedAccountId?: number;
+    linkedCategoryId?: number;
   }) => apiCall<any>('/goals', {
     method: 'POST',
     body: JSON.stringify(data),
@@ -130,14 +153,63 @@ export const goalsApi = {
     body: JSON.stringify(data),
   }),
   
+  linkGoal: (id: string, data: {
+    accountId?: number | null;
+    categoryId?: number | null;
+  }) => apiCall<any>(`/goals/${id}/link`, {
+    method: 'PUT',
+    body: JSON.stringify(data),
+  }),
+  
   deleteGoal: (id: string) => apiCall<any>(`/goals/${id}`, {
     method: 'DELETE',
   }),
 };
 
 // Investments API
+export interface InvestmentHistoryPoint {
+  date: string;
+  value: number;
+  return: number;
+  cumulativeReturn: number;
+}
+
 export const investmentsApi = {
   getInvestments: () => apiCall<any>('/investments'),
+  getHistory: (params?: { from?: string; to?: string; interval?: 'day' | 'week' | 'month' }) => {
+    const searchParams = new URLSearchParams();
+    if (params) {
+      Object.entries(params).forEach(([key, value]) => {
+        if (value !== undefined) {
+          searchParams.append(key, value);
+        }
+      });
+    }
+    const query = searchParams.toString();
+    return apiCall<{
+      from: string;
+      to: string;
+      interval: string;
+      invested: number;
+      series: InvestmentHistoryPoint[];
+    }>(`/investments/history${query ? `?${query}` : ''}`);
+  },
+  getRisk: (params?: { from?: string; to?: string }) => {
+    const searchParams = new URLSearchParams();
+    if (params?.from) searchParams.append('from', params.from);
+    if (params?.to) searchParams.append('to', params.to);
+    const query = searchParams.toString();
+    return apiCall<any>(`/investments/risk${query ? `?${query}` : ''}`);
+  },
+  getRebalance: (params?: { targetVolatility?: number; samples?: number; from?: string; to?: string }) => {
+    const searchParams = new URLSearchParams();
+    if (params?.targetVolatility !== undefined) searchParams.append('targetVolatility', String(params.targetVolatility));
+    if (params?.samples !== undefined) searchParams.append('samples', String(params.samples));
+    if (params?.from) searchParams.append('from', params.from);
+    if (params?.to) searchParams.append('to', params.to);
+    const query = searchParams.toString();
+    return apiCall<any>(`/investments/rebalance${query ? `?${query}` : ''}`);
+  },
   createInvestment: (data: {
     name: string;
     type: string;
@@ -155,7 +227,8 @@ export const investmentsApi = {
 
 // Tax API
 export const taxApi = {
-  getTaxData: () => apiCall<{
+  getTaxData: (year?: number) => apiCall<{
+    year: number;
     annualIncome: number;
     estimatedTaxRate: number;
     paidTax: number;
@@ -173,7 +246,31 @@ export const taxApi = {
       savings: number;
       priority: string;
     }>;
-  }>('/tax'),
+    rulesVersion: number | null;
+  }>(year !== undefined ? `/tax?year=${year}` : '/tax'),
+
+  getTaxHistory: (years = 5) => apiCall<{
+    years: Array<{ year: number; income: number; paidTax: number }>;
+  }>(`/tax/history?years=${years}`),
+
+  evaluateScenarios: (scenarios: Array<{
+    income: number;
+    deductions?: number;
+    contributions?: number;
+    bonus?: number;
+  }>) => apiCall<{
+    results: Array<{
+      taxableIncome: number;
+      tax: number;
+      bonusTax: number;
+      marginalRate: number;
+      effectiveRate: number;
+      afterTaxIncome: number;
+    }>;
+  }>('/tax/scenarios', {
+    method: 'POST',
+    body: JSON.stringify({ scenarios }),
+  }),
 };
 
 // News API
@@ -0,0 +1,76 @@
+# backend/modules/budget/alerts.py
+
+from sqlalchemy import text
+
+
+def evaluate(conn, keys):
+    """
+    在写入事务内重新判定受影响预算的告警状态。
+
+    keys 为本次写入改动过的 (user_id, category_id, month) 列表；已花金额直接读取
+    月度分类汇总表中维护好的累计值，不回查交易明细，因此代价只与写入涉及的预算数有关。
+
+    - 已花金额 ≥ 预算 × alert_threshold 且尚无告警：新增告警
+    - 仍超出阈值：刷新告警中的已花金额
+    - 回落到阈值以下：清除告警
+    """
+    keys = sorted(set(keys))
+    if not keys:
+        return
+
+    conditions, params = [], {}
+    for i, (uid, cid, month) in enumerate(keys):
+        conditions.append(f"(b.user_id = :u{i} AND b.category_id = :c{i} AND b.period_start = :m{i})")
+        params.update({f'u{i}': uid, f'c{i}': cid, f'm{i}': month})
+
+    rows = conn.execute(text(f"""
+        SELECT b.budget_id, b.user_id, b.category_id, b.period_start,
+               b.budget_amount, COALESCE(b.alert_threshold, 1.0) AS alert_threshold,
+               COALESCE(r.total_amount, 0) AS spent,
+               a.alert_id
+        FROM budgets b
+        LEFT JOIN monthly_category_rollup r
+          ON r.user_id = b.user_id
+         AND r.month = b.period_start
+         AND r.category_id = b.category_id
+         AND r.flow_type = 'Spending'
+        LEFT JOIN budget_alerts a ON a.budget_id = b.budget_id
+        WHERE {' OR '.join(conditions)}
+    """), params).mappings().all()
+
+    to_insert, to_update, to_clear = [], [], []
+    for row in rows:
+        budget_amount = float(row['budget_amount'])
+        threshold = float(row['alert_threshold'])
+        spent = float(row['spent'])
+        crossed = budget_amount > 0 and spent >= budget_amount * threshold
+
+        if crossed and row['alert_id'] is None:
+            to_insert.append({
+                'budget_id': row['budget_id'],
+                'user_id': row['user_id'],
+                'category_id': row['category_id'],
+                'period_start': row['period_start'],
+                'budget_amount': budget_amount,
+                'alert_threshold': threshold,
+                'spent_amount': spent
+            })
+        elif crossed:
+            to_update.append({'alert_id': row['alert_id'], 'spent_amount': spent, 'budget_amount': budget_amount})
+        elif row['alert_id'] is not None:
+            to_clear.append({'alert_id': row['alert_id']})
+
+    if to_insert:
+        conn.execute(text("""
+            INSERT INTO budget_alerts
+              (budget_id, user_id, category_id, period_start, budget_amount, alert_threshold, spent_amount)
+            VALUES
+              (:budget_id, :user_id, :category_id, :period_start, :budget_amount, :alert_threshold, :spent_amount)
+        """), to_insert)
+    if to_update:
+        conn.execute(text(
+            "UPDATE budget_alerts SET spent_amount = :spent_amount, budget_amount = :budget_amount"
+            " WHERE alert_id = :alert_id"
+        ), to_update)
+    if to_clear:
+        conn.execute(text("DELETE FROM budget_alerts WHERE alert_id = :alert_id"), to_clear)
@@ -1,57 +1,73 @@
 from flask import Blueprint, jsonify, request, current_app
 from sqlalchemy import text
 from datetime import date
-from calendar import monthrange
+
+from backend.modules.budget import alerts
+from backend.modules.budget.projection import project_month_end
+from backend.utils.cache import bump_user_version
+from backend.utils.categories import get_category_cache
+from backend.utils.db import upsert_sql
 
 bp = Blueprint('budget', __name__)
 
+MAX_HISTORY_MONTHS = 36  # 历史模式最多回看的月数
+
 @bp.route('', methods=['GET'])
 def get_budget():
     """
     GET /api/budget
     返回用户的预算设置和进度数据
+
+    传入 months=N（1~36）时额外返回最近 N 个月（含本月）的预算执行历史 history。
     """
     engine = current_app.config['DB_ENGINE']
     user_id = 1  # TODO: 从 token 或参数获取实际 user_id
 
-    # 计算本月第一天和最后一天
+    months = request.args.get('months')
+    if months is not None:
+        try:
+            months = int(months)
+        except ValueError:
+            months = 0
+        if not 1 <= months <= MAX_HISTORY_MONTHS:
+            return jsonify({
+                "success": False,
+                "error": f"months 需为 1~{MAX_HISTORY_MONTHS} 的整数"
+            }), 400
+
+    # 本月第一天（预算周期与汇总表月份均以此为键）
     first_day = date.today().replace(day=1)
-    _, days_in_month = monthrange(first_day.year, first_day.month)
-    last_day = first_day.replace(day=days_in_month)
 
     with engine.connect() as conn:
-        # 查询本月预算项目
+        # 本月预算及已花金额：一次关联月度分类汇总表，代价与分类数成正比
         budgets = conn.execute(text(
             """
-            SELECT b.budget_id, b.category_id, c.name AS category, b.budget_amount AS budgeted
+            SELECT b.budget_id, b.category_id, c.name AS category, b.budget_amount AS budgeted,
+                   COALESCE(r.total_amount, 0) AS spent
             FROM budgets b
             JOIN categories c ON b.category_id = c.category_id
+            LEFT JOIN monthly_category_rollup r
+              ON r.user_id = b.user_id
+             AND r.month = b.period_start
+             AND r.category_id = b.category_id
+             AND r.flow_type = 'Spending'
             WHERE b.user_id = :uid AND b.period_start = :first_day
             """
         ), {"uid": user_id, "first_day": first_day}).mappings().all()
 
+        # 月底支出预测（基于每日分类汇总，全部分类一次向量化计算）
+        projected = project_month_end(
+            conn, user_id, [row['category_id'] for row in budgets], date.today()
+        )
+
         total_budget = 0.0
         total_spent = 0.0
+        total_projected = 0.0
         categories_list = []
 
         for row in budgets:
             budgeted = float(row['budgeted'])
-            # 计算当月已花金额
-            spent = conn.execute(text(
-                """
-                SELECT COALESCE(SUM(amount),0)
-                FROM transactions
-                WHERE user_id = :uid
-                  AND category_id = :cid
-                  AND txn_date BETWEEN :first_day AND :last_day
-                """
-            ), {
-                "uid": user_id,
-                "cid": row['category_id'],
-                "first_day": first_day,
-                "last_day": last_day
-            }).scalar_one()
-            spent = float(spent)
+            spent = float(row['spent'])
 
             remaining = budgeted - spent
             pct = round((spent / budgeted * 100), 2) if budgeted else 0.0
@@ -61,73 +77,189 @@ def get_budget():
                 "budgeted": budgeted,
                 "spent": spent,
                 "percentage": pct,
-                "remaining": remaining
+                "remaining": remaining,
+                "projected": projected[row['category_id']]
             })
             total_budget += budgeted
             total_spent += spent
+            total_projected += projected[row['category_id']]
 
         total_remaining = total_budget - total_spent
         overall_pct = round((total_spent / total_budget * 100), 2) if total_budget else 0.0
 
-    return jsonify({
-        "success": True,
-        "data": {
+        data = {
             "monthlyBudget": round(total_budget, 2),
             "categories": categories_list,
             "totalSpent": round(total_spent, 2),
             "totalRemaining": round(total_remaining, 2),
-            "overallPercentage": overall_pct
-        },
+            "overallPercentage": overall_pct,
+            "projectedTotal": round(total_projected, 2)
+        }
+        if months:
+            data["history"] = get_budget_history(conn, user_id, first_day, months)
+
+    return jsonify({
+        "success": True,
+        "data": data,
         "message": "预算数据获取成功"
     })
 
 
+def shift_month(first_day, n):
+    """月份第一天向前（n<0）或向后平移 n 个月"""
+    index = first_day.year * 12 + first_day.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def get_budget_history(conn, user_id, first_day, months):
+    """
+    最近 months 个月的预算 vs 实际支出：按 period_start 区间一次扫描预算并关联月度汇总，
+    没有预算的月份也会以 0 值出现，按月份升序返回。
+    """
+    start = shift_month(first_day, -(months - 1))
+    rows = conn.execute(text(
+        """
+        SELECT b.period_start AS month, c.name AS category, b.budget_amount AS budgeted,
+               COALESCE(r.total_amount, 0) AS spent
+        FROM budgets b
+        JOIN categories c ON b.category_id = c.category_id
+        LEFT JOIN monthly_category_rollup r
+          ON r.user_id = b.user_id
+         AND r.month = b.period_start
+         AND r.category_id = b.category_id
+         AND r.flow_type = 'Spending'
+        WHERE b.user_id = :uid AND b.period_start >= :start AND b.period_start <= :first_day
+        ORDER BY b.period_start, c.name
+        """
+    ), {"uid": user_id, "start": start, "first_day": first_day}).mappings().all()
+
+    by_month = {shift_month(start, i).strftime('%Y-%m'): [] for i in range(months)}
+    for row in rows:
+        by_month[str(row['month'])[:7]].append({
+            "category": row['category'],
+            "budgeted": float(row['budgeted']),
+            "spent": float(row['spent'])
+        })
+
+    history = []
+    for month, categories in by_month.items():
+        budgeted = sum(c['budgeted'] for c in categories)
+        spent = sum(c['spent'] for c in categories)
+        history.append({
+            "month": month,
+            "budgeted": round(budgeted, 2),
+            "spent": round(spent, 2),
+            "percentage": round(spent / budgeted * 100, 2) if budgeted else 0.0,
+            "categories": categories
+        })
+    return history
+
+
 @bp.route('', methods=['PUT'])
 def update_budget():
     """
     PUT /api/budget
     更新用户的预算设置
+
+    依赖 budgets 的唯一键 uniq_user_cat_month，所有分类合并为一条 upsert
+    （MySQL: INSERT ... ON DUPLICATE KEY UPDATE，SQLite: ON CONFLICT）批量提交，
+    语句数与分类数无关。
     """
     engine = current_app.config['DB_ENGINE']
     user_id = 1  # TODO: 从 token 或参数获取实际 user_id
     payload = request.get_json()
     first_day = date.today().replace(day=1)
 
-    with engine.begin() as conn:
-        for item in payload.get('categories', []):
-            # 获取分类 ID
-            cid = conn.execute(text(
-                "SELECT category_id FROM categories WHERE name = :name"
-            ), {'name': item['category']}).scalar_one_or_none()
-            if not cid:
-                continue
-
-            # 更新已有预算
-            res = conn.execute(text(
-                "UPDATE budgets SET budget_amount = :amt"
-                " WHERE user_id = :uid"
-                " AND category_id = :cid"
-                " AND period_start = :first_day"
-            ), {
-                'amt': item['budgeted'],
-                'uid': user_id,
-                'cid': cid,
-                'first_day': first_day
-            })
-            # 如果未更新，插入新记录
-            if res.rowcount == 0:
-                conn.execute(text(
-                    "INSERT INTO budgets"
-                    " (user_id, category_id, period_start, budget_amount)"
-                    " VALUES (:uid, :cid, :first_day, :amt)"
-                ), {
-                    'uid': user_id,
-                    'cid': cid,
-                    'first_day': first_day,
-                    'amt': item['budgeted']
-                })
+    items = payload.get('categories', [])
+    cids = get_category_cache().ids_for(item['category'] for item in items)
+
+    # 未知分类跳过；同一分类出现多次时以最后一次为准
+    rows = {}
+    for item in items:
+        cid = cids.get(item['category'])
+        if cid:
+            rows[cid] = {
+                'user_id': user_id,
+                'category_id': cid,
+                'period_start': first_day,
+                'budget_amount': item['budgeted']
+            }
+
+    if rows:
+        with engine.begin() as conn:
+            conn.execute(text(upsert_sql(
+                conn.dialect.name, 'budgets',
+                ['user_id', 'category_id', 'period_start', 'budget_amount'],
+                ['user_id', 'category_id', 'period_start']
+            )), list(rows.values()))
+            # 预算金额变化可能跨越或解除告警阈值
+            alerts.evaluate(conn, [(user_id, cid, first_day) for cid in rows])
+        bump_user_version(user_id)
 
     return jsonify({
         "success": True,
         "message": "预算设置更新成功"
     })
+
+
+@bp.route('/alerts', methods=['GET'])
+def get_budget_alerts():
+    """
+    GET /api/budget/alerts
+    返回当前超出告警阈值的预算列表（由交易写入时增量判定，读取时不做任何计算）
+
+    默认只返回未确认的告警，includeAcknowledged=true 时返回全部。
+    """
+    engine = current_app.config['DB_ENGINE']
+    user_id = 1  # TODO: 从 token 或参数获取实际 user_id
+    include_ack = request.args.get('includeAcknowledged', 'false').lower() == 'true'
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"""
+            SELECT a.alert_id, c.name AS category, a.period_start, a.budget_amount,
+                   a.alert_threshold, a.spent_amount, a.triggered_at, a.acknowledged
+            FROM budget_alerts a
+            JOIN categories c ON a.category_id = c.category_id
+            WHERE a.user_id = :uid {'' if include_ack else 'AND a.acknowledged = 0'}
+            ORDER BY a.triggered_at DESC, a.alert_id DESC
+        """), {"uid": user_id}).mappings().all()
+
+    alerts_list = [
+        {
+            "id": row['alert_id'],
+            "category": row['category'],
+            "month": str(row['period_start'])[:7],
+            "budgeted": float(row['budget_amount']),
+            "threshold": float(row['alert_threshold']),
+            "spent": float(row['spent_amount']),
+            "percentage": round(float(row['spent_amount']) / float(row['budget_amount']) * 100, 2),
+            "triggeredAt": str(row['triggered_at']),
+            "acknowledged": bool(row['acknowledged'])
+        }
+        for row in rows
+    ]
+
+    return jsonify({
+        "success": True,
+        "data": {"alerts": alerts_list},
+        "message": "预算告警获取成功"
+    })
+
+
+@bp.route('/alerts/<int:alert_id>/ack', methods=['POST'])
+def acknowledge_budget_alert(alert_id):
+    """
+    POST /api/budget/alerts/:id/ack
+    确认（静默）一条预算告警；支出回落到阈值以下后告警会被自动清除
+    """
+    engine = current_app.config['DB_ENGINE']
+    user_id = 1  # TODO: 从 token 或参数获取实际 user_id
+
+    with engine.begin() as conn:
+        res = conn.execute(text(
+            "UPDATE budget_alerts SET acknowledged = 1 WHERE alert_id = :aid AND user_id = :uid"
+        ), {"aid": alert_id, "uid": user_id})
+
+    if res.rowcount == 0:
+        return jsonify({"success": False, "error": "告警不存在"}), 404
+    return jsonify({"success": True, "message": "预算告警已确认"})
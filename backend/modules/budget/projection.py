@@ -0,0 +1,76 @@
+# backend/modules/budget/projection.py
+
+from datetime import timedelta
+from calendar import monthrange
+
+import numpy as np
+from sqlalchemy import bindparam, text
+
+from backend.utils.db import as_date
+
+# 用于估计日均支出和星期季节性的回看天数（7 的整数倍，保证每个星期几样本数相同）
+LOOKBACK_DAYS = 56
+# 当月日均与历史日均的混合权重
+MTD_WEIGHT = 0.5
+
+
+def project_month_end(conn, user_id, category_ids, today):
+    """
+    预测各分类本月月底的支出总额，返回 {category_id: 预测金额}。
+
+    读取每日分类汇总表中 [回看起点, 今天] 的支出，一次性组装成 分类 × 天 矩阵后全部向量化计算：
+      - 本月已花（MTD）按行求和
+      - 日均支出 = 本月日均与过去 LOOKBACK_DAYS 天日均按 MTD_WEIGHT 混合（无历史时只用本月日均）
+      - 星期季节性 = 各星期几的日均 / 整体日均
+      - 预测 = MTD + 日均 × Σ(剩余每天对应星期几的季节系数)
+    """
+    category_ids = list(category_ids)
+    if not category_ids:
+        return {}
+
+    first_day = today.replace(day=1)
+    history_start = today - timedelta(days=LOOKBACK_DAYS)
+    start = min(first_day, history_start)
+    n_days = (today - start).days + 1
+
+    rows = conn.execute(
+        text("""
+            SELECT category_id, day, total_amount
+            FROM daily_category_rollup
+            WHERE user_id = :uid
+              AND flow_type = 'Spending'
+              AND day >= :start AND day <= :today
+              AND category_id IN :cids
+        """).bindparams(bindparam('cids', expanding=True)),
+        {'uid': user_id, 'start': start, 'today': today, 'cids': category_ids}
+    ).all()
+
+    index = {cid: i for i, cid in enumerate(category_ids)}
+    spend = np.zeros((len(category_ids), n_days))
+    if rows:
+        ci = np.fromiter((index[r[0]] for r in rows), dtype=np.intp, count=len(rows))
+        di = np.fromiter(((as_date(r[1]) - start).days for r in rows), dtype=np.intp, count=len(rows))
+        np.add.at(spend, (ci, di), np.fromiter((float(r[2]) for r in rows), dtype=float, count=len(rows)))
+
+    # 本月已花与本月日均
+    mtd = spend[:, (first_day - start).days:].sum(axis=1)
+    mtd_rate = mtd / today.day
+
+    # 过去 LOOKBACK_DAYS 个完整日（不含今天）
+    hist = spend[:, n_days - 1 - LOOKBACK_DAYS:n_days - 1]
+    hist_dow = (history_start.weekday() + np.arange(LOOKBACK_DAYS)) % 7
+    onehot = np.eye(7)[hist_dow]                              # 天 × 7
+    dow_mean = hist @ onehot / onehot.sum(axis=0)             # 分类 × 7
+    hist_mean = hist.mean(axis=1)                             # 分类
+    has_hist = hist_mean > 0
+    seasonality = np.where(has_hist[:, None], dow_mean / np.where(has_hist, hist_mean, 1)[:, None], 1.0)
+    rate = np.where(has_hist, MTD_WEIGHT * mtd_rate + (1 - MTD_WEIGHT) * hist_mean, mtd_rate)
+
+    # 剩余天数按星期几计数
+    days_in_month = monthrange(today.year, today.month)[1]
+    remaining_dow = (today.weekday() + 1 + np.arange(days_in_month - today.day)) % 7
+    remaining = np.bincount(remaining_dow, minlength=7)
+
+    projected = mtd + rate * (seasonality @ remaining)
+    return {cid: float(round(projected[i], 2)) for cid, i in index.items()}
+
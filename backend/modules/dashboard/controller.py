@@ -1,165 +1,246 @@
 # backend/modules/dashboard/controller.py
 
-from flask import Blueprint, jsonify, current_app
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from flask import Blueprint, jsonify, request, current_app
 from sqlalchemy import text
-from datetime import date
+from datetime import date, timedelta
+
+from backend.modules.investments.valuation import value_holdings
+from backend.utils.cache import get_cache, user_version
 
 bp = Blueprint('dashboard', __name__)
 
+_executor_lock = threading.Lock()
+
+
+def _balance(conn, user_id, today):
+    # 1) 总余额：所有账户 current_balance 之和
+    total_balance = conn.execute(
+        text("SELECT COALESCE(SUM(current_balance),0) FROM accounts WHERE user_id=:uid"),
+        {"uid": user_id}
+    ).scalar_one()
+    return {"totalBalance": float(total_balance)}
+
+
+def _monthly(conn, user_id, today):
+    # 2) 月度收入&支出：本月交易
+    first_day = today.replace(day=1)
+    monthly = conn.execute(text("""
+        SELECT
+          SUM(CASE WHEN t.flow_type='Income' THEN amount ELSE 0 END)   AS income,
+          SUM(CASE WHEN t.flow_type='Spending' THEN amount ELSE 0 END) AS expenses
+        FROM transactions t
+        WHERE t.user_id=:uid AND t.txn_date >= :first_day
+    """), {"uid": user_id, "first_day": first_day}).mappings().one()
+    monthly_income = float(monthly["income"] or 0)
+    monthly_expenses = float(monthly["expenses"] or 0)
+    return {
+        "monthlyIncome": monthly_income,
+        "monthlyExpenses": monthly_expenses,
+        "savingsRate": round(
+            (monthly_income - monthly_expenses) / monthly_income * 100, 2
+        ) if monthly_income else 0,
+    }
+
+
+def _budget_progress(conn, user_id, today):
+    # 3) 预算进度：每个预算的已花金额（读月度分类汇总表）
+    budgets = conn.execute(text("""
+        SELECT b.category_id, c.name AS category,
+               b.budget_amount AS budgeted,
+               COALESCE(r.total_amount,0) AS spent
+        FROM budgets b
+        JOIN categories c ON b.category_id=c.category_id
+        LEFT JOIN monthly_category_rollup r
+          ON r.user_id=b.user_id
+          AND r.month=b.period_start
+          AND r.category_id=b.category_id
+          AND r.flow_type='Spending'
+        WHERE b.user_id=:uid
+    """), {"uid": user_id}).mappings().all()
+    return {"budgetProgress": [
+        {
+            "category": row["category"],
+            "budgeted": float(row["budgeted"]),
+            "spent": float(row["spent"]),
+            "percentage": round(row["spent"]/row["budgeted"]*100, 2) if row["budgeted"] else 0
+        }
+        for row in budgets
+    ]}
+
+
+def _recent_transactions(conn, user_id, today):
+    # 4) 最近交易：最新 5 条
+    recent = conn.execute(text("""
+        SELECT
+          t.transaction_id AS id,
+          t.user_id,
+          -t.amount       AS amount,
+          t.flow_type     AS type,
+          c.name          AS category,
+          t.description,
+          t.txn_date      AS date
+        FROM transactions t
+        JOIN categories c ON t.category_id=c.category_id
+        WHERE t.user_id = :uid
+        ORDER BY t.txn_date DESC
+        LIMIT 5
+    """), {"uid": user_id}).mappings().all()
+    return {"recentTransactions": [
+        {**row, "tags": [], "location": None}
+        for row in recent
+    ]}
+
+
+def _upcoming_bills(conn, user_id, today):
+    # 5) 后续账单：本月剩余天数内的支出交易，按 (今天, 下月 1 日) 区间匹配
+    next_month = (today.replace(day=28) + timedelta(days=4)).replace(day=1)
+    upcoming = conn.execute(text("""
+        SELECT
+          t.transaction_id AS id,
+          t.user_id,
+          -t.amount       AS amount,
+          t.flow_type     AS type,
+          c.name          AS category,
+          t.description,
+          t.txn_date      AS date
+        FROM transactions t
+        JOIN categories c ON t.category_id=c.category_id
+        WHERE t.user_id = :uid
+          AND t.flow_type = 'Spending'
+          AND t.txn_date > :today
+          AND t.txn_date < :next_month
+        ORDER BY t.txn_date
+        LIMIT 5
+    """), {"uid": user_id, "today": today, "next_month": next_month}).mappings().all()
+    return {"upcomingBills": [dict(row) for row in upcoming]}
+
+
+def _investment_summary(conn, user_id, today):
+    # 6) 投资概览：各持仓按最新收盘价估值（无价格的持仓按成本价计，与投资页一致）
+    return {"investmentSummary": [
+        {
+            "id": h["holding_id"],
+            "name": h["product_name"],
+            "type": h["asset_type"],
+            "shares": h["quantity"],
+            "purchasePrice": h["unit_cost"],
+            "currentPrice": h["price"],
+            "totalInvested": h["cost_basis"],
+            "currentValue": h["market_value"],
+            "return": round(h["return_pct"], 2),
+            "riskLevel": "medium",
+            "expectedReturn": 8.5,
+            "purchaseDate": "2023-06-01T00:00:00Z"
+        }
+        for h in value_holdings(conn, user_id)
+    ]}
+
+
+# 仪表板各区块（?sections= 使用的名称 → 查询函数）：互不依赖，可串行也可并发执行
+SECTIONS = {
+    'balance': _balance,                        # totalBalance
+    'monthly': _monthly,                        # monthlyIncome / monthlyExpenses / savingsRate
+    'budgetProgress': _budget_progress,
+    'recentTransactions': _recent_transactions,
+    'upcomingBills': _upcoming_bills,
+    'investmentSummary': _investment_summary,
+}
+
+
+def _run_section(engine, section, user_id, today):
+    """在独立的连接上执行单个区块（连接取自引擎连接池）"""
+    with engine.connect() as conn:
+        return section(conn, user_id, today)
+
+
+def _get_executor():
+    """返回当前应用共用的有界线程池（DASHBOARD_MAX_WORKERS，默认与区块数相同）"""
+    executor = current_app.extensions.get('dashboard_executor')
+    if executor is None:
+        with _executor_lock:
+            executor = current_app.extensions.get('dashboard_executor')
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('DASHBOARD_MAX_WORKERS', len(SECTIONS)),
+                    thread_name_prefix='dashboard'
+                )
+                current_app.extensions['dashboard_executor'] = executor
+    return executor
+
+
+def build_dashboard(engine, user_id, today, executor=None, sections=None):
+    """
+    计算仪表板数据，sections 为要计算的区块名（默认全部），未选中的区块不会执行查询。
+
+    传入 executor 且区块多于一个时并发执行、每个区块使用自己的连接，总耗时接近最慢的
+    单条查询；否则在同一个连接上依次执行。
+    """
+    funcs = [SECTIONS[name] for name in (sections or SECTIONS)]
+    data = {}
+    if executor is None or len(funcs) == 1:
+        with engine.connect() as conn:
+            for section in funcs:
+                data.update(section(conn, user_id, today))
+    else:
+        futures = [
+            executor.submit(_run_section, engine, section, user_id, today)
+            for section in funcs
+        ]
+        # 按区块顺序合并；任一区块出错时在这里抛出
+        for future in futures:
+            data.update(future.result())
+    return data
+
+
 @bp.route('', methods=['GET'])
 def get_dashboard():
     """
     GET /api/dashboard
     返回仪表板概览数据
+
+    ?sections=balance,recentTransactions 只计算并返回指定区块（名称见 SECTIONS），
+    不传时返回全部。
+    默认并发查询各区块；配置 DASHBOARD_CONCURRENT = False 时退回串行。
+    组装好的响应按用户缓存 DASHBOARD_CACHE_TTL 秒（默认 60），键中带有用户数据版本号，
+    任何写接口递增版本号后旧结果不会再被返回；DASHBOARD_CACHE = False 关闭缓存。
     """
     engine = current_app.config['DB_ENGINE']
     user_id = 1  # TODO: 从 token 或参数中获取实际 user_id
+    today = date.today()
 
-    with engine.connect() as conn:
-        # 1) 总余额：所有账户 current_balance 之和
-        total_balance = conn.execute(
-            text("SELECT COALESCE(SUM(current_balance),0) FROM accounts WHERE user_id=:uid"),
-            {"uid": user_id}
-        ).scalar_one()
-
-        # 2) 月度收入&支出：本月交易
-        first_day = date.today().replace(day=1)
-        monthly = conn.execute(text("""
-            SELECT
-              SUM(CASE WHEN t.flow_type='Income' THEN amount ELSE 0 END)   AS income,
-              SUM(CASE WHEN t.flow_type='Spending' THEN amount ELSE 0 END) AS expenses
-            FROM transactions t
-            WHERE t.user_id=:uid AND t.txn_date >= :first_day
-        """), {"uid": user_id, "first_day": first_day}).mappings().one()
-        monthly_income = float(monthly["income"] or 0)
-        monthly_expenses = float(monthly["expenses"] or 0)
-
-        # 3) 预算进度：每个预算的已花金额
-        budgets = conn.execute(text("""
-            SELECT b.category_id, c.name AS category,
-                   b.budget_amount AS budgeted,
-                   COALESCE(SUM(t.amount),0) AS spent
-            FROM budgets b
-            JOIN categories c ON b.category_id=c.category_id
-            LEFT JOIN transactions t
-              ON t.category_id=b.category_id
-              AND t.user_id=b.user_id
-              AND t.txn_date BETWEEN b.period_start AND LAST_DAY(b.period_start)
-            WHERE b.user_id=:uid
-            GROUP BY b.budget_id
-        """), {"uid": user_id}).mappings().all()
-        budget_progress = [
-            {
-                "category": row["category"],
-                "budgeted": float(row["budgeted"]),
-                "spent": float(row["spent"]),
-                "percentage": round(row["spent"]/row["budgeted"]*100, 2) if row["budgeted"] else 0
-            }
-            for row in budgets
-        ]
-
-        # 4) 最近交易：最新 5 条
-        recent = conn.execute(text("""
-            SELECT
-              t.transaction_id AS id,
-              t.user_id,
-              -t.amount       AS amount,
-              t.flow_type     AS type,
-              c.name          AS category,
-              t.description,
-              t.txn_date      AS date
-            FROM transactions t
-            JOIN categories c ON t.category_id=c.category_id
-            WHERE t.user_id = :uid
-            ORDER BY t.txn_date DESC
-            LIMIT 5
-        """), {"uid": user_id}).mappings().all()
-        recent_transactions = [
-            {**row, "tags": [], "location": None}
-            for row in recent
-        ]
+    sections = None
+    if request.args.get('sections'):
+        sections = sorted({s.strip() for s in request.args['sections'].split(',') if s.strip()})
+        unknown = [s for s in sections if s not in SECTIONS]
+        if unknown or not sections:
+            return jsonify({
+                "success": False,
+                "error": f"未知区块: {', '.join(unknown)}，可选: {', '.join(SECTIONS)}"
+            }), 400
 
-        # 5) 后续账单：本月剩余天数内的支出交易
-        today = date.today()
-        upcoming = conn.execute(text("""
-            SELECT
-              t.transaction_id AS id,
-              t.user_id,
-              -t.amount       AS amount,
-              t.flow_type     AS type,
-              c.name          AS category,
-              t.description,
-              t.txn_date      AS date
-            FROM transactions t
-            JOIN categories c ON t.category_id=c.category_id
-            WHERE t.user_id = :uid
-              AND t.flow_type = 'Spending'
-              AND t.txn_date > :today
-              AND t.txn_date <= LAST_DAY(:today)
-            ORDER BY t.txn_date
-            LIMIT 5
-        """), {"uid": user_id, "today": today}).mappings().all()
-        upcoming_bills = [dict(row) for row in upcoming]
-
-
-        investments = conn.execute(text("""
-            SELECT
-                h.holding_id AS id,
-                h.user_id AS userId,
-                h.product_name AS name,
-                h.asset_type AS type,
-                h.quantity AS shares,
-                h.unit_cost AS purchasePrice,
-                hp.close_price AS currentPrice,
-                h.unit_cost * h.quantity AS totalInvested,
-                h.quantity * hp.close_price AS currentValue,
-                (hp.close_price - h.unit_cost) / h.unit_cost * 100 AS `return`,
-                'medium' AS riskLevel,
-                8.5 AS expectedReturn,
-                '2023-06-01T00:00:00Z' AS purchaseDate
-            FROM
-                holdings h
-            JOIN
-                holding_prices hp ON h.holding_id = hp.holding_id
-            WHERE
-                hp.price_date = (SELECT MAX(price_date) FROM holding_prices WHERE holding_id = h.holding_id)
-                AND h.user_id = :uid
-        """), {"uid": user_id}).mappings().all()
-       
-    investments_summary = [
-            {
-                "id": inv["id"],
-                "name": inv["name"],
-                "type": inv["type"],
-                "shares": float(inv["shares"]),
-                "purchasePrice": float(inv["purchasePrice"]),
-                "currentPrice": float(inv["currentPrice"]),
-                "totalInvested": float(inv["totalInvested"]),
-                "currentValue": float(inv["currentValue"]),
-                "return": round(inv["return"], 2),
-                "riskLevel": inv["riskLevel"],
-                "expectedReturn": float(inv["expectedReturn"]),
-                "purchaseDate": inv["purchaseDate"]
-            }
-            for inv in investments
-    ]
+    cache = get_cache() if current_app.config.get('DASHBOARD_CACHE', True) else None
+    if cache is not None:
+        # 版本号须在查询之前读取：计算期间发生的写入会让本次结果落在旧版本下
+        cache_key = (f"dashboard:{user_id}:v{user_version(user_id)}:{today.isoformat()}"
+                     f":{','.join(sections) if sections else 'all'}")
+        body = cache.get(cache_key)
+        if body is not None:
+            return current_app.response_class(body, mimetype='application/json')
 
+    executor = _get_executor() if current_app.config.get('DASHBOARD_CONCURRENT', True) else None
+    data = build_dashboard(engine, user_id, today, executor, sections)
+    if sections is None:
+        data["goalProgress"] = []  # 后续扩展
 
     # 汇总返回
-    return jsonify({
+    body = current_app.json.dumps({
         "success": True,
-        "data": {
-            "totalBalance": float(total_balance),
-            "monthlyIncome": monthly_income,
-            "monthlyExpenses": monthly_expenses,
-            "savingsRate": round(
-                (monthly_income - monthly_expenses) / monthly_income * 100, 2
-            ) if monthly_income else 0,
-            "budgetProgress": budget_progress,
-            "recentTransactions": recent_transactions,
-            "upcomingBills": upcoming_bills,
-            "investmentSummary": investments_summary,  # 后续扩展
-            "goalProgress": []        # 后续扩展
-        },
+        "data": data,
         "message": "仪表板数据获取成功"
     })
+    if cache is not None:
+        cache.set(cache_key, body, current_app.config.get('DASHBOARD_CACHE_TTL', 60))
+    return current_app.response_class(body, mimetype='application/json')
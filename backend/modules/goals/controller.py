@@ -1,20 +1,63 @@
 # backend/modules/goals/controller.py
 
 from flask import Blueprint, jsonify, request, current_app
+import click
 from sqlalchemy import text
 from datetime import date, datetime, timedelta
 
+from backend.modules.goals import progress as goal_progress
+from backend.modules.goals.projection import monthly_net_savings, simulate_goals
+from backend.utils.cache import bump_user_version, get_cache, user_version
+from backend.utils.categories import get_category_cache
+from backend.utils.db import as_date
+
 bp = Blueprint('goals', __name__)
 
+MAX_SIMULATION_PATHS = 100000  # 单次预测的模拟路径上限
+
 @bp.route('', methods=['GET'])
 def get_goals():
     """
-    GET /api/goals
+    GET /api/goals?projection=true&paths=5000
     获取用户的所有财务目标
+
+    projection=true 时按历史月度净储蓄做蒙特卡洛模拟，为每个目标附加截止日前达成的概率。
+    预测结果按用户数据版本号缓存（GOALS_PROJECTION_CACHE_TTL，默认 3600 秒），
+    交易或目标发生写入后自动重算。
     """
     engine = current_app.config['DB_ENGINE']
     user_id = 1  # TODO: 从 token 或参数获取实际 user_id
+    today = date.today()
+
+    if request.args.get('projection', '').lower() in ('1', 'true', 'yes'):
+        try:
+            paths = int(request.args.get('paths', current_app.config.get('GOALS_SIMULATION_PATHS', 5000)))
+        except ValueError:
+            paths = 0
+        if not 1 <= paths <= MAX_SIMULATION_PATHS:
+            return jsonify({
+                "success": False,
+                "error": f"paths 必须是 1 到 {MAX_SIMULATION_PATHS} 之间的整数"
+            }), 400
+
+        cache = get_cache()
+        cache_key = f"goals:projection:{user_id}:v{user_version(user_id)}:{today.isoformat()}:{paths}"
+        data = cache.get(cache_key)
+        if data is None:
+            data = _load_goals(engine, user_id, today, paths)
+            cache.set(cache_key, data, current_app.config.get('GOALS_PROJECTION_CACHE_TTL', 3600))
+    else:
+        data = _load_goals(engine, user_id, today)
 
+    return jsonify({
+        "success": True,
+        "data": data,
+        "message": "目标数据获取成功"
+    })
+
+
+def _load_goals(engine, user_id, today, paths=None):
+    """组装目标列表与统计信息；传入 paths 时附加达成概率预测"""
     with engine.connect() as conn:
         # 1) 获取所有目标
         goals_data = conn.execute(text("""
@@ -27,7 +70,9 @@ def get_goals():
                 g.deadline,
                 g.priority,
                 g.goal_type AS type,
-                g.is_active AS isActive
+                g.is_active AS isActive,
+                g.linked_account_id AS linkedAccountId,
+                g.linked_category_id AS linkedCategoryId
             FROM goals g
             WHERE g.user_id = :uid
             ORDER BY g.priority DESC, g.deadline ASC
@@ -41,7 +86,7 @@ def get_goals():
         for goal_data in goals_data:
             target_amount = float(goal_data['targetAmount'])
             current_amount = float(goal_data['currentAmount'])
-            deadline = goal_data['deadline']
+            deadline = as_date(goal_data['deadline'])
             
             # 计算进度百分比
             percentage = (current_amount / target_amount * 100) if target_amount > 0 else 0
@@ -50,7 +95,7 @@ def get_goals():
             remaining_amount = max(0, target_amount - current_amount)
             
             # 计算剩余天数
-            days_remaining = (deadline - date.today()).days if deadline else 0
+            days_remaining = (deadline - today).days if deadline else 0
             
             goal = {
                 "id": str(goal_data['id']),
@@ -62,6 +107,8 @@ def get_goals():
                 "priority": goal_data['priority'].lower(),
                 "type": goal_data['type'],
                 "isActive": bool(goal_data['isActive']),
+                "linkedAccountId": goal_data['linkedAccountId'],
+                "linkedCategoryId": goal_data['linkedCategoryId'],
                 "percentage": round(percentage, 1),
                 "remainingAmount": remaining_amount,
                 "daysRemaining": max(0, days_remaining)
@@ -84,14 +131,55 @@ def get_goals():
             "averageProgress": round(average_progress, 1)
         }
 
-    return jsonify({
-        "success": True,
-        "data": {
-            "goals": goals,
-            "statistics": statistics
-        },
-        "message": "目标数据获取成功"
-    })
+        if paths is not None:
+            savings = monthly_net_savings(conn, user_id, today)
+
+    if paths is not None:
+        # 固定以 user_id 为种子：缓存失效重算时概率不会无故跳动
+        projected = simulate_goals(
+            [dict(g, deadline=as_date(d['deadline'])) for g, d in zip(goals, goals_data)],
+            savings, today, paths=paths, seed=user_id
+        )
+        for goal, p in zip(goals, projected):
+            goal['projection'] = p
+        statistics['monthlySavings'] = {
+            "months": len(savings),
+            "mean": round(float(savings.mean()), 2) if len(savings) else None,
+            "std": round(float(savings.std()), 2) if len(savings) else None
+        }
+
+    return {
+        "goals": goals,
+        "statistics": statistics
+    }
+
+
+def _parse_link(data, account_key, category_key):
+    """
+    读取请求中的关联账户 / 分类 id，返回 (account_id, category_id, 错误信息)。
+    两者最多设置一个；都为空表示不关联（进度由客户端手动更新）。
+    """
+    try:
+        account_id = int(data[account_key]) if data.get(account_key) is not None else None
+        category_id = int(data[category_key]) if data.get(category_key) is not None else None
+    except (TypeError, ValueError):
+        return None, None, "关联账户或分类 id 格式错误"
+    if account_id is not None and category_id is not None:
+        return None, None, "目标只能关联一个账户或一个分类"
+    return account_id, category_id, None
+
+
+def _check_link(conn, user_id, account_id, category_id):
+    """校验关联对象存在且属于当前用户，返回错误信息或 None"""
+    if account_id is not None:
+        owned = conn.execute(text("""
+            SELECT 1 FROM accounts WHERE account_id = :aid AND user_id = :uid
+        """), {"aid": account_id, "uid": user_id}).first()
+        if not owned:
+            return f"账户不存在: {account_id}"
+    if category_id is not None and get_category_cache().name_for(category_id) is None:
+        return f"分类不存在: {category_id}"
+    return None
 
 
 @bp.route('', methods=['POST'])
@@ -114,6 +202,10 @@ def create_goal():
                 "error": f"缺少必需字段: {field}"
             }), 400
 
+    account_id, category_id, error = _parse_link(data, 'linkedAccountId', 'linkedCategoryId')
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+
     try:
         # 解析截止日期
         deadline_str = data['deadline']
@@ -122,23 +214,35 @@ def create_goal():
         deadline = datetime.fromisoformat(deadline_str).date()
 
         with engine.begin() as conn:
+            current = 0.0  # 未关联的新目标当前金额为0
+            if account_id is not None or category_id is not None:
+                error = _check_link(conn, user_id, account_id, category_id)
+                if error:
+                    return jsonify({"success": False, "error": error}), 400
+                # 关联目标的初始进度按历史交易一次性计算，之后随交易写入增量维护
+                current = goal_progress.linked_amount(conn, user_id, account_id, category_id)
+
             # 插入新目标
             result = conn.execute(text("""
                 INSERT INTO goals 
-                (user_id, goal_name, target_amount, current_amount, deadline, priority, goal_type, is_active)
-                VALUES (:uid, :name, :target, :current, :deadline, :priority, :type, :active)
+                (user_id, goal_name, target_amount, current_amount, deadline, priority, goal_type, is_active,
+                 linked_account_id, linked_category_id)
+                VALUES (:uid, :name, :target, :current, :deadline, :priority, :type, :active, :aid, :cid)
             """), {
                 'uid': user_id,
                 'name': data['name'],
                 'target': float(data['targetAmount']),
-                'current': 0.0,  # 新目标当前金额为0
+                'current': current,
                 'deadline': deadline,
                 'priority': data['priority'].upper(),
                 'type': data['type'],
-                'active': True
+                'active': True,
+                'aid': account_id,
+                'cid': category_id
             })
             
             goal_id = result.lastrowid
+        bump_user_version(user_id)
 
         return jsonify({
             "success": True,
@@ -189,10 +293,10 @@ def update_goal_progress(goal_id):
         with engine.begin() as conn:
             # 检查目标是否存在且属于当前用户
             goal = conn.execute(text("""
-                SELECT goal_id, target_amount 
+                SELECT goal_id, target_amount, linked_account_id, linked_category_id
                 FROM goals 
                 WHERE goal_id = :gid AND user_id = :uid
-            """), {"gid": goal_id, "uid": user_id}).fetchone()
+            """), {"gid": goal_id, "uid": user_id}).mappings().first()
             
             if not goal:
                 return jsonify({
@@ -200,6 +304,12 @@ def update_goal_progress(goal_id):
                     "error": "目标不存在或无权限访问"
                 }), 404
 
+            if goal['linked_account_id'] is not None or goal['linked_category_id'] is not None:
+                return jsonify({
+                    "success": False,
+                    "error": "目标已关联账户或分类，进度随交易自动更新"
+                }), 400
+
             target_amount = float(goal['target_amount'])
             
             # 检查当前金额是否超过目标金额
@@ -219,6 +329,7 @@ def update_goal_progress(goal_id):
                 'gid': goal_id,
                 'uid': user_id
             })
+        bump_user_version(user_id)
 
         return jsonify({
             "success": True,
@@ -242,6 +353,67 @@ def update_goal_progress(goal_id):
         }), 500
 
 
+@bp.route('/<int:goal_id>/link', methods=['PUT'])
+def link_goal(goal_id):
+    """
+    PUT /api/goals/:id/link
+    把目标关联到一个账户（accountId）或一个储蓄分类（categoryId），两者都为空则取消关联
+
+    关联时按历史交易一次性计算当前进度，此后交易的增删改在写事务内按增量更新
+    current_amount，不再需要客户端汇总；取消关联后保留当前金额，改为手动更新。
+    """
+    engine = current_app.config['DB_ENGINE']
+    user_id = 1  # TODO: 从 token 或参数获取实际 user_id
+
+    data = request.get_json() or {}
+    account_id, category_id, error = _parse_link(data, 'accountId', 'categoryId')
+    if error:
+        return jsonify({"success": False, "error": error}), 400
+
+    with engine.begin() as conn:
+        goal = conn.execute(text("""
+            SELECT goal_id, current_amount
+            FROM goals
+            WHERE goal_id = :gid AND user_id = :uid
+        """), {"gid": goal_id, "uid": user_id}).mappings().first()
+        if not goal:
+            return jsonify({
+                "success": False,
+                "error": "目标不存在或无权限访问"
+            }), 404
+
+        current_amount = float(goal['current_amount'])
+        if account_id is not None or category_id is not None:
+            error = _check_link(conn, user_id, account_id, category_id)
+            if error:
+                return jsonify({"success": False, "error": error}), 400
+            current_amount = goal_progress.linked_amount(conn, user_id, account_id, category_id)
+
+        conn.execute(text("""
+            UPDATE goals
+            SET linked_account_id = :aid, linked_category_id = :cid, current_amount = :current
+            WHERE goal_id = :gid AND user_id = :uid
+        """), {
+            'aid': account_id,
+            'cid': category_id,
+            'current': current_amount,
+            'gid': goal_id,
+            'uid': user_id
+        })
+    bump_user_version(user_id)
+
+    return jsonify({
+        "success": True,
+        "data": {
+            "id": goal_id,
+            "linkedAccountId": account_id,
+            "linkedCategoryId": category_id,
+            "currentAmount": round(current_amount, 2)
+        },
+        "message": "目标关联已更新"
+    })
+
+
 @bp.route('/<int:goal_id>', methods=['DELETE'])
 def delete_goal(goal_id):
     """
@@ -271,6 +443,7 @@ def delete_goal(goal_id):
                 DELETE FROM goals 
                 WHERE goal_id = :gid AND user_id = :uid
             """), {"gid": goal_id, "uid": user_id})
+        bump_user_version(user_id)
 
         return jsonify({
             "success": True,
@@ -281,4 +454,14 @@ def delete_goal(goal_id):
         return jsonify({
             "success": False,
             "error": f"删除目标失败: {str(e)}"
-        }), 500 
\ No newline at end of file
+        }), 500
+
+
+@bp.cli.command('rebuild-progress')
+@click.option('--user-id', type=int, default=None, help='只重算指定用户')
+def rebuild_progress_command(user_id):
+    """按 transactions 全量重算关联目标的进度：flask goals rebuild-progress"""
+    engine = current_app.config['DB_ENGINE']
+    with engine.begin() as conn:
+        rows = goal_progress.rebuild(conn, user_id=user_id)
+    click.echo(f"关联目标进度已重算：{rows} 个目标")
@@ -0,0 +1,81 @@
+# backend/modules/goals/progress.py
+
+from collections import defaultdict
+
+from sqlalchemy import text
+
+# 一笔交易对关联目标进度的贡献方向：
+#   - 关联账户：流入账户（Income）增加进度，流出（Spending）减少进度
+#   - 关联储蓄分类：记入该分类的支出（转入储蓄）增加进度，该分类下的收入（取出）减少进度
+ACCOUNT_SIGN = {'Income': 1, 'Spending': -1}
+CATEGORY_SIGN = {'Income': -1, 'Spending': 1}
+
+_LINK_COLUMNS = {
+    'account': ('linked_account_id', 'account_id', ACCOUNT_SIGN),
+    'category': ('linked_category_id', 'category_id', CATEGORY_SIGN),
+}
+
+
+def _signed_sum(sign):
+    return (f"COALESCE(SUM(CASE flow_type WHEN 'Income' THEN {sign['Income']} * amount "
+            f"ELSE {sign['Spending']} * amount END), 0)")
+
+
+def apply_changes(conn, removed=(), added=()):
+    """
+    把交易的增删改折算为关联目标 current_amount 的增量，并在调用方的事务内写入。
+
+    参数与 rollup.apply_changes 相同（交易行需含 account_id）。同一账户 / 分类的增量
+    先在内存中合并，每种关联再用一条 executemany UPDATE 累加，不回查交易历史。
+    """
+    for link, (goal_col, txn_col, sign) in _LINK_COLUMNS.items():
+        deltas = defaultdict(float)
+        for direction, rows in ((-1, removed), (1, added)):
+            for row in rows:
+                if row.get(txn_col) is None:
+                    continue
+                deltas[(row['user_id'], row[txn_col])] += direction * sign[row['flow_type']] * float(row['amount'])
+
+        params = [
+            {'uid': uid, 'link_id': link_id, 'delta': round(delta, 2)}
+            for (uid, link_id), delta in deltas.items()
+            if round(delta, 2)
+        ]
+        if params:
+            conn.execute(text(f"""
+                UPDATE goals
+                SET current_amount = current_amount + :delta
+                WHERE user_id = :uid AND {goal_col} = :link_id
+            """), params)
+
+
+def linked_amount(conn, user_id, account_id=None, category_id=None):
+    """建立关联时一次性计算的初始进度：该账户 / 分类全部历史交易的带符号合计"""
+    link = 'account' if account_id is not None else 'category'
+    _, txn_col, sign = _LINK_COLUMNS[link]
+    return float(conn.execute(text(f"""
+        SELECT {_signed_sum(sign)}
+        FROM transactions
+        WHERE user_id = :uid AND {txn_col} = :link_id
+    """), {
+        'uid': user_id,
+        'link_id': account_id if account_id is not None else category_id
+    }).scalar())
+
+
+def rebuild(conn, user_id=None):
+    """按 transactions 全量重算所有关联目标的进度（可只重算单个用户），用于数据修复"""
+    scope = 'AND goals.user_id = :uid' if user_id is not None else ''
+    params = {'uid': user_id} if user_id is not None else {}
+    updated = 0
+    for goal_col, txn_col, sign in _LINK_COLUMNS.values():
+        updated += conn.execute(text(f"""
+            UPDATE goals
+            SET current_amount = (
+                SELECT {_signed_sum(sign)}
+                FROM transactions t
+                WHERE t.user_id = goals.user_id AND t.{txn_col} = goals.{goal_col}
+            )
+            WHERE goals.{goal_col} IS NOT NULL {scope}
+        """), params).rowcount
+    return updated
@@ -0,0 +1,120 @@
+# backend/modules/goals/projection.py
+
+import numpy as np
+from sqlalchemy import text
+
+from backend.modules.transactions.rollup import MONTHLY_ROLLUP
+
+# 估计月度净储蓄分布所用的历史月数（只取已结束的完整月份）
+LOOKBACK_MONTHS = 24
+# 历史不足这么多个月时不做预测
+MIN_HISTORY_MONTHS = 3
+# 模拟的最长期限（月），更远的截止日期按此截断
+MAX_HORIZON_MONTHS = 600
+# 每批模拟的 路径 × 月 单元数上限，约 16 MB 的 float64 矩阵
+SIMULATION_CHUNK_CELLS = 2_000_000
+
+
+def _month_index(d):
+    return d.year * 12 + d.month - 1
+
+
+def _month_index_from_key(month):
+    """月度汇总表的 month 列（date 或 'YYYY-MM-01' 字符串）→ 月序号"""
+    text_value = str(month)
+    return int(text_value[:4]) * 12 + int(text_value[5:7]) - 1
+
+
+def monthly_net_savings(conn, user_id, today, months=LOOKBACK_MONTHS):
+    """
+    用户过去 `months` 个完整月份的月度净储蓄（收入 - 支出），按月份先后排列。
+
+    从月度分类汇总表读取，一条查询按月聚合；从用户第一笔记录所在月份开始计，
+    之后没有任何交易的月份记为 0。
+    """
+    current = _month_index(today)
+    start = current - months
+    rows = conn.execute(text(f"""
+        SELECT month,
+               SUM(CASE WHEN flow_type = 'Income' THEN total_amount ELSE -total_amount END) AS net
+        FROM {MONTHLY_ROLLUP}
+        WHERE user_id = :uid
+          AND month >= :start AND month < :current
+        GROUP BY month
+    """), {
+        'uid': user_id,
+        'start': f"{start // 12:04d}-{start % 12 + 1:02d}-01",
+        'current': today.replace(day=1).isoformat(),
+    }).all()
+
+    savings = np.zeros(months)
+    if not rows:
+        return savings[:0]
+    offset = np.array([_month_index_from_key(r[0]) - start for r in rows])
+    savings[offset] = [float(r[1]) for r in rows]
+    return savings[offset.min():]
+
+
+def simulate_goals(goals, savings, today, paths=5000, seed=None):
+    """
+    自助抽样（bootstrap）蒙特卡洛：估计每个目标在截止日前达到目标金额的概率。
+
+    每条路径逐月从历史月度净储蓄中有放回地抽样，所有目标共享同一份 路径 × 月 的
+    储蓄矩阵。矩阵按路径分批生成（每批不超过 SIMULATION_CHUNK_CELLS 个单元），
+    每批只保留各截止月的累计储蓄，内存占用与路径数 × 期限无关。每月储蓄按各目标
+    “所需月存额”（剩余金额 / 剩余月数）的比例分配给进行中的目标。
+
+    :param goals: dict 列表，含 targetAmount、currentAmount、deadline（date）、isActive
+    :param savings: monthly_net_savings 的结果
+    :return: 与 goals 对齐的列表，每项为 {probability, medianAmount, monthsRemaining}；
+             历史不足或目标未启用时 probability / medianAmount 为 None
+    """
+    n = len(goals)
+    if not n:
+        return []
+    target = np.array([g['targetAmount'] for g in goals], dtype=float)
+    current = np.array([g['currentAmount'] for g in goals], dtype=float)
+    active = np.array([bool(g['isActive']) and g['deadline'] is not None for g in goals])
+    months = np.array([
+        min(max(_month_index(g['deadline']) - _month_index(today), 0), MAX_HORIZON_MONTHS)
+        if g['deadline'] is not None else 0
+        for g in goals
+    ])
+    reached = current >= target
+    pending = active & ~reached & (months > 0)
+
+    result = [
+        {'probability': None, 'medianAmount': None, 'monthsRemaining': int(m)}
+        for m in months
+    ]
+    if len(savings) < MIN_HISTORY_MONTHS:
+        return result
+
+    # 已达成的目标为 1；截止日已到（本月内）仍未达成的为 0
+    probability = np.where(reached, 1.0, 0.0)
+    median = current.copy()
+
+    if pending.any():
+        need = np.where(pending, (target - current) / np.maximum(months, 1), 0.0)
+        share = need / need.sum()
+        horizon = int(months[pending].max())
+
+        # 只需各目标截止月的累计储蓄：去重后的截止月列，columns 把目标映射到列
+        deadlines, columns = np.unique(np.clip(months, 1, horizon) - 1, return_inverse=True)
+        at_deadline = np.empty((paths, len(deadlines)))
+        rng = np.random.default_rng(seed)
+        chunk = max(1, SIMULATION_CHUNK_CELLS // horizon)
+        for begin in range(0, paths, chunk):
+            end = min(begin + chunk, paths)
+            draws = rng.choice(savings, size=(end - begin, horizon))   # 本批路径 × 月
+            np.cumsum(draws, axis=1, out=draws)
+            at_deadline[begin:end] = draws[:, deadlines]
+        # 路径 × 目标（非进行中的目标随后被忽略）
+        amounts = current + share * at_deadline[:, columns]
+        probability = np.where(pending, (amounts >= target).mean(axis=0), probability)
+        median = np.where(pending, np.median(amounts, axis=0), median)
+
+    for i in np.flatnonzero(active):
+        result[i]['probability'] = round(float(probability[i]), 4)
+        result[i]['medianAmount'] = round(float(median[i]), 2)
+    return result
@@ -0,0 +1,255 @@
+# backend/modules/investments/analytics.py
+
+from datetime import date
+
+import numpy as np
+from sqlalchemy import text
+
+INTERVALS = ('day', 'week', 'month')
+
+
+def load_holdings(conn, user_id):
+    """Holding ids, quantities and unit costs of a user as aligned arrays"""
+    rows = conn.execute(text("""
+        SELECT holding_id, quantity, unit_cost
+        FROM holdings
+        WHERE user_id = :uid
+        ORDER BY holding_id
+    """), {"uid": user_id}).all()
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    quantities = np.array([float(r[1]) for r in rows], dtype=float)
+    unit_costs = np.array([float(r[2]) for r in rows], dtype=float)
+    return ids, quantities, unit_costs
+
+
+def load_price_matrix(conn, user_id, holding_ids, start, end):
+    """
+    Load daily closes of a user's holdings for [start, end] with one query and
+    return a (days x holdings) matrix, NaN where no close was recorded.
+
+    The last close before `start` of each holding is loaded as well (second
+    branch of the UNION) and placed on day 0, so forward-filling starts from
+    the price in effect on `start` rather than from nothing.
+    """
+    days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+    matrix = np.full((len(days), len(holding_ids)), np.nan)
+    if not len(holding_ids) or not len(days):
+        return days, matrix
+
+    rows = conn.execute(text("""
+        SELECT p.holding_id, p.price_date, p.close_price, 0 AS carried
+        FROM holding_prices p
+        JOIN holdings h ON h.holding_id = p.holding_id
+        WHERE h.user_id = :uid
+          AND p.price_date >= :start AND p.price_date <= :end
+        UNION ALL
+        SELECT p.holding_id, p.price_date, p.close_price, 1 AS carried
+        FROM holding_prices p
+        JOIN (
+            SELECT hp.holding_id, MAX(hp.price_date) AS price_date
+            FROM holding_prices hp
+            JOIN holdings h ON h.holding_id = hp.holding_id
+            WHERE h.user_id = :uid AND hp.price_date < :start
+            GROUP BY hp.holding_id
+        ) prev
+          ON prev.holding_id = p.holding_id
+         AND prev.price_date = p.price_date
+    """), {"uid": user_id, "start": start, "end": end}).all()
+    if not rows:
+        return days, matrix
+
+    # Column-wise conversion; datetime64 accepts both date objects (MySQL)
+    # and 'YYYY-MM-DD' strings (SQLite)
+    hid, day, close, carried = zip(*rows)
+    hid = np.array(hid, dtype=np.int64)
+    day = np.array(day, dtype='datetime64[D]')
+    close = np.array(close, dtype=float)
+    carried = np.array(carried, dtype=bool)
+
+    # Map holding ids to columns; ids are sorted so searchsorted is exact
+    col = np.searchsorted(holding_ids, hid)
+    row = np.where(carried, 0, (day - days[0]).astype(np.int64))
+    # Carried-over closes first, so a real close on `start` overwrites them
+    order = np.argsort(~carried, kind='stable')
+    matrix[row[order], col[order]] = close[order]
+    return days, matrix
+
+
+def forward_fill(matrix, fallback):
+    """
+    Forward-fill NaNs down each column; cells before the first observation
+    take the column's fallback value (unit cost, as in valuation.py).
+    """
+    n = matrix.shape[0]
+    observed = ~np.isnan(matrix)
+    idx = np.where(observed, np.arange(n)[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    filled = matrix[idx, np.arange(matrix.shape[1])]
+    seen = np.maximum.accumulate(observed, axis=0)
+    return np.where(seen, filled, fallback)
+
+
+def period_ends(days, interval):
+    """Index of the last day of every week (Mon-Sun) / month in `days`"""
+    if interval == 'day':
+        return np.arange(len(days))
+    if interval == 'week':
+        # 1970-01-01 was a Thursday; shift so weeks start on Monday
+        key = (days.astype(np.int64) + 3) // 7
+    else:
+        key = days.astype('datetime64[M]').astype(np.int64)
+    return np.flatnonzero(np.append(key[1:] != key[:-1], True))
+
+
+def portfolio_history(conn, user_id, start, end, interval='day'):
+    """
+    Daily portfolio value of a user between start and end, sampled at the end
+    of each interval, with per-period and cumulative returns (percent).
+    """
+    holding_ids, quantities, unit_costs = load_holdings(conn, user_id)
+    days, prices = load_price_matrix(conn, user_id, holding_ids, start, end)
+    prices = forward_fill(prices, unit_costs)
+
+    values = prices @ quantities
+    idx = period_ends(days, interval)
+    sampled_days, sampled = days[idx], values[idx]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        period_return = np.diff(sampled, prepend=sampled[:1]) / np.concatenate((sampled[:1], sampled[:-1])) * 100
+        cumulative = (sampled / sampled[:1] - 1) * 100 if len(sampled) else sampled
+    period_return = np.nan_to_num(period_return, nan=0.0, posinf=0.0, neginf=0.0)
+    cumulative = np.nan_to_num(cumulative, nan=0.0, posinf=0.0, neginf=0.0)
+
+    invested = float(quantities @ unit_costs)
+    return {
+        "invested": round(invested, 2),
+        "series": [
+            {
+                "date": str(d),
+                "value": round(float(v), 2),
+                "return": round(float(r), 4),
+                "cumulativeReturn": round(float(c), 4)
+            }
+            for d, v, r, c in zip(sampled_days, sampled, period_return, cumulative)
+        ]
+    }
+
+
+TRADING_DAYS = 252
+
+# Annualized volatility thresholds for the low / medium / high risk buckets
+RISK_LEVELS = ((0.10, 'low'), (0.25, 'medium'))
+
+
+def _risk_level(volatility):
+    if volatility is None:
+        return None
+    for limit, level in RISK_LEVELS:
+        if volatility < limit:
+            return level
+    return 'high'
+
+
+def _max_drawdown(series):
+    """Largest peak-to-trough decline of each column (fraction, <= 0)"""
+    peak = np.fmax.accumulate(series, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drawdown = np.nanmin(series / peak - 1, axis=0, initial=0.0)
+    return np.where(np.isnan(series).all(axis=0), np.nan, drawdown)
+
+
+def _pairwise_corr(returns):
+    """
+    Correlation matrix of the columns of `returns`, using for every pair only
+    the days on which both are defined (NaN elsewhere). All pairs are computed
+    at once from masked sums, without a Python loop over pairs.
+    """
+    mask = (~np.isnan(returns)).astype(float)
+    x = np.nan_to_num(returns)
+    n = mask.T @ mask
+    sx = x.T @ mask                      # sum of x_i over days where j is defined too
+    sxx = (x * x).T @ mask
+    sxy = x.T @ x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy / n - (sx / n) * (sx.T / n)
+        var_i = sxx / n - (sx / n) ** 2
+        corr = cov / np.sqrt(var_i * var_i.T)
+    np.fill_diagonal(corr, np.where(np.diag(n) > 1, 1.0, np.nan))
+    return np.clip(corr, -1.0, 1.0)
+
+
+def _nullable(values, digits=4):
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+def risk_metrics(conn, user_id, start, end, risk_free_rate=0.0):
+    """
+    Annualized volatility, annualized return, Sharpe ratio and max drawdown
+    for every holding and for the whole portfolio, plus the pairwise
+    correlation matrix of daily holding returns.
+
+    Only days on which at least one close was recorded count as trading days,
+    so weekends do not dilute the volatility. Before a holding's first close
+    its metrics are undefined (NaN) rather than computed from unit cost.
+    """
+    holding_ids, quantities, unit_costs = load_holdings(conn, user_id)
+    days, raw = load_price_matrix(conn, user_id, holding_ids, start, end)
+    trading = ~np.isnan(raw).all(axis=1)
+
+    prices = forward_fill(raw, np.nan)[trading]
+    values = forward_fill(raw, unit_costs)[trading] @ quantities
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = prices[1:] / prices[:-1] - 1
+        portfolio_returns = values[1:] / values[:-1] - 1
+
+    def summarize(r, series):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            count = np.sum(~np.isnan(r), axis=0)
+            mean = np.where(count > 0, np.nansum(r, axis=0) / np.maximum(count, 1), np.nan)
+            var = np.nansum((r - mean) ** 2, axis=0) / np.maximum(count - 1, 1)
+            vol = np.where(count > 1, np.sqrt(var * TRADING_DAYS), np.nan)
+            annual = mean * TRADING_DAYS
+            sharpe = np.where(vol > 0, (annual - risk_free_rate) / vol, np.nan)
+        return vol, annual, sharpe, _max_drawdown(series)
+
+    vol, annual, sharpe, drawdown = summarize(returns, prices)
+    p_vol, p_annual, p_sharpe, p_drawdown = summarize(portfolio_returns[:, None], values[:, None])
+
+    corr = _pairwise_corr(returns)
+    vol_list = _nullable(vol)
+    return {
+        "from": str(days[0]) if len(days) else None,
+        "to": str(days[-1]) if len(days) else None,
+        "tradingDays": int(trading.sum()),
+        "riskFreeRate": risk_free_rate,
+        "portfolio": {
+            "volatility": _nullable(p_vol)[0],
+            "annualReturn": _nullable(p_annual)[0],
+            "sharpe": _nullable(p_sharpe)[0],
+            "maxDrawdown": _nullable(p_drawdown)[0],
+            "riskLevel": _risk_level(_nullable(p_vol)[0]),
+        },
+        "holdings": [
+            {
+                "id": int(hid),
+                "volatility": v,
+                "annualReturn": a,
+                "sharpe": s,
+                "maxDrawdown": d,
+                "riskLevel": _risk_level(v),
+            }
+            for hid, v, a, s, d in zip(
+                holding_ids, vol_list, _nullable(annual), _nullable(sharpe), _nullable(drawdown)
+            )
+        ],
+        "correlation": {
+            "ids": [int(h) for h in holding_ids],
+            "matrix": [_nullable(row) for row in corr],
+        },
+    }
+
+
+def parse_date(value, default):
+    """Parse an optional YYYY-MM-DD query parameter"""
+    return date.fromisoformat(value[:10]) if value else default
@@ -1,11 +1,23 @@
 # backend/modules/investments/controller.py
 
 from flask import Blueprint, jsonify, request, current_app
+import click
 from sqlalchemy import text
-from datetime import datetime
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from backend.modules.investments import analytics, rebalance
+from backend.modules.investments.prices import ingest_prices
+from backend.modules.investments.valuation import rebuild_latest_prices, value_holdings
+from backend.utils.cache import bump_user_version, get_cache, user_version
+from backend.utils.ingest import detect_format
 
 bp = Blueprint('investments', __name__)
 
+MAX_HISTORY_DAYS = 3660  # ~10 years of daily points per request
+MAX_REBALANCE_SAMPLES = 500000  # random portfolios per rebalance request
+
 @bp.route('', methods=['GET'])
 def get_investments():
     """
@@ -16,21 +28,8 @@ def get_investments():
     user_id = 1  # TODO: Get actual user_id from token or parameters
 
     with engine.connect() as conn:
-        # 1) Get all investment holdings
-        holdings = conn.execute(text("""
-            SELECT 
-                h.holding_id AS id,
-                h.user_id AS userId,
-                h.product_name AS name,
-                h.asset_type AS type,
-                h.quantity AS shares,
-                h.unit_cost AS purchasePrice,
-                h.quantity * h.unit_cost AS amount,
-                h.quantity * h.unit_cost AS currentValue,
-                h.quantity * h.unit_cost AS purchaseValue
-            FROM holdings h
-            WHERE h.user_id = :uid
-        """), {"uid": user_id}).mappings().all()
+        # 1) Value all holdings at their latest price (single read, see valuation.py)
+        holdings = value_holdings(conn, user_id)
 
         portfolio = []
         total_invested = 0
@@ -38,48 +37,30 @@ def get_investments():
         total_gain = 0
 
         for holding in holdings:
-            # Get latest price (if available)
-            latest_price = conn.execute(text("""
-                SELECT close_price 
-                FROM holding_prices 
-                WHERE holding_id = :hid 
-                ORDER BY price_date DESC 
-                LIMIT 1
-            """), {"hid": holding['id']}).scalar_one_or_none()
-
-            purchase_price = float(holding['purchasePrice'])
-            current_price = float(latest_price) if latest_price else purchase_price
-            shares = float(holding['shares'])
-            
-            purchase_value = purchase_price * shares
-            current_value = current_price * shares
-            gain = current_value - purchase_value
-            return_pct = (gain / purchase_value * 100) if purchase_value > 0 else 0
-
             # Determine risk level based on asset type
-            risk_level = get_risk_level(holding['type'])
-            expected_return = get_expected_return(holding['type'])
+            risk_level = get_risk_level(holding['asset_type'])
+            expected_return = get_expected_return(holding['asset_type'])
 
             portfolio_item = {
-                "id": str(holding['id']),
-                "userId": str(holding['userId']),
-                "name": holding['name'],
-                "type": holding['type'].lower(),
-                "amount": float(holding['amount']),
-                "shares": shares,
-                "purchasePrice": purchase_price,
-                "currentPrice": current_price,
+                "id": str(holding['holding_id']),
+                "userId": str(holding['user_id']),
+                "name": holding['product_name'],
+                "type": holding['asset_type'].lower(),
+                "amount": holding['cost_basis'],
+                "shares": holding['quantity'],
+                "purchasePrice": holding['unit_cost'],
+                "currentPrice": holding['price'],
                 "purchaseDate": "2023-06-01T00:00:00Z",  # TODO: Get actual purchase date from database
                 "riskLevel": risk_level,
                 "expectedReturn": expected_return,
-                "return": round(return_pct, 1),
-                "currentValue": round(current_value, 2)
+                "return": round(holding['return_pct'], 1),
+                "currentValue": round(holding['market_value'], 2)
             }
             
             portfolio.append(portfolio_item)
-            total_invested += purchase_value
-            total_current_value += current_value
-            total_gain += gain
+            total_invested += holding['cost_basis']
+            total_current_value += holding['market_value']
+            total_gain += holding['gain']
 
         # 2) Calculate summary data
         total_return_pct = (total_gain / total_invested * 100) if total_invested > 0 else 0
@@ -148,6 +129,8 @@ def create_investment():
             # If there's a purchase date, it can be added to other fields
             # Simplified handling here, actual projects may need to extend table structure
 
+        bump_user_version(user_id)
+
         return jsonify({
             "success": True,
             "data": {
@@ -164,6 +147,236 @@ def create_investment():
         }), 500
 
 
+def _parse_range():
+    """Read ?from=&to= (default: the last 365 days); returns (start, end, error response)"""
+    try:
+        end = analytics.parse_date(request.args.get('to'), date.today())
+        start = analytics.parse_date(request.args.get('from'), end - timedelta(days=365))
+    except ValueError:
+        return None, None, (jsonify({"success": False, "error": "Invalid date, expected YYYY-MM-DD"}), 400)
+    if start > end:
+        return None, None, (jsonify({"success": False, "error": "'from' must not be after 'to'"}), 400)
+    if (end - start).days >= MAX_HISTORY_DAYS:
+        return None, None, (jsonify({
+            "success": False,
+            "error": f"Date range too large (max {MAX_HISTORY_DAYS} days)"
+        }), 400)
+    return start, end, None
+
+
+@bp.route('/history', methods=['GET'])
+def get_investment_history():
+    """
+    GET /api/investments/history?from=YYYY-MM-DD&to=YYYY-MM-DD&interval=day|week|month
+    Portfolio value and return series built from holding_prices
+
+    Defaults to the last 365 days at daily resolution. Prices are forward-filled
+    over days without a close (weekends, holidays).
+    """
+    engine = current_app.config['DB_ENGINE']
+    user_id = 1  # TODO: Get actual user_id from token or parameters
+
+    interval = request.args.get('interval', 'day')
+    if interval not in analytics.INTERVALS:
+        return jsonify({
+            "success": False,
+            "error": f"Invalid interval: {interval} (expected one of {', '.join(analytics.INTERVALS)})"
+        }), 400
+    start, end, error = _parse_range()
+    if error:
+        return error
+
+    with engine.connect() as conn:
+        history = analytics.portfolio_history(conn, user_id, start, end, interval)
+
+    return jsonify({
+        "success": True,
+        "data": {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "interval": interval,
+            **history
+        },
+        "message": "Investment history retrieved successfully"
+    })
+
+
+@bp.route('/risk', methods=['GET'])
+def get_investment_risk():
+    """
+    GET /api/investments/risk?from=YYYY-MM-DD&to=YYYY-MM-DD
+    Annualized volatility, return, Sharpe ratio and max drawdown per holding and
+    for the portfolio, plus the correlation matrix of daily holding returns
+
+    Results are cached per user, keyed by the user's data version and latest
+    price date, so they are only recomputed after holdings or prices change.
+    RISK_FREE_RATE (default 0.02) is used for the Sharpe ratio.
+    """
+    engine = current_app.config['DB_ENGINE']
+    user_id = 1  # TODO: Get actual user_id from token or parameters
+
+    start, end, error = _parse_range()
+    if error:
+        return error
+    risk_free_rate = float(current_app.config.get('RISK_FREE_RATE', 0.02))
+
+    cache = get_cache()
+    with engine.connect() as conn:
+        latest = conn.execute(text("""
+            SELECT MAX(lp.price_date)
+            FROM holdings h
+            JOIN holding_latest_price lp ON lp.holding_id = h.holding_id
+            WHERE h.user_id = :uid
+        """), {"uid": user_id}).scalar()
+        cache_key = (f"investments:risk:{user_id}:v{user_version(user_id)}:{latest}"
+                     f":{start.isoformat()}:{end.isoformat()}:{risk_free_rate}")
+        metrics = cache.get(cache_key)
+        if metrics is None:
+            metrics = analytics.risk_metrics(conn, user_id, start, end, risk_free_rate)
+            cache.set(cache_key, metrics, current_app.config.get('RISK_CACHE_TTL', 3600))
+
+    return jsonify({
+        "success": True,
+        "data": metrics,
+        "message": "Investment risk metrics retrieved successfully"
+    })
+
+
+@bp.route('/prices', methods=['POST'])
+def import_prices():
+    """
+    POST /api/investments/prices
+    Stream daily closes into holding_prices. The body is parsed line by line as
+    CSV (text/csv) or NDJSON (application/x-ndjson), or per ?format=csv|ndjson;
+    each record has holding_id or product_code, date and close.
+
+    Quotes are upserted on (holding_id, price_date) in batches of ?chunkSize
+    rows (default PRICE_INGEST_CHUNK_SIZE = 5000) and holding_latest_price is
+    advanced in the same transaction. History is never deleted.
+    """
+    engine = current_app.config['DB_ENGINE']
+
+    fmt = detect_format(request.mimetype, request.args.get('format'))
+    if fmt is None:
+        return jsonify({
+            "success": False,
+            "error": "Only text/csv or application/x-ndjson request bodies are supported"
+        }), 415
+
+    try:
+        chunk_size = int(request.args.get('chunkSize', current_app.config.get('PRICE_INGEST_CHUNK_SIZE', 5000)))
+    except ValueError:
+        return jsonify({"success": False, "error": "chunkSize must be an integer"}), 400
+    result = ingest_prices(engine, request.stream, fmt, chunk_size)
+    for uid in result.pop('users'):
+        bump_user_version(uid)
+
+    return jsonify({
+        "success": True,
+        "data": result,
+        "message": "Prices imported successfully"
+    })
+
+
+@bp.route('/rebalance', methods=['GET'])
+def get_rebalance_plan():
+    """
+    GET /api/investments/rebalance?targetVolatility=0.15&samples=20000&from=&to=
+    Monte Carlo efficient frontier and the trades that move the portfolio onto it
+
+    Expected returns and covariance are estimated from daily holding_prices
+    returns over the window (default: the last 365 days). Random long-only
+    portfolios are simulated in batched NumPy on a process pool
+    (REBALANCE_WORKERS) so request threads are not blocked on the CPU.
+    The target is the highest-return frontier portfolio whose volatility does
+    not exceed targetVolatility (default: the current portfolio's volatility).
+    """
+    engine = current_app.config['DB_ENGINE']
+    user_id = 1  # TODO: Get actual user_id from token or parameters
+
+    start, end, error = _parse_range()
+    if error:
+        return error
+    try:
+        samples = int(request.args.get('samples', current_app.config.get('REBALANCE_SAMPLES', 20000)))
+        target_volatility = request.args.get('targetVolatility')
+        target_volatility = float(target_volatility) if target_volatility is not None else None
+        seed = int(request.args['seed']) if 'seed' in request.args else None
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid numeric parameter"}), 400
+    if not 1 <= samples <= MAX_REBALANCE_SAMPLES:
+        return jsonify({
+            "success": False,
+            "error": f"samples must be between 1 and {MAX_REBALANCE_SAMPLES}"
+        }), 400
+
+    with engine.connect() as conn:
+        holding_ids, mu, cov, trading_days = rebalance.estimate_moments(conn, user_id, start, end)
+        holdings = {h['holding_id']: h for h in value_holdings(conn, user_id)}
+    if mu is None:
+        return jsonify({
+            "success": False,
+            "error": "Not enough price history to estimate returns (need 3+ trading days)"
+        }), 400
+
+    # Current allocation of the holdings that can be estimated
+    current_values = np.array([holdings[int(hid)]['market_value'] for hid in holding_ids])
+    prices = np.array([holdings[int(hid)]['price'] for hid in holding_ids])
+    total_value = float(current_values.sum())
+    current_w = current_values / total_value if total_value > 0 else np.full(len(holding_ids), 1 / len(holding_ids))
+    current_ret = float(current_w @ mu)
+    current_vol = float(np.sqrt(max(current_w @ cov @ current_w, 0)))
+    if target_volatility is None:
+        target_volatility = current_vol
+
+    frontier_ret, frontier_vol, frontier_w = rebalance.efficient_frontier(
+        mu, cov, samples, seed, candidates=current_w[None, :], target_volatility=target_volatility
+    )
+    best = rebalance.pick_target(frontier_ret, frontier_vol, target_volatility)
+    target_w = frontier_w[best]
+    trade_values = target_w * total_value - current_values
+
+    return jsonify({
+        "success": True,
+        "data": {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "tradingDays": trading_days,
+            "samples": samples,
+            "current": {
+                "expectedReturn": round(current_ret, 4),
+                "volatility": round(current_vol, 4),
+            },
+            "target": {
+                "requestedVolatility": round(target_volatility, 4),
+                "expectedReturn": round(float(frontier_ret[best]), 4),
+                "volatility": round(float(frontier_vol[best]), 4),
+            },
+            "frontier": [
+                {"volatility": round(float(v), 4), "expectedReturn": round(float(r), 4)}
+                for r, v in zip(frontier_ret, frontier_vol)
+            ],
+            "trades": [
+                {
+                    "id": int(hid),
+                    "name": holdings[int(hid)]['product_name'],
+                    "currentWeight": round(float(cw), 4),
+                    "targetWeight": round(float(tw), 4),
+                    "currentValue": round(float(cv), 2),
+                    "targetValue": round(float(tw * total_value), 2),
+                    "tradeValue": round(float(tv), 2),
+                    "tradeShares": round(float(tv / p), 4) if p else 0,
+                    "action": "buy" if tv > 0.005 else "sell" if tv < -0.005 else "hold"
+                }
+                for hid, cw, tw, cv, tv, p in zip(
+                    holding_ids, current_w, target_w, current_values, trade_values, prices
+                )
+            ]
+        },
+        "message": "Rebalance plan computed successfully"
+    })
+
+
 def get_risk_level(asset_type):
     """Determine risk level based on asset type"""
     risk_levels = {
@@ -223,4 +436,35 @@ def calculate_asset_allocation(portfolio, total_value):
     # Sort by amount in descending order
     asset_allocation.sort(key=lambda x: x['amount'], reverse=True)
     
-    return asset_allocation 
\ No newline at end of file
+    return asset_allocation 
+
+
+@bp.cli.command('rebuild-latest-prices')
+@click.option('--user-id', type=int, default=None, help='Only rebuild holdings of this user')
+def rebuild_latest_prices_command(user_id):
+    """Recompute holding_latest_price from holding_prices: flask investments rebuild-latest-prices"""
+    engine = current_app.config['DB_ENGINE']
+    with engine.begin() as conn:
+        rows = rebuild_latest_prices(conn, user_id=user_id)
+    click.echo(f"holding_latest_price rebuilt: {rows} rows")
+
+
+@bp.cli.command('import-prices')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default=None,
+              help='Input format (default: from the file extension)')
+@click.option('--chunk-size', type=int, default=None, help='Rows per upsert batch')
+def import_prices_command(path, fmt, chunk_size):
+    """Upsert daily closes from a CSV / NDJSON file: flask investments import-prices FILE"""
+    engine = current_app.config['DB_ENGINE']
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    chunk_size = chunk_size or current_app.config.get('PRICE_INGEST_CHUNK_SIZE', 5000)
+    with open(path, 'rb') as stream:
+        result = ingest_prices(engine, stream, fmt, chunk_size)
+    for uid in result.pop('users'):
+        bump_user_version(uid)
+
+    click.echo(f"Prices imported: {result['upserted']} upserted, {result['failed']} failed "
+               f"in {result['elapsedMs']} ms")
+    for error in result['errors']:
+        click.echo(f"  row {error['row']}: {error['error']}")
@@ -0,0 +1,131 @@
+# backend/modules/investments/prices.py
+
+from datetime import datetime
+import time
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from backend.modules.investments.valuation import record_prices
+from backend.utils.ingest import chunked, iter_records, text_field
+
+MAX_PRICE_CHUNK_SIZE = 20000  # upper bound for one upsert batch
+MAX_REPORTED_ERRORS = 100     # per-row errors returned to the caller
+
+
+def normalize_quote(record):
+    """
+    Validate one quote record: holding_id or product_code, date, close.
+    Returns (holding_id, product_code, date, close); raises ValueError.
+    """
+    holding_id = record.get('holding_id')
+    # feeds often send fund / ETF codes as JSON numbers (510300)
+    product_code = text_field(record.get('product_code')) or None
+    if holding_id in (None, '') and product_code is None:
+        raise ValueError("Missing required field: holding_id or product_code")
+    if holding_id not in (None, ''):
+        try:
+            holding_id = int(holding_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid holding_id: {holding_id}")
+    else:
+        holding_id = None
+
+    price_date = text_field(record.get('date'))[:10]
+    try:
+        datetime.strptime(price_date, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"Invalid date: {record.get('date')}")
+
+    try:
+        close = float(record.get('close'))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid close: {record.get('close')}")
+    if not close > 0:
+        raise ValueError(f"Invalid close: {record.get('close')}")
+    return holding_id, product_code, price_date, close
+
+
+_RESOLVE_HOLDINGS = text("""
+    SELECT holding_id, user_id, product_code
+    FROM holdings
+    WHERE holding_id IN :ids OR product_code IN :codes
+""").bindparams(bindparam('ids', expanding=True), bindparam('codes', expanding=True))
+
+
+def ingest_prices(engine, stream, fmt, chunk_size=5000):
+    """
+    Stream CSV / NDJSON quotes from a binary stream into holding_prices.
+
+    Each chunk is resolved with one holdings query (a product_code fans out to
+    every holding with that code), then upserted on (holding_id, price_date)
+    together with holding_latest_price in one transaction. Existing history
+    is never deleted. Returns a summary dict including the ids of the users
+    whose holdings were priced, for cache invalidation by the caller.
+    """
+    chunk_size = max(1, min(int(chunk_size), MAX_PRICE_CHUNK_SIZE))
+    upserted = failed = 0
+    errors = []
+    users = set()
+
+    def record_error(row_no, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'row': row_no, 'error': message})
+
+    started = time.perf_counter()
+    for chunk in chunked(iter_records(stream, fmt), chunk_size):
+        pending = []
+        for row_no, record, error in chunk:
+            if error:
+                record_error(row_no, error)
+                continue
+            try:
+                pending.append((row_no, normalize_quote(record)))
+            except ValueError as e:
+                record_error(row_no, str(e))
+        if not pending:
+            continue
+
+        try:
+            with engine.begin() as conn:
+                holdings = conn.execute(_RESOLVE_HOLDINGS, {
+                    'ids': sorted({q[0] for _, q in pending if q[0] is not None}),
+                    'codes': sorted({q[1] for _, q in pending if q[0] is None}),
+                }).all()
+                owner = {hid: uid for hid, uid, _ in holdings}
+                by_code = {}
+                for hid, _, code in holdings:
+                    by_code.setdefault(code, []).append(hid)
+
+                batch, rejected = [], []
+                for row_no, (holding_id, code, price_date, close) in pending:
+                    targets = [holding_id] if holding_id is not None else by_code.get(code, [])
+                    targets = [hid for hid in targets if hid in owner]
+                    if not targets:
+                        rejected.append((row_no, f"Unknown holding: {holding_id if holding_id is not None else code}"))
+                        continue
+                    batch.extend(
+                        {'holding_id': hid, 'price_date': price_date, 'close_price': close}
+                        for hid in targets
+                    )
+                record_prices(conn, batch)
+            for row_no, message in rejected:
+                record_error(row_no, message)
+            upserted += len(batch)
+            users.update(owner[p['holding_id']] for p in batch)
+        except SQLAlchemyError as e:
+            # The whole chunk is rolled back; report its rows and move on
+            for row_no, _ in pending:
+                record_error(row_no, f"Write failed: {e.__class__.__name__}")
+
+    elapsed = time.perf_counter() - started
+    return {
+        'upserted': upserted,
+        'failed': failed,
+        'errors': errors,
+        'elapsedMs': round(elapsed * 1000, 1),
+        'rowsPerSecond': round(upserted / elapsed) if elapsed > 0 else upserted,
+        'users': sorted(users),
+    }
@@ -0,0 +1,152 @@
+# backend/modules/investments/rebalance.py
+
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+
+from backend.modules.investments import analytics
+
+FRONTIER_BINS = 50       # volatility buckets the frontier is resolved to
+SIMULATION_BATCH = 4096  # portfolios drawn per NumPy batch (bounds memory)
+
+_pool_lock = threading.Lock()
+
+
+def estimate_moments(conn, user_id, start, end):
+    """
+    Annualized expected returns and covariance of daily holding returns over
+    [start, end], from the same forward-filled price matrix as analytics.py.
+    Holdings with fewer than two closes in the window cannot be estimated and
+    are left out. Returns (holding_ids, mu, cov, trading_days) for the rest;
+    mu / cov are None when fewer than three trading days are available.
+    """
+    holding_ids, _, _ = analytics.load_holdings(conn, user_id)
+    days, raw = analytics.load_price_matrix(conn, user_id, holding_ids, start, end)
+    usable = (~np.isnan(raw)).sum(axis=0) >= 2
+    holding_ids, raw = holding_ids[usable], raw[:, usable]
+    trading = ~np.isnan(raw).all(axis=1)
+    prices = analytics.forward_fill(raw, np.nan)[trading]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.nan_to_num(prices[1:] / prices[:-1] - 1)
+    if not len(holding_ids) or len(returns) < 2:
+        return holding_ids, None, None, int(trading.sum())
+    mu = returns.mean(axis=0) * analytics.TRADING_DAYS
+    cov = np.atleast_2d(np.cov(returns, rowvar=False)) * analytics.TRADING_DAYS
+    return holding_ids, mu, cov, int(trading.sum())
+
+
+def _keep_best(w, mu, cov, edges, best):
+    """Fold the portfolios `w` into the per-bucket winners `best` (updated in place)"""
+    best_ret, best_vol, best_w = best
+    bins = len(edges) - 1
+    ret = w @ mu
+    vol = np.sqrt(np.maximum(np.sum((w @ cov) * w, axis=1), 0))
+    # Buckets are (edge_i, edge_i+1], so a portfolio exactly at an edge counts below it
+    bucket = np.clip(np.searchsorted(edges, vol, side='left') - 1, 0, bins - 1)
+
+    # Best portfolio per bucket in this batch: sort by (bucket, return) and
+    # take the last row of every bucket group
+    order = np.lexsort((ret, bucket))
+    last = order[np.flatnonzero(np.append(bucket[order][1:] != bucket[order][:-1], True))]
+    idx = last[ret[last] > best_ret[bucket[last]]]
+    best_ret[bucket[idx]] = ret[idx]
+    best_vol[bucket[idx]] = vol[idx]
+    best_w[bucket[idx]] = w[idx]
+
+
+def simulate_batch(mu, cov, samples, seed, edges):
+    """
+    Draw `samples` random long-only portfolios (uniform on the simplex) and keep,
+    for every volatility bucket delimited by `edges`, the one with the highest
+    expected return. Runs in worker processes, so it only takes plain arrays.
+    Returns (best_return, best_volatility, best_weights) per bucket.
+    """
+    rng = np.random.default_rng(seed)
+    bins, k = len(edges) - 1, len(mu)
+    best = (np.full(bins, -np.inf), np.full(bins, np.nan), np.zeros((bins, k)))
+    for offset in range(0, samples, SIMULATION_BATCH):
+        w = rng.dirichlet(np.ones(k), size=min(SIMULATION_BATCH, samples - offset))
+        _keep_best(w, mu, cov, edges, best)
+    return best
+
+
+def _merge(results):
+    best_ret, best_vol, best_w = results[0]
+    for ret, vol, w in results[1:]:
+        better = ret > best_ret
+        best_ret = np.where(better, ret, best_ret)
+        best_vol = np.where(better, vol, best_vol)
+        best_w = np.where(better[:, None], w, best_w)
+    return best_ret, best_vol, best_w
+
+
+def _get_pool():
+    """
+    Per-app process pool (REBALANCE_WORKERS, default CPU count; 0 runs inline).
+    Uses the 'spawn' start method so workers never inherit the server's
+    threads or open database connections.
+    """
+    workers = current_app.config.get('REBALANCE_WORKERS', os.cpu_count() or 1)
+    if not workers:
+        return None, 1
+    pool = current_app.extensions.get('rebalance_pool')
+    if pool is None:
+        with _pool_lock:
+            pool = current_app.extensions.get('rebalance_pool')
+            if pool is None:
+                pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                current_app.extensions['rebalance_pool'] = pool
+    return pool, workers
+
+
+def efficient_frontier(mu, cov, samples, seed=None, candidates=None, target_volatility=None):
+    """
+    Monte Carlo efficient frontier: the simulation is split into one task per
+    worker process, each with an independent random stream, and the per-bucket
+    winners are merged. `candidates` (e.g. the current allocation) are always
+    considered as well. `target_volatility` is made a bucket edge so the best
+    portfolio at or below the target is kept. Returns (returns, volatilities,
+    weights) of the frontier points, sorted by volatility.
+    """
+    # A long-only portfolio is never more volatile than its most volatile asset
+    edges = np.linspace(0, float(np.sqrt(np.max(np.diag(cov)))) * 1.0001 + 1e-12, FRONTIER_BINS + 1)
+    if target_volatility is not None:
+        edges = np.union1d(edges, [target_volatility])
+    pool, workers = _get_pool()
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    shares = [samples // workers + (i < samples % workers) for i in range(workers)]
+
+    if pool is None:
+        results = [simulate_batch(mu, cov, shares[0], seeds[0], edges)]
+    else:
+        futures = [
+            pool.submit(simulate_batch, mu, cov, n, s, edges)
+            for n, s in zip(shares, seeds) if n
+        ]
+        results = [f.result() for f in futures]
+
+    best_ret, best_vol, best_w = _merge(results)
+    # Single-asset corners are almost never drawn from the simplex; add them explicitly
+    extra = np.eye(len(mu)) if candidates is None else np.vstack([np.eye(len(mu)), candidates])
+    _keep_best(extra, mu, cov, edges, (best_ret, best_vol, best_w))
+    found = np.isfinite(best_ret)
+    ret, vol, w = best_ret[found], best_vol[found], best_w[found]
+
+    # Keep only the upper envelope: each point must beat every less risky one
+    order = np.argsort(vol)
+    ret, vol, w = ret[order], vol[order], w[order]
+    efficient = ret > np.concatenate(([-np.inf], np.maximum.accumulate(ret)[:-1]))
+    return ret[efficient], vol[efficient], w[efficient]
+
+
+def pick_target(frontier_ret, frontier_vol, target_volatility):
+    """Highest-return frontier point within the target risk (least risky one if none is)"""
+    within = np.flatnonzero(frontier_vol <= target_volatility)
+    return int(within[np.argmax(frontier_ret[within])]) if len(within) else int(np.argmin(frontier_vol))
@@ -0,0 +1,137 @@
+# backend/modules/investments/valuation.py
+
+from sqlalchemy import text
+
+LATEST_PRICE_TABLE = 'holding_latest_price'
+
+# Conditional upsert that only moves the latest price forward in time, so
+# prices arriving out of order (backfills) never overwrite a newer quote.
+# MySQL evaluates the assignments left to right: close_price must be decided
+# before price_date is advanced.
+_ADVANCE_LATEST_SQL = {
+    'mysql': f"""
+        INSERT INTO {LATEST_PRICE_TABLE} (holding_id, price_date, close_price)
+        VALUES (:holding_id, :price_date, :close_price)
+        ON DUPLICATE KEY UPDATE
+          close_price = IF(VALUES(price_date) >= price_date, VALUES(close_price), close_price),
+          price_date  = GREATEST(price_date, VALUES(price_date))
+    """,
+    'sqlite': f"""
+        INSERT INTO {LATEST_PRICE_TABLE} (holding_id, price_date, close_price)
+        VALUES (:holding_id, :price_date, :close_price)
+        ON CONFLICT (holding_id) DO UPDATE SET
+          price_date  = excluded.price_date,
+          close_price = excluded.close_price
+        WHERE excluded.price_date >= {LATEST_PRICE_TABLE}.price_date
+    """,
+}
+_ADVANCE_LATEST_SQL['postgresql'] = _ADVANCE_LATEST_SQL['sqlite']
+
+_UPSERT_PRICE_SQL = {
+    'mysql': """
+        INSERT INTO holding_prices (holding_id, price_date, close_price)
+        VALUES (:holding_id, :price_date, :close_price)
+        ON DUPLICATE KEY UPDATE close_price = VALUES(close_price)
+    """,
+    'sqlite': """
+        INSERT INTO holding_prices (holding_id, price_date, close_price)
+        VALUES (:holding_id, :price_date, :close_price)
+        ON CONFLICT (holding_id, price_date) DO UPDATE SET close_price = excluded.close_price
+    """,
+}
+_UPSERT_PRICE_SQL['postgresql'] = _UPSERT_PRICE_SQL['sqlite']
+
+
+def record_prices(conn, prices):
+    """
+    Write daily closing prices and keep holding_latest_price in step, inside
+    the caller's transaction.
+
+    :param prices: iterable of dicts with holding_id, price_date, close_price
+    """
+    prices = list(prices)
+    if not prices:
+        return 0
+    dialect = conn.dialect.name
+    conn.execute(text(_UPSERT_PRICE_SQL[dialect]), prices)
+
+    # Only the newest quote of each holding in this batch can advance the latest price
+    newest = {}
+    for p in prices:
+        current = newest.get(p['holding_id'])
+        if current is None or str(p['price_date']) >= str(current['price_date']):
+            newest[p['holding_id']] = p
+    conn.execute(text(_ADVANCE_LATEST_SQL[dialect]), list(newest.values()))
+    return len(prices)
+
+
+def rebuild_latest_prices(conn, user_id=None):
+    """Recompute holding_latest_price from holding_prices (initial backfill / repair)"""
+    params = {'uid': user_id} if user_id is not None else {}
+    scope = ('WHERE holding_id IN (SELECT holding_id FROM holdings WHERE user_id = :uid)'
+             if user_id is not None else '')
+
+    conn.execute(text(f"DELETE FROM {LATEST_PRICE_TABLE} {scope}"), params)
+    result = conn.execute(text(f"""
+        INSERT INTO {LATEST_PRICE_TABLE} (holding_id, price_date, close_price)
+        SELECT p.holding_id, p.price_date, p.close_price
+        FROM holding_prices p
+        JOIN (
+            SELECT holding_id, MAX(price_date) AS price_date
+            FROM holding_prices
+            {scope}
+            GROUP BY holding_id
+        ) latest
+          ON latest.holding_id = p.holding_id
+         AND latest.price_date = p.price_date
+    """), params)
+    return result.rowcount
+
+
+def value_holdings(conn, user_id):
+    """
+    Value every holding of a user at its latest known price with a single read.
+
+    Holdings without any price are valued at unit cost (priced = False), so
+    they are still counted in totals.
+    """
+    rows = conn.execute(text(f"""
+        SELECT
+            h.holding_id,
+            h.user_id,
+            h.product_name,
+            h.asset_type,
+            h.quantity,
+            h.unit_cost,
+            lp.price_date,
+            lp.close_price
+        FROM holdings h
+        LEFT JOIN {LATEST_PRICE_TABLE} lp ON lp.holding_id = h.holding_id
+        WHERE h.user_id = :uid
+        ORDER BY h.holding_id
+    """), {"uid": user_id}).mappings().all()
+
+    holdings = []
+    for row in rows:
+        quantity = float(row['quantity'])
+        unit_cost = float(row['unit_cost'])
+        priced = row['close_price'] is not None
+        price = float(row['close_price']) if priced else unit_cost
+        cost_basis = unit_cost * quantity
+        market_value = price * quantity
+        holdings.append({
+            'holding_id': row['holding_id'],
+            'user_id': row['user_id'],
+            'product_name': row['product_name'],
+            'asset_type': row['asset_type'],
+            'quantity': quantity,
+            'unit_cost': unit_cost,
+            'price': price,
+            'price_date': row['price_date'],
+            'priced': priced,
+            'cost_basis': cost_basis,
+            'market_value': market_value,
+            'gain': market_value - cost_basis,
+            'return_pct': (price - unit_cost) / unit_cost * 100 if unit_cost else 0
+        })
+    return holdings
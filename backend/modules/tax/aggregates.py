@@ -0,0 +1,112 @@
+# backend/modules/tax/aggregates.py
+
+from datetime import date
+
+from flask import current_app
+from sqlalchemy import bindparam, text
+
+from backend.modules.transactions.rollup import MONTHLY_ROLLUP
+from backend.utils.cache import get_cache, user_version
+from backend.utils.categories import get_category_cache
+
+# 计为“已缴税款”的支出分类
+TAX_CATEGORY_NAMES = ('税务', '个人所得税', '企业所得税')
+
+_YEARLY_SQL = text(f"""
+    SELECT month,
+           COALESCE(SUM(CASE WHEN flow_type = 'Income' THEN total_amount ELSE 0 END), 0) AS income,
+           COALESCE(SUM(CASE WHEN flow_type = 'Spending' AND category_id IN :tax_ids
+                             THEN total_amount ELSE 0 END), 0) AS paid_tax
+    FROM {MONTHLY_ROLLUP}
+    WHERE user_id = :uid
+      AND month >= :start AND month < :end
+    GROUP BY month
+""").bindparams(bindparam('tax_ids', expanding=True))
+
+
+_CATEGORY_SQL = text(f"""
+    SELECT category_id, flow_type, COALESCE(SUM(total_amount), 0) AS total
+    FROM {MONTHLY_ROLLUP}
+    WHERE user_id = :uid
+      AND month >= :start AND month < :end
+    GROUP BY category_id, flow_type
+""")
+
+
+def tax_category_ids():
+    """税务分类的 id，经分类缓存解析，不必每次请求按中文名 JOIN categories"""
+    return sorted(get_category_cache().ids_for(TAX_CATEGORY_NAMES).values())
+
+
+def year_range(year):
+    """某一年的半开区间 [1 月 1 日, 次年 1 月 1 日)"""
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def load_yearly_totals(conn, user_id, first_year, last_year, tax_ids):
+    """
+    [first_year, last_year] 每年的收入与已缴税款，按年份升序返回
+    [{year, income, paidTax}]，没有数据的年份为 0。
+
+    只读月度分类汇总表，日期条件是可走索引的半开区间；一条查询按月聚合后在内存中
+    折算到年，不依赖各数据库的 YEAR() / 日期函数。
+    """
+    start, _ = year_range(first_year)
+    _, end = year_range(last_year)
+    rows = conn.execute(_YEARLY_SQL, {
+        'uid': user_id, 'start': start, 'end': end, 'tax_ids': list(tax_ids)
+    }).all()
+
+    totals = {year: [0.0, 0.0] for year in range(first_year, last_year + 1)}
+    for month, income, paid_tax in rows:
+        bucket = totals[int(str(month)[:4])]
+        bucket[0] += float(income)
+        bucket[1] += float(paid_tax)
+    return [
+        {'year': year, 'income': round(income, 2), 'paidTax': round(paid_tax, 2)}
+        for year, (income, paid_tax) in totals.items()
+    ]
+
+
+def yearly_totals(user_id, first_year, last_year):
+    """
+    load_yearly_totals 的缓存版本：按用户数据版本号缓存（TAX_CACHE_TTL，默认 3600 秒），
+    交易写入后自动失效。单年与多年历史共用这一结构。
+    """
+    cache = get_cache()
+    cache_key = f"tax:yearly:{user_id}:v{user_version(user_id)}:{first_year}:{last_year}"
+    totals = cache.get(cache_key)
+    if totals is None:
+        with current_app.config['DB_ENGINE'].connect() as conn:
+            totals = load_yearly_totals(conn, user_id, first_year, last_year, tax_category_ids())
+        cache.set(cache_key, totals, current_app.config.get('TAX_CACHE_TTL', 3600))
+    return totals
+
+
+def load_category_totals(conn, user_id, year):
+    """
+    某一年各分类的收入 / 支出合计：{'income': {分类名: 金额}, 'spending': {分类名: 金额}}。
+    同样只读月度分类汇总表的半开区间，分类名经分类缓存解析。
+    """
+    start, end = year_range(year)
+    categories = get_category_cache()
+    totals = {'income': {}, 'spending': {}}
+    for category_id, flow_type, total in conn.execute(
+        _CATEGORY_SQL, {'uid': user_id, 'start': start, 'end': end}
+    ):
+        name = categories.name_for(category_id) or str(category_id)
+        bucket = totals['income' if flow_type == 'Income' else 'spending']
+        bucket[name] = round(bucket.get(name, 0.0) + float(total), 2)
+    return totals
+
+
+def yearly_category_totals(user_id, year):
+    """load_category_totals 的缓存版本，与 yearly_totals 同样按用户数据版本号失效"""
+    cache = get_cache()
+    cache_key = f"tax:categories:{user_id}:v{user_version(user_id)}:{year}"
+    totals = cache.get(cache_key)
+    if totals is None:
+        with current_app.config['DB_ENGINE'].connect() as conn:
+            totals = load_category_totals(conn, user_id, year)
+        cache.set(cache_key, totals, current_app.config.get('TAX_CACHE_TTL', 3600))
+    return totals
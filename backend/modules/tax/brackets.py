@@ -0,0 +1,92 @@
+# backend/modules/tax/brackets.py
+
+from bisect import bisect_left
+
+import numpy as np
+
+
+class BracketTable:
+    """
+    超额累进税率表。
+
+    thresholds 为各档上限（升序，最后一档无上限），rates 比 thresholds 多一项（小数）。
+    速算扣除数按档累计得出：q[i] = q[i-1] + thresholds[i-1] × (rates[i] - rates[i-1])，
+    于是任意金额的税额都是 金额 × 所在档税率 - 所在档速算扣除数，一次查档即可算出，
+    与逐档累加的结果相同。
+    """
+
+    def __init__(self, thresholds, rates):
+        if len(rates) != len(thresholds) + 1:
+            raise ValueError("rates 应比 thresholds 多一项")
+        self.thresholds = np.asarray(thresholds, dtype=float)
+        self.rates = np.asarray(rates, dtype=float)
+        # 四舍五入到分，消除小数税率相乘带来的浮点误差
+        self.quick_deductions = np.round(np.concatenate(
+            ([0.0], np.cumsum(self.thresholds * np.diff(self.rates)))
+        ), 2)
+        self._bounds = list(thresholds)
+
+    def bracket(self, amount):
+        """单个金额所在档位（bisect，上限所在的金额仍属于该档）"""
+        return bisect_left(self._bounds, amount)
+
+    def rate(self, amount):
+        """单个金额的边际税率（小数）"""
+        return float(self.rates[self.bracket(amount)])
+
+    def brackets(self, amounts):
+        """bracket 的向量化版本：一次 searchsorted 为整列金额查档"""
+        return np.searchsorted(self.thresholds, amounts, side='left')
+
+    def tax(self, amounts, basis=None):
+        """
+        整列金额的应纳税额（负数按 0 计）。
+        basis 为查档依据，默认即金额本身；年终奖单独计税时传入 奖金 / 12。
+        """
+        amounts = np.maximum(np.asarray(amounts, dtype=float), 0.0)
+        idx = self.brackets(amounts if basis is None else basis)
+        return np.maximum(amounts * self.rates[idx] - self.quick_deductions[idx], 0.0)
+
+
+# 综合所得年度税率表（应纳税所得额按年计）
+ANNUAL_BRACKETS = BracketTable(
+    thresholds=[36000, 144000, 300000, 420000, 660000, 960000],
+    rates=[0.03, 0.10, 0.20, 0.25, 0.30, 0.35, 0.45],
+)
+
+# 按月换算后的税率表：全年一次性奖金单独计税时，以 奖金 / 12 查档
+MONTHLY_BRACKETS = BracketTable(
+    thresholds=[3000, 12000, 25000, 35000, 55000, 80000],
+    rates=[0.03, 0.10, 0.20, 0.25, 0.30, 0.35, 0.45],
+)
+
+
+def bonus_tax(bonus):
+    """全年一次性奖金单独计税：奖金 / 12 确定税率与（月度）速算扣除数，整列计算"""
+    bonus = np.asarray(bonus, dtype=float)
+    return MONTHLY_BRACKETS.tax(bonus, basis=bonus / 12)
+
+
+def evaluate_scenarios(income, deductions, contributions, bonus):
+    """
+    批量试算：每个情景的各项金额为一列，全部一次向量化计算。
+
+    应纳税所得额 = 收入 - 扣除 - 税前缴费（如个人养老金），不低于 0；
+    bonus 为单独计税的年终奖。返回各结果列组成的 dict。
+    """
+    income = np.asarray(income, dtype=float)
+    taxable = np.maximum(income - deductions - contributions, 0.0)
+    salary_tax = ANNUAL_BRACKETS.tax(taxable)
+    separate_tax = bonus_tax(bonus)
+    total_tax = salary_tax + separate_tax
+    gross = income + bonus
+    with np.errstate(divide='ignore', invalid='ignore'):
+        effective = np.where(gross > 0, total_tax / gross, 0.0)
+    return {
+        'taxableIncome': taxable,
+        'tax': total_tax,
+        'bonusTax': separate_tax,
+        'marginalRate': ANNUAL_BRACKETS.rates[ANNUAL_BRACKETS.brackets(taxable)],
+        'effectiveRate': effective,
+        'afterTaxIncome': gross - total_tax,
+    }
@@ -1,70 +1,78 @@
 # backend/modules/tax/controller.py
 
-from flask import Blueprint, jsonify, current_app
-from sqlalchemy import text
-from datetime import date, datetime
+from flask import Blueprint, jsonify, request, current_app
+import click
+from datetime import MAXYEAR, MINYEAR, date
+
+import numpy as np
+
+from backend.modules.tax.aggregates import yearly_category_totals, yearly_totals
+from backend.modules.tax.brackets import ANNUAL_BRACKETS, evaluate_scenarios
+from backend.modules.tax.rules import DEFAULT_RULES_PATH, RuleError, get_rule_set, load_rule_set
 
 bp = Blueprint('tax', __name__)
 
+MAX_HISTORY_YEARS = 50  # /history 一次最多返回的年数
+MAX_SCENARIOS = 10000   # /scenarios 单次请求的情景数上限
+SCENARIO_FIELDS = ('income', 'deductions', 'contributions', 'bonus')
+
+
 @bp.route('', methods=['GET'])
 def get_tax_data():
     """
-    GET /api/tax
-    获取用户的税务预测数据
+    GET /api/tax?year=2024
+    获取用户的税务预测数据（默认当年）
+
+    抵扣项目与优化建议来自编译好的规则集（tax_rules.json），对按年汇总的分类金额
+    求值，不再逐条查询。
     """
-    engine = current_app.config['DB_ENGINE']
     user_id = 1  # TODO: 从 token 或参数获取实际 user_id
-    current_year = date.today().year
+    try:
+        year = int(request.args.get('year', date.today().year))
+    except ValueError:
+        return jsonify({"success": False, "error": "year 必须是整数"}), 400
+    if not MINYEAR < year < MAXYEAR:
+        return jsonify({"success": False, "error": f"year 超出范围: {year}"}), 400
+
+    # 1) 2) 年度总收入与已缴税款：来自按年汇总（月度汇总表 + 税务分类 id，按数据版本缓存）
+    totals = yearly_totals(user_id, year, year)[0]
+    annual_income = totals['income']
+    paid_tax = totals['paidTax']
+
+    # 3) 计算可抵扣项目：规则以当年各分类合计与收入、已缴税款为输入
+    rule_set = get_rule_set()
+    facts = dict(
+        yearly_category_totals(user_id, year),
+        year=year,
+        annual_income=annual_income,
+        paid_tax=paid_tax
+    )
+    deductions = rule_set.evaluate_deductions(facts)
+    total_deductions = sum(d['amount'] for d in deductions if d['status'] == 'available')
+
+    # 4) 计算应纳税所得额和预估税款
+    taxable_income = max(0, annual_income - total_deductions)
+    estimated_tax_rate = calculate_tax_rate(taxable_income)
+    # 超额累进：应纳税所得额 × 所在档税率 - 速算扣除数
+    estimated_tax = float(ANNUAL_BRACKETS.tax(taxable_income))
+
+    # 5) 计算差额和状态
+    difference = estimated_tax - paid_tax
+    status = "underpaid" if difference > 0 else "overpaid" if difference < 0 else "balanced"
 
-    with engine.connect() as conn:
-        # 1) 计算年度总收入
-        annual_income = conn.execute(text("""
-            SELECT COALESCE(SUM(amount), 0) as total_income
-            FROM transactions 
-            WHERE user_id = :uid 
-              AND flow_type = 'Income'
-              AND YEAR(txn_date) = :year
-        """), {"uid": user_id, "year": current_year}).scalar_one()
-        
-        annual_income = float(annual_income)
-
-        # 2) 计算已缴税款（从支出中筛选税务相关交易）
-        paid_tax = conn.execute(text("""
-            SELECT COALESCE(SUM(amount), 0) as paid_tax
-            FROM transactions t
-            JOIN categories c ON t.category_id = c.category_id
-            WHERE t.user_id = :uid 
-              AND t.flow_type = 'Spending'
-              AND YEAR(t.txn_date) = :year
-              AND c.name IN ('税务', '个人所得税', '企业所得税')
-        """), {"uid": user_id, "year": current_year}).scalar_one()
-        
-        paid_tax = float(paid_tax)
-
-        # 3) 计算可抵扣项目
-        deductions = calculate_deductions(conn, user_id, current_year)
-        total_deductions = sum(d['amount'] for d in deductions if d['status'] == 'available')
-
-        # 4) 计算应纳税所得额和预估税款
-        taxable_income = max(0, annual_income - total_deductions)
-        estimated_tax_rate = calculate_tax_rate(taxable_income)
-        estimated_tax = taxable_income * (estimated_tax_rate / 100)
-        
-        # 5) 计算差额和状态
-        difference = estimated_tax - paid_tax
-        status = "underpaid" if difference > 0 else "overpaid" if difference < 0 else "balanced"
-
-        # 6) 生成税务优化建议
-        recommendations = generate_tax_recommendations(
-            annual_income, 
-            taxable_income, 
-            total_deductions, 
-            difference
-        )
+    # 6) 生成税务优化建议
+    recommendations = rule_set.evaluate_recommendations(dict(
+        facts,
+        total_deductions=total_deductions,
+        taxable_income=taxable_income,
+        estimated_tax=estimated_tax,
+        difference=difference
+    ))
 
     return jsonify({
         "success": True,
         "data": {
+            "year": year,
             "annualIncome": round(annual_income, 2),
             "estimatedTaxRate": round(estimated_tax_rate, 1),
             "paidTax": round(paid_tax, 2),
@@ -72,109 +80,128 @@ def get_tax_data():
             "difference": round(difference, 2),
             "status": status,
             "deductions": deductions,
-            "recommendations": recommendations
+            "recommendations": recommendations,
+            "rulesVersion": rule_set.version
         },
         "message": "税务数据获取成功"
     })
 
 
-def calculate_deductions(conn, user_id, year):
-    """计算可抵扣项目"""
-    # 这里使用模拟数据，实际项目中应该从数据库获取
-    # 可以根据用户的交易记录和配置来计算
-    
-    deductions = [
-        {
-            "name": "住房贷款利息",
-            "amount": 12000,
-            "status": "available"
-        },
-        {
-            "name": "子女教育",
-            "amount": 8000,
-            "status": "available"
-        },
-        {
-            "name": "赡养老人",
-            "amount": 6000,
-            "status": "available"
+@bp.route('/history', methods=['GET'])
+def get_tax_history():
+    """
+    GET /api/tax/history?years=5
+    最近若干年（含当年）每年的收入与已缴税款，按年份升序
+    """
+    user_id = 1  # TODO: 从 token 或参数获取实际 user_id
+    try:
+        years = int(request.args.get('years', 5))
+    except ValueError:
+        years = 0
+    if not 1 <= years <= MAX_HISTORY_YEARS:
+        return jsonify({
+            "success": False,
+            "error": f"years 必须是 1 到 {MAX_HISTORY_YEARS} 之间的整数"
+        }), 400
+
+    current_year = date.today().year
+    return jsonify({
+        "success": True,
+        "data": {
+            "years": yearly_totals(user_id, current_year - years + 1, current_year)
         },
-        {
-            "name": "继续教育",
-            "amount": 4000,
-            "status": "pending"
+        "message": "税务历史获取成功"
+    })
+
+
+@bp.route('/scenarios', methods=['POST'])
+def evaluate_tax_scenarios():
+    """
+    POST /api/tax/scenarios
+    批量试算税额：{"scenarios": [{"income", "deductions", "contributions", "bonus"}, ...]}
+
+    各情景按列组装后由累进税率表一次向量化计算，结果与请求顺序一致；
+    deductions / contributions / bonus 缺省为 0，bonus 为单独计税的年终奖。
+    """
+    data = request.get_json(silent=True) or {}
+    scenarios = data.get('scenarios')
+    if not isinstance(scenarios, list) or not scenarios:
+        return jsonify({"success": False, "error": "缺少必需字段: scenarios"}), 400
+    if len(scenarios) > MAX_SCENARIOS:
+        return jsonify({
+            "success": False,
+            "error": f"一次最多试算 {MAX_SCENARIOS} 个情景"
+        }), 400
+
+    for i, scenario in enumerate(scenarios):
+        if not isinstance(scenario, dict) or 'income' not in scenario:
+            return jsonify({"success": False, "error": f"第 {i} 个情景缺少 income"}), 400
+
+    columns = {}
+    for field in SCENARIO_FIELDS:
+        column, bad = _scenario_column(scenarios, field)
+        if bad is not None:
+            return jsonify({
+                "success": False,
+                "error": f"第 {bad} 个情景的 {field} 必须是非负数"
+            }), 400
+        columns[field] = column
+
+    results = evaluate_scenarios(**columns)
+    return jsonify({
+        "success": True,
+        "data": {
+            "results": [
+                {
+                    "taxableIncome": round(float(taxable), 2),
+                    "tax": round(float(tax), 2),
+                    "bonusTax": round(float(bonus), 2),
+                    "marginalRate": round(float(rate) * 100),
+                    "effectiveRate": round(float(effective) * 100, 2),
+                    "afterTaxIncome": round(float(after), 2)
+                }
+                for taxable, tax, bonus, rate, effective, after in zip(
+                    results['taxableIncome'], results['tax'], results['bonusTax'],
+                    results['marginalRate'], results['effectiveRate'], results['afterTaxIncome']
+                )
+            ]
         },
-        {
-            "name": "大病医疗",
-            "amount": 15000,
-            "status": "unavailable"
-        }
-    ]
-    
-    return deductions
+        "message": "税务试算完成"
+    })
+
+
+def _scenario_column(scenarios, field):
+    """把各情景的某一字段整列转换为数组，返回 (数组, 第一个非法值的下标或 None)"""
+    raw = [scenario.get(field) or 0 for scenario in scenarios]
+    try:
+        column = np.array(raw, dtype=float)
+    except (TypeError, ValueError):
+        # 整列转换失败时再逐个定位出错的情景
+        column = np.array([_to_float(v) for v in raw])
+    invalid = np.flatnonzero(~(np.isfinite(column) & (column >= 0)))
+    return column, (int(invalid[0]) if len(invalid) else None)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
 
 
 def calculate_tax_rate(taxable_income):
-    """根据应纳税所得额计算税率"""
-    # 简化的中国个人所得税税率计算
-    if taxable_income <= 36000:
-        return 3
-    elif taxable_income <= 144000:
-        return 10
-    elif taxable_income <= 300000:
-        return 20
-    elif taxable_income <= 420000:
-        return 25
-    elif taxable_income <= 660000:
-        return 30
-    elif taxable_income <= 960000:
-        return 35
-    else:
-        return 45
-
-
-def generate_tax_recommendations(annual_income, taxable_income, total_deductions, difference):
-    """生成税务优化建议"""
-    recommendations = []
-    
-    # 建议1: 增加退休金缴纳
-    if annual_income > 100000 and total_deductions < 20000:
-        retirement_savings = min(12000, annual_income * 0.1)  # 最多12万
-        tax_savings = retirement_savings * 0.2  # 假设20%税率
-        recommendations.append({
-            "title": "增加退休金缴纳",
-            "description": f"考虑增加个人养老金缴纳，可享受税前扣除，预计可节省税款 ¥{tax_savings:.0f}",
-            "savings": round(tax_savings, 0),
-            "priority": "high"
-        })
-    
-    # 建议2: 慈善捐赠
-    if difference > 5000:
-        donation_amount = min(5000, difference)
-        tax_savings = donation_amount * 0.15  # 假设15%税率
-        recommendations.append({
-            "title": "慈善捐赠",
-            "description": f"通过慈善捐赠获得税前扣除，建议捐赠金额 ¥{donation_amount:.0f}，可节省税款 ¥{tax_savings:.0f}",
-            "savings": round(tax_savings, 0),
-            "priority": "medium"
-        })
-    
-    # 建议3: 投资损失抵扣
-    if taxable_income > 50000:
-        recommendations.append({
-            "title": "投资损失抵扣",
-            "description": "如有投资损失，可用于抵扣其他投资收益，建议咨询税务专家",
-            "savings": 0,
-            "priority": "low"
-        })
-    
-    # 建议4: 年终奖优化
-    if annual_income > 150000:
-        recommendations.append({
-            "title": "年终奖优化",
-            "description": "合理安排年终奖发放时间，避免税率跳档，预计可节省税款 ¥1,200",
-            "savings": 1200,
-            "priority": "medium"
-        })
-    
-    return recommendations 
\ No newline at end of file
+    """根据应纳税所得额计算边际税率（百分比），按综合所得年度税率表查档"""
+    return round(ANNUAL_BRACKETS.rate(taxable_income) * 100)
+
+
+@bp.cli.command('check-rules')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False), required=False)
+def check_rules_command(path):
+    """校验税务规则文件能否编译（默认当前配置的文件）：flask tax check-rules [PATH]"""
+    path = path or current_app.config.get('TAX_RULES_PATH') or DEFAULT_RULES_PATH
+    try:
+        rule_set = load_rule_set(path)
+    except RuleError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"规则文件有效：版本 {rule_set.version}，抵扣 {len(rule_set.deductions)} 条，"
+               f"建议 {len(rule_set.recommendations)} 条")
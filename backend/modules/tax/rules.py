@@ -0,0 +1,200 @@
+# backend/modules/tax/rules.py
+
+import ast
+import json
+import os
+import string
+import threading
+from collections import defaultdict
+
+from flask import current_app
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), 'tax_rules.json')
+
+DEDUCTION_STATUSES = ('available', 'pending', 'unavailable')
+PRIORITIES = ('low', 'medium', 'high')
+
+# 规则表达式中可调用的函数
+_FUNCTIONS = {'min': min, 'max': max, 'abs': abs, 'round': round}
+
+# 表达式只允许算术、比较、布尔运算、白名单函数调用与 income['分类'] / spending['分类'] 取值
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.IfExp, ast.Call, ast.Name, ast.Load, ast.Constant, ast.Subscript,
+)
+
+_lock = threading.Lock()
+
+
+class RuleError(ValueError):
+    """规则文件格式或表达式不合法"""
+
+
+def compile_expression(source, where):
+    """校验并编译一条规则表达式，返回可直接 eval 的代码对象"""
+    try:
+        tree = ast.parse(str(source), mode='eval')
+    except SyntaxError as e:
+        raise RuleError(f"{where}: 表达式语法错误: {source}") from e
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise RuleError(f"{where}: 不支持的表达式: {source}")
+        if isinstance(node, ast.Call) and not (
+            isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS and not node.keywords
+        ):
+            raise RuleError(f"{where}: 只能调用 {', '.join(_FUNCTIONS)}: {source}")
+        if isinstance(node, ast.Subscript) and not (
+            isinstance(node.value, ast.Name) and node.value.id in ('income', 'spending')
+            and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str)
+        ):
+            raise RuleError(f"{where}: 只能按分类名读取 income / spending: {source}")
+    return compile(tree, f'<{where}>', 'eval')
+
+
+def check_template(template, where):
+    """描述模板只允许 {变量名} 或 {变量名:格式}，不允许属性 / 下标访问"""
+    try:
+        fields = [field for _, field, _, _ in string.Formatter().parse(template) if field is not None]
+    except ValueError as e:
+        raise RuleError(f"{where}: 模板格式错误: {template}") from e
+    for field in fields:
+        if not field.isidentifier():
+            raise RuleError(f"{where}: 模板只能引用变量名: {{{field}}}")
+    return template
+
+
+def _evaluate(code, names):
+    return eval(code, {'__builtins__': {}}, names)
+
+
+class RuleSet:
+    """
+    编译好的抵扣与建议规则。
+
+    规则文件只在加载时解析、校验、编译一次；求值时对同一份按年汇总的数据（facts）
+    依次计算各条规则，不做任何查询。facts 中 income / spending 为
+    {分类名: 年度金额}，其余为标量（annual_income、paid_tax、year 等）。
+    """
+
+    def __init__(self, spec):
+        self.version = spec.get('version')
+        self.deductions = []
+        for i, rule in enumerate(spec.get('deductions', [])):
+            where = f"deductions[{i}]"
+            status, otherwise = rule.get('status', 'available'), rule.get('otherwise', 'unavailable')
+            if status not in DEDUCTION_STATUSES or otherwise not in DEDUCTION_STATUSES:
+                raise RuleError(f"{where}: status 只能是 {', '.join(DEDUCTION_STATUSES)}")
+            self.deductions.append({
+                'name': rule['name'],
+                'amount': compile_expression(rule.get('amount', 0), f"{where}.amount"),
+                'when': compile_expression(rule['when'], f"{where}.when") if 'when' in rule else None,
+                'status': status,
+                'otherwise': otherwise,
+            })
+
+        self.recommendations = []
+        for i, rule in enumerate(spec.get('recommendations', [])):
+            where = f"recommendations[{i}]"
+            if rule.get('priority', 'medium') not in PRIORITIES:
+                raise RuleError(f"{where}: priority 只能是 {', '.join(PRIORITIES)}")
+            self.recommendations.append({
+                'title': rule['title'],
+                'when': compile_expression(rule.get('when', 'True'), f"{where}.when"),
+                'let': [
+                    (name, compile_expression(expr, f"{where}.let.{name}"))
+                    for name, expr in rule.get('let', {}).items()
+                ],
+                'description': check_template(rule.get('description', ''), f"{where}.description"),
+                'savings': compile_expression(rule.get('savings', 0), f"{where}.savings"),
+                'priority': rule.get('priority', 'medium'),
+            })
+
+    @staticmethod
+    def _names(facts):
+        names = dict(facts)
+        # 未出现的分类按 0 计，规则可以引用用户没有的分类
+        names['income'] = defaultdict(float, facts.get('income', {}))
+        names['spending'] = defaultdict(float, facts.get('spending', {}))
+        names.update(_FUNCTIONS)
+        return names
+
+    def evaluate_deductions(self, facts):
+        """返回 [{name, amount, status}]；when 不成立时状态取 otherwise"""
+        names = self._names(facts)
+        result = []
+        for rule in self.deductions:
+            applies = rule['when'] is None or bool(_evaluate(rule['when'], names))
+            result.append({
+                'name': rule['name'],
+                'amount': _evaluate(rule['amount'], names),
+                'status': rule['status'] if applies else rule['otherwise'],
+            })
+        return result
+
+    def evaluate_recommendations(self, facts):
+        """返回 when 成立的建议 [{title, description, savings, priority}]，let 依次求值供后续引用"""
+        base = self._names(facts)
+        result = []
+        for rule in self.recommendations:
+            if not _evaluate(rule['when'], base):
+                continue
+            names = dict(base)
+            for name, code in rule['let']:
+                names[name] = _evaluate(code, names)
+            result.append({
+                'title': rule['title'],
+                'description': rule['description'].format(**names),
+                'savings': _evaluate(rule['savings'], names),
+                'priority': rule['priority'],
+            })
+        return result
+
+
+def load_rule_set(path):
+    """读取并编译规则文件（JSON）"""
+    with open(path, encoding='utf-8') as f:
+        try:
+            spec = json.load(f)
+        except json.JSONDecodeError as e:
+            raise RuleError(f"{path}: JSON 格式错误: {e}") from e
+    try:
+        return RuleSet(spec)
+    except KeyError as e:
+        raise RuleError(f"{path}: 缺少字段 {e}") from e
+
+
+def get_rule_set():
+    """
+    返回当前应用编译好的规则集（TAX_RULES_PATH，默认随代码发布的 tax_rules.json）。
+
+    每个进程只编译一次；文件修改时间变化后自动重新编译。新文件不合法时记录错误并继续
+    使用上一版规则，首次加载失败则直接抛出 RuleError。
+    """
+    path = current_app.config.get('TAX_RULES_PATH', DEFAULT_RULES_PATH)
+    loaded = current_app.extensions.get('tax_rules')
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        if loaded is None or loaded[0] != path:
+            raise
+        return loaded[2]  # 文件暂时不可读（如正在替换）时沿用已编译的规则
+    if loaded is not None and loaded[:2] == (path, mtime):
+        return loaded[2]
+
+    with _lock:
+        loaded = current_app.extensions.get('tax_rules')
+        if loaded is not None and loaded[:2] == (path, mtime):
+            return loaded[2]
+        try:
+            rule_set = load_rule_set(path)
+        except (OSError, RuleError) as e:
+            if loaded is None or loaded[0] != path:
+                raise
+            current_app.logger.error("税务规则重新加载失败，继续使用上一版: %s", e)
+            # 记下这次的修改时间，文件再次变化前不再重试
+            current_app.extensions['tax_rules'] = (path, mtime, loaded[2])
+            return loaded[2]
+        current_app.extensions['tax_rules'] = (path, mtime, rule_set)
+        return rule_set
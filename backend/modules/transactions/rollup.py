@@ -0,0 +1,101 @@
+# backend/modules/transactions/rollup.py
+
+from collections import defaultdict
+
+from sqlalchemy import text
+
+from backend.utils.db import upsert_sql
+
+MONTHLY_ROLLUP = 'monthly_category_rollup'
+DAILY_ROLLUP = 'daily_category_rollup'
+
+_MONTHLY_COLUMNS = ['user_id', 'category_id', 'month', 'flow_type', 'total_amount', 'txn_count']
+_MONTHLY_KEYS = ['user_id', 'month', 'category_id', 'flow_type']
+_DAILY_COLUMNS = ['user_id', 'category_id', 'day', 'flow_type', 'total_amount', 'txn_count']
+_DAILY_KEYS = ['user_id', 'day', 'category_id', 'flow_type']
+
+# 各方言下取交易所在月份第一天的表达式
+_MONTH_EXPR = {
+    'mysql': "DATE_FORMAT(txn_date, '%Y-%m-01')",
+    'sqlite': "strftime('%Y-%m-01', txn_date)",
+    'postgresql': "date_trunc('month', txn_date)::date",
+}
+
+
+def month_key(txn_date):
+    """交易日期（date 或 'YYYY-MM-DD' 字符串）→ 所在月份第一天 'YYYY-MM-01'"""
+    return str(txn_date)[:7] + '-01'
+
+
+def _fold(removed, added, period):
+    """把交易行按 (user_id, category_id, 周期, flow_type) 合并，返回 [(键, 金额增量, 笔数增量)]"""
+    deltas = defaultdict(lambda: [0.0, 0])
+    for sign, rows in ((-1, removed), (1, added)):
+        for row in rows:
+            key = (row['user_id'], row['category_id'], period(row['txn_date']), row['flow_type'])
+            deltas[key][0] += sign * float(row['amount'])
+            deltas[key][1] += sign
+    return [
+        (key, round(amount, 2), count)
+        for key, (amount, count) in deltas.items()
+        if count or round(amount, 2)
+    ]
+
+
+def _upsert_deltas(conn, table, columns, keys, period_col, deltas):
+    if deltas:
+        conn.execute(
+            text(upsert_sql(conn.dialect.name, table, columns, keys,
+                            accumulate=('total_amount', 'txn_count'))),
+            [
+                {
+                    'user_id': uid, 'category_id': cid, period_col: period, 'flow_type': flow,
+                    'total_amount': amount, 'txn_count': count
+                }
+                for (uid, cid, period, flow), amount, count in deltas
+            ]
+        )
+
+
+def apply_changes(conn, removed=(), added=()):
+    """
+    把交易的增删改折算为汇总表（月度、每日）增量，并在调用方的事务内写入。
+
+    removed / added 为交易行（含 user_id, category_id, txn_date, flow_type, amount），
+    修改一笔交易即 removed=[旧行], added=[新行]。同一键的增量先在内存中合并，
+    每张汇总表再用一条 executemany upsert 写入。返回受影响的月度键
+    (user_id, category_id, month, flow_type) 列表。
+    """
+    monthly = _fold(removed, added, month_key)
+    _upsert_deltas(conn, MONTHLY_ROLLUP, _MONTHLY_COLUMNS, _MONTHLY_KEYS, 'month', monthly)
+    _upsert_deltas(conn, DAILY_ROLLUP, _DAILY_COLUMNS, _DAILY_KEYS, 'day',
+                   _fold(removed, added, lambda d: str(d)[:10]))
+    return [key for key, _, _ in monthly]
+
+
+def rebuild(conn, user_id=None):
+    """按 transactions 全量重建汇总表（可只重建单个用户），用于初次上线回填或数据修复"""
+    where = 'WHERE user_id = :uid' if user_id is not None else ''
+    params = {'uid': user_id} if user_id is not None else {}
+    month_expr = _MONTH_EXPR[conn.dialect.name]
+
+    conn.execute(text(f"DELETE FROM {MONTHLY_ROLLUP} {where}"), params)
+    result = conn.execute(text(f"""
+        INSERT INTO {MONTHLY_ROLLUP} ({', '.join(_MONTHLY_COLUMNS)})
+        SELECT user_id, category_id, {month_expr} AS month, flow_type,
+               SUM(amount) AS total_amount, COUNT(*) AS txn_count
+        FROM transactions
+        {where}
+        GROUP BY user_id, category_id, {month_expr}, flow_type
+    """), params)
+
+    conn.execute(text(f"DELETE FROM {DAILY_ROLLUP} {where}"), params)
+    conn.execute(text(f"""
+        INSERT INTO {DAILY_ROLLUP} ({', '.join(_DAILY_COLUMNS)})
+        SELECT user_id, category_id, txn_date AS day, flow_type,
+               SUM(amount) AS total_amount, COUNT(*) AS txn_count
+        FROM transactions
+        {where}
+        GROUP BY user_id, category_id, txn_date, flow_type
+    """), params)
+    return result.rowcount
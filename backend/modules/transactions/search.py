@@ -0,0 +1,109 @@
+# backend/modules/transactions/search.py
+
+import re
+import threading
+import weakref
+
+from flask import current_app
+from sqlalchemy import text
+
+# 参与全文检索的列
+SEARCH_COLUMNS = ('txn_name', 'merchant_name', 'description')
+
+# trigram 分词要求关键词至少 3 个字符，更短的关键词退回 LIKE
+MIN_INDEXED_TERM = 3
+
+_SQLITE_INDEX_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE transactions_fts USING fts5(
+      {', '.join(SEARCH_COLUMNS)},
+      content='transactions', content_rowid='transaction_id', tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON transactions BEGIN
+      INSERT INTO transactions_fts(rowid, {', '.join(SEARCH_COLUMNS)})
+      VALUES (new.transaction_id, {', '.join('new.' + c for c in SEARCH_COLUMNS)});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON transactions BEGIN
+      INSERT INTO transactions_fts(transactions_fts, rowid, {', '.join(SEARCH_COLUMNS)})
+      VALUES ('delete', old.transaction_id, {', '.join('old.' + c for c in SEARCH_COLUMNS)});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_au AFTER UPDATE OF {', '.join(SEARCH_COLUMNS)} ON transactions BEGIN
+      INSERT INTO transactions_fts(transactions_fts, rowid, {', '.join(SEARCH_COLUMNS)})
+      VALUES ('delete', old.transaction_id, {', '.join('old.' + c for c in SEARCH_COLUMNS)});
+      INSERT INTO transactions_fts(rowid, {', '.join(SEARCH_COLUMNS)})
+      VALUES (new.transaction_id, {', '.join('new.' + c for c in SEARCH_COLUMNS)});
+    END
+    """,
+    "INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')",
+]
+
+_indexed_engines = weakref.WeakSet()
+_index_lock = threading.Lock()
+
+
+def ensure_search_index(engine):
+    """
+    SQLite：按需创建 FTS5 影子表及同步触发器，并回填已有数据（每个引擎只检查一次）。
+    MySQL 使用 init_wealth.sql 中的 FULLTEXT 索引，无需处理。
+    """
+    if engine.dialect.name != 'sqlite' or engine in _indexed_engines:
+        return
+    with _index_lock:
+        if engine in _indexed_engines:
+            return
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+            )).first()
+            if not exists:
+                for ddl in _SQLITE_INDEX_DDL:
+                    conn.execute(text(ddl))
+        _indexed_engines.add(engine)
+
+
+def _terms(q):
+    """把搜索词拆成关键词，去掉引号等检索语法字符"""
+    return [t for t in re.split(r'[\s"\'*+\-()<>~@]+', q) if t]
+
+
+def search_filter(q, param_prefix='q'):
+    """
+    根据当前数据库方言生成检索条件，返回 (WHERE 片段, 绑定参数)。
+    所有关键词都需命中（AND），大小写不敏感。
+    """
+    terms = _terms(q)
+    if not terms:
+        return None, {}
+
+    engine = current_app.config['DB_ENGINE']
+    dialect = engine.dialect.name
+    clauses, params = [], {}
+
+    indexed = [t for t in terms if len(t) >= MIN_INDEXED_TERM]
+    short = [t for t in terms if len(t) < MIN_INDEXED_TERM] if dialect == 'sqlite' else []
+    if dialect == 'mysql':
+        params[param_prefix] = ' '.join(f'+"{t}"' for t in terms)
+        clauses.append(f"MATCH({', '.join('t.' + c for c in SEARCH_COLUMNS)}) AGAINST (:{param_prefix} IN BOOLEAN MODE)")
+    elif dialect == 'sqlite':
+        ensure_search_index(engine)
+        if indexed:
+            params[param_prefix] = ' AND '.join(f'"{t}"' for t in indexed)
+            clauses.append(
+                f"t.transaction_id IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH :{param_prefix})"
+            )
+    else:
+        short = terms
+
+    # 无索引可用的关键词：逐列 LIKE
+    for i, term in enumerate(short):
+        key = f'{param_prefix}_like{i}'
+        params[key] = f'%{term}%'
+        clauses.append('(' + ' OR '.join(f"t.{c} LIKE :{key}" for c in SEARCH_COLUMNS) + ')')
+
+    return ' AND '.join(clauses), params
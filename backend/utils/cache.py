@@ -0,0 +1,115 @@
+# backend/utils/cache.py
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class LocalCache:
+    """
+    进程内 LRU + TTL 缓存（默认后端）
+
+    版本号单独存放、不参与 LRU 淘汰：版本号被淘汰后归零会让旧版本的缓存重新生效。
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (过期时间, 值)
+        self._counters = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class SharedCache:
+    """
+    共享存储后端：包装任意 redis 风格客户端（get / set(key, value, ex=) / incr），
+    多进程、多实例共用同一份缓存与版本号。值以 JSON 存储。
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        raw = self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def counter(self, key):
+        raw = self.client.get(key)
+        return int(raw) if raw is not None else 0
+
+    def incr(self, key):
+        return int(self.client.incr(key))
+
+
+def get_cache():
+    """
+    返回当前应用的结果缓存：
+
+    - CACHE_CLIENT：直接注入 redis 风格客户端（测试中可传入本地替身）
+    - CACHE_REDIS_URL：按 URL 连接 Redis（需另行安装 redis 包）
+    - 都未配置时使用进程内 LocalCache（CACHE_MAXSIZE，默认 1024 条）
+    """
+    cache = current_app.extensions.get('result_cache')
+    if cache is None:
+        config = current_app.config
+        client = config.get('CACHE_CLIENT')
+        if client is None and config.get('CACHE_REDIS_URL'):
+            import redis  # 可选依赖，只有配置了 CACHE_REDIS_URL 才需要
+            client = redis.Redis.from_url(config['CACHE_REDIS_URL'])
+        if client is not None:
+            cache = SharedCache(client)
+        else:
+            cache = LocalCache(maxsize=config.get('CACHE_MAXSIZE', 1024))
+        current_app.extensions['result_cache'] = cache
+    return cache
+
+
+def _version_key(user_id):
+    return f'user:{user_id}:version'
+
+
+def user_version(user_id):
+    """用户数据的当前版本号，作为各类按用户缓存的键的一部分"""
+    return get_cache().counter(_version_key(user_id))
+
+
+def bump_user_version(user_id):
+    """
+    用户数据发生写入后调用：递增版本号，使该用户所有旧版本的缓存不再被读到。
+
+    需在写事务提交之后调用，否则并发读取可能把提交前的旧数据缓存到新版本下。
+    """
+    return get_cache().incr(_version_key(user_id))
@@ -0,0 +1,79 @@
+# backend/utils/categories.py
+
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import text
+
+# 缓存命中失败时，两次重新加载之间的最短间隔（秒），避免未知分类反复打到数据库
+MISS_RELOAD_INTERVAL = 1.0
+
+
+class CategoryCache:
+    """
+    categories 表的 name ↔ id 进程内缓存
+
+    首次使用时整表加载（表很小），之后按 ttl 过期重载；查不到的名称会触发一次
+    （限频的）重载以识别新增分类。本进程修改 categories 后调用 invalidate()。
+    """
+
+    def __init__(self, engine, ttl=300):
+        self.engine = engine
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_name = {}
+        self._by_id = {}
+        self._loaded_at = None
+
+    def _load(self):
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("SELECT category_id, name FROM categories")).all()
+        self._by_name = {name: cid for cid, name in rows}
+        self._by_id = {cid: name for cid, name in rows}
+        self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._load()
+
+    def _reload_on_miss(self):
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= MISS_RELOAD_INTERVAL:
+                self._load()
+                return True
+        return False
+
+    def id_for(self, name):
+        """分类名 → category_id，不存在时返回 None"""
+        return self.ids_for([name]).get(name)
+
+    def ids_for(self, names):
+        """批量解析分类名，返回 {name: category_id}，不存在的名称不出现在结果中"""
+        self._ensure_loaded()
+        names = set(names)
+        if not names <= self._by_name.keys():
+            self._reload_on_miss()
+        by_name = self._by_name
+        return {n: by_name[n] for n in names if n in by_name}
+
+    def name_for(self, category_id):
+        """category_id → 分类名，不存在时返回 None"""
+        self._ensure_loaded()
+        return self._by_id.get(category_id)
+
+    def invalidate(self):
+        """标记缓存失效，下次访问时重新加载"""
+        with self._lock:
+            self._loaded_at = None
+
+
+def get_category_cache():
+    """返回当前应用的分类缓存，按 DB_ENGINE 各自维护一份"""
+    engine = current_app.config['DB_ENGINE']
+    cache = current_app.extensions.get('category_cache')
+    if cache is None or cache.engine is not engine:
+        cache = CategoryCache(engine, ttl=current_app.config.get('CATEGORY_CACHE_TTL', 300))
+        current_app.extensions['category_cache'] = cache
+    return cache
@@ -1,3 +1,5 @@
+from datetime import date
+
 from sqlalchemy import create_engine
 
 def create_test_engine(tmp_path):
@@ -5,3 +7,37 @@ def create_test_engine(tmp_path):
     db_file = tmp_path / "test.db"
     engine = create_engine(f"sqlite:///{db_file}", future=True)
     return engine
+
+
+def as_date(value):
+    """日期列的值统一为 date：SQLite 返回 'YYYY-MM-DD' 字符串，MySQL 返回 date"""
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def upsert_sql(dialect_name, table, columns, keys, accumulate=()):
+    """
+    生成按方言区分的单条 upsert 语句（参数名与列名相同，可配合 executemany 使用）
+
+    :param columns: 插入的全部列
+    :param keys: 唯一键 / 主键列，冲突时按其定位已有行
+    :param accumulate: 冲突时累加（col = col + 新值）而非覆盖的列
+    """
+    values = ', '.join(f':{c}' for c in columns)
+    updates = [c for c in columns if c not in keys]
+    insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values})"
+
+    if dialect_name == 'mysql':
+        sets = ', '.join(
+            f"{c} = {c} + VALUES({c})" if c in accumulate else f"{c} = VALUES({c})"
+            for c in updates
+        )
+        return f"{insert} ON DUPLICATE KEY UPDATE {sets}"
+    if dialect_name in ('sqlite', 'postgresql'):
+        sets = ', '.join(
+            f"{c} = {table}.{c} + excluded.{c}" if c in accumulate else f"{c} = excluded.{c}"
+            for c in updates
+        )
+        return f"{insert} ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {sets}"
+    raise NotImplementedError(f"upsert 不支持的数据库方言: {dialect_name}")
@@ -0,0 +1,72 @@
+# backend/utils/ingest.py
+
+import csv
+import io
+import json
+from itertools import islice
+
+# 请求头 Content-Type → 流式格式
+STREAM_FORMATS = {
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+
+def detect_format(mimetype, explicit=None):
+    """根据 ?format= 或 Content-Type 判断流式格式，无法识别时返回 None"""
+    if explicit:
+        return explicit.lower() if explicit.lower() in ('csv', 'ndjson') else None
+    return STREAM_FORMATS.get((mimetype or '').lower())
+
+
+def iter_records(stream, fmt):
+    """
+    逐行解析 CSV / NDJSON 字节流，产出 (行号, 记录, 错误)。
+
+    不会一次性读入整个请求体；单行格式错误只体现在该行的 error 上，不中断后续解析。
+    """
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(text_stream)
+            for row in reader:
+                # 行号按数据行计，表头不计
+                yield reader.line_num - 1, row, None
+        else:
+            for line_no, line in enumerate(text_stream, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_no, None, f"JSON 解析失败: {e}"
+                    continue
+                if not isinstance(record, dict):
+                    yield line_no, None, "每行必须是 JSON 对象"
+                    continue
+                yield line_no, record, None
+    finally:
+        # 不随包装器一起关闭底层流
+        text_stream.detach()
+
+
+def text_field(value):
+    """
+    把一个字段值转为去掉首尾空白的字符串，None 视为空串。
+    NDJSON 中的分类、代码、日期可能是数字（如 510300、20250705），统一按文本处理后再校验。
+    """
+    return '' if value is None else str(value).strip()
+
+
+def chunked(iterable, size):
+    """把迭代器切成长度不超过 size 的列表"""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
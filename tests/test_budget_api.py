@@ -5,6 +5,7 @@ from sqlalchemy import create_engine, text
 from datetime import date
 
 from backend.app import create_app
+from backend.modules.transactions import rollup
 
 @pytest.fixture
 def client(tmp_path):
@@ -30,7 +31,8 @@ def client(tmp_path):
                 budget_amount   REAL    NOT NULL,
                 alert_threshold REAL    DEFAULT 1.0,
                 budget_name     TEXT,
-                created_at      DATETIME DEFAULT CURRENT_TIMESTAMP
+                created_at      DATETIME DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (user_id, category_id, period_start)
             )
         """))
         conn.execute(text("""
@@ -46,6 +48,57 @@ def client(tmp_path):
                 created_at      DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         """))
+        conn.execute(text("""
+            CREATE TABLE monthly_category_rollup (
+                user_id         INTEGER NOT NULL,
+                category_id     INTEGER NOT NULL,
+                month           DATE    NOT NULL,
+                flow_type       TEXT    NOT NULL,
+                total_amount    REAL    NOT NULL DEFAULT 0,
+                txn_count       INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, month, category_id, flow_type)
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE daily_category_rollup (
+                user_id         INTEGER NOT NULL,
+                category_id     INTEGER NOT NULL,
+                day             DATE    NOT NULL,
+                flow_type       TEXT    NOT NULL,
+                total_amount    REAL    NOT NULL DEFAULT 0,
+                txn_count       INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, day, category_id, flow_type)
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE budget_alerts (
+                alert_id        INTEGER PRIMARY KEY AUTOINCREMENT,
+                budget_id       INTEGER NOT NULL UNIQUE,
+                user_id         INTEGER NOT NULL,
+                category_id     INTEGER NOT NULL,
+                period_start    DATE    NOT NULL,
+                budget_amount   REAL    NOT NULL,
+                alert_threshold REAL    NOT NULL,
+                spent_amount    REAL    NOT NULL,
+                triggered_at    DATETIME DEFAULT CURRENT_TIMESTAMP,
+                acknowledged    BOOLEAN NOT NULL DEFAULT 0
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE goals (
+                goal_id            INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id            INTEGER NOT NULL,
+                goal_name          TEXT NOT NULL,
+                target_amount      REAL NOT NULL,
+                current_amount     REAL NOT NULL DEFAULT 0,
+                deadline           DATE,
+                priority           TEXT NOT NULL DEFAULT 'MEDIUM',
+                goal_type          TEXT NOT NULL,
+                is_active          BOOLEAN NOT NULL DEFAULT 1,
+                linked_account_id  INTEGER,
+                linked_category_id INTEGER
+            )
+        """))
 
     # 3) 插入测试需要的分类数据
     with engine.begin() as conn:
@@ -104,6 +157,8 @@ def test_update_and_get_budget(client):
               (1, 1, (SELECT category_id FROM categories WHERE name='transport'),
                :d, 'Spending', 100)
         """), {"d": today})
+        # 直接写库绕过了交易写路径，需要重建月度汇总
+        rollup.rebuild(conn)
 
     # 3) 再次 GET，并断言计算结果
     rv3 = client.get("/api/budget")
@@ -118,3 +173,137 @@ def test_update_and_get_budget(client):
     assert data3["totalSpent"] == 300
     assert data3["totalRemaining"] == 1200
     assert data3["overallPercentage"] == 20.0
+
+def test_budget_history(client):
+    """months=N：一次返回最近 N 个月的预算执行情况，无预算的月份为 0"""
+    from backend.modules.budget.controller import shift_month
+
+    this_month = date.today().replace(day=1)
+    last_month = shift_month(this_month, -1)
+    engine = client.application.config["DB_ENGINE"]
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO budgets (user_id, category_id, period_start, budget_amount)
+            VALUES (1, 1, :last, 400), (1, 1, :this, 500), (1, 2, :this, 100)
+        """), {"last": last_month, "this": this_month})
+        conn.execute(text("""
+            INSERT INTO transactions (user_id, account_id, category_id, txn_date, flow_type, amount)
+            VALUES (1, 1, 1, :last, 'Spending', 100), (1, 1, 1, :this, 'Spending', 50)
+        """), {"last": last_month, "this": this_month})
+        rollup.rebuild(conn)
+
+    rv = client.get("/api/budget?months=3")
+    assert rv.status_code == 200
+    history = rv.get_json()["data"]["history"]
+    assert [h["month"] for h in history] == [
+        shift_month(this_month, -2).strftime("%Y-%m"),
+        last_month.strftime("%Y-%m"),
+        this_month.strftime("%Y-%m"),
+    ]
+    assert history[0]["budgeted"] == 0 and history[0]["categories"] == []
+    assert history[1]["budgeted"] == 400 and history[1]["spent"] == 100
+    assert history[1]["percentage"] == 25.0
+    assert history[2]["budgeted"] == 600 and history[2]["spent"] == 50
+
+    assert "history" not in client.get("/api/budget").get_json()["data"]
+    assert client.get("/api/budget?months=0").status_code == 400
+
+def test_update_budget_upserts(client):
+    """PUT 重复提交：已有预算被覆盖，不会产生重复行"""
+    client.put("/api/budget", json={"categories": [
+        {"category": "food", "budgeted": 1000},
+        {"category": "transport", "budgeted": 500}
+    ]})
+    client.put("/api/budget", json={"categories": [
+        {"category": "food", "budgeted": 1200},
+        {"category": "unknown", "budgeted": 1}
+    ]})
+
+    engine = client.application.config["DB_ENGINE"]
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT category_id, budget_amount FROM budgets ORDER BY category_id"
+        )).all()
+    assert [tuple(r) for r in rows] == [(1, 1200), (2, 500)]
+
+def test_budget_alerts_follow_writes(client):
+    """预算告警：交易写入跨过阈值时产生，回落后清除，可确认"""
+    this_month = date.today().replace(day=1)
+    client.put("/api/budget", json={"categories": [{"category": "food", "budgeted": 100}]})
+    engine = client.application.config["DB_ENGINE"]
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE budgets SET alert_threshold = 0.8"))
+
+    def post(amount):
+        rv = client.post("/api/transactions", json={
+            "amount": -amount, "type": "expense", "category": "food",
+            "date": this_month.isoformat()
+        })
+        return rv.get_json()["data"]["id"]
+
+    post(50)
+    assert client.get("/api/budget/alerts").get_json()["data"]["alerts"] == []
+
+    second = post(35)
+    alerts = client.get("/api/budget/alerts").get_json()["data"]["alerts"]
+    assert len(alerts) == 1
+    assert alerts[0]["category"] == "food"
+    assert alerts[0]["spent"] == 85
+    assert alerts[0]["percentage"] == 85.0
+
+    # 继续超支只刷新金额，不重复告警
+    post(20)
+    alerts = client.get("/api/budget/alerts").get_json()["data"]["alerts"]
+    assert [a["spent"] for a in alerts] == [105]
+
+    rv = client.post(f"/api/budget/alerts/{alerts[0]['id']}/ack")
+    assert rv.status_code == 200
+    assert client.get("/api/budget/alerts").get_json()["data"]["alerts"] == []
+    assert len(client.get("/api/budget/alerts?includeAcknowledged=true").get_json()["data"]["alerts"]) == 1
+
+    # 删除一笔后回落到阈值以下，告警清除
+    client.delete(f"/api/transactions/{second}")
+    assert client.get("/api/budget/alerts?includeAcknowledged=true").get_json()["data"]["alerts"] == []
+
+    # 调高预算也会重新判定
+    post(40)
+    assert len(client.get("/api/budget/alerts").get_json()["data"]["alerts"]) == 1
+    client.put("/api/budget", json={"categories": [{"category": "food", "budgeted": 1000}]})
+    assert client.get("/api/budget/alerts").get_json()["data"]["alerts"] == []
+
+def test_project_month_end(client):
+    """月底预测：本月日均与近 8 周日均混合，并按星期季节性分配剩余天数"""
+    from datetime import timedelta
+    from backend.modules.budget.projection import project_month_end
+
+    today = date(2025, 7, 16)  # 周三
+    engine = client.application.config["DB_ENGINE"]
+    with engine.begin() as conn:
+        # food：过去 8 个周一每次 70（其中 7/7、7/14 在本月）
+        mondays = [date(2025, 5, 26) + timedelta(weeks=i) for i in range(8)]
+        # transport：只有本月 7/2（周三）一笔 32
+        conn.execute(text("""
+            INSERT INTO transactions (user_id, account_id, category_id, txn_date, flow_type, amount)
+            VALUES (1, 1, :cid, :d, 'Spending', :amt)
+        """), [{"cid": 1, "d": d, "amt": 70} for d in mondays]
+            + [{"cid": 2, "d": date(2025, 7, 2), "amt": 32}])
+        rollup.rebuild(conn)
+
+        projected = project_month_end(conn, 1, [1, 2], today)
+
+    # food：MTD 140，日均 0.5×140/16 + 0.5×10 = 9.375，剩余 2 个周一、周一系数 7
+    assert projected[1] == 140 + 9.375 * 7 * 2
+    # transport：MTD 32，日均 0.5×2 + 0.5×32/56，剩余 2 个周三、周三系数 7
+    assert projected[2] == 50.0
+
+def test_get_budget_includes_projection(client):
+    """GET /api/budget 每个分类附带 projected，并返回 projectedTotal"""
+    client.put("/api/budget", json={"categories": [{"category": "food", "budgeted": 1000}]})
+    client.post("/api/transactions", json={
+        "amount": -30, "type": "expense", "category": "food",
+        "date": date.today().isoformat()
+    })
+    data = client.get("/api/budget").get_json()["data"]
+    food = data["categories"][0]
+    assert food["projected"] >= food["spent"] == 30
+    assert data["projectedTotal"] == food["projected"]
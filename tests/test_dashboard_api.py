@@ -0,0 +1,278 @@
+# tests/test_dashboard_api.py
+
+import pytest
+from sqlalchemy import text
+from datetime import date
+
+from backend.app import create_app
+from backend.utils.cache import LocalCache
+from backend.utils.db import create_test_engine
+from backend.modules.investments.valuation import rebuild_latest_prices
+from backend.modules.transactions import rollup
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_test_engine(tmp_path)
+    today = date.today()
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE accounts (
+                account_id      INTEGER PRIMARY KEY,
+                user_id         INTEGER NOT NULL,
+                account_name    TEXT    NOT NULL,
+                current_balance REAL    NOT NULL DEFAULT 0
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE categories (
+                category_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+                name          TEXT    NOT NULL UNIQUE,
+                flow_type     TEXT    NOT NULL
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE transactions (
+                transaction_id  INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id         INTEGER NOT NULL,
+                account_id      INTEGER NOT NULL,
+                category_id     INTEGER NOT NULL,
+                txn_date        DATE    NOT NULL,
+                flow_type       TEXT    NOT NULL,
+                amount          REAL    NOT NULL,
+                description     TEXT
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE budgets (
+                budget_id       INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id         INTEGER NOT NULL,
+                category_id     INTEGER NOT NULL,
+                period_start    DATE    NOT NULL,
+                budget_amount   REAL    NOT NULL,
+                alert_threshold REAL    DEFAULT 1.0,
+                UNIQUE (user_id, category_id, period_start)
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE monthly_category_rollup (
+                user_id         INTEGER NOT NULL,
+                category_id     INTEGER NOT NULL,
+                month           DATE    NOT NULL,
+                flow_type       TEXT    NOT NULL,
+                total_amount    REAL    NOT NULL DEFAULT 0,
+                txn_count       INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, month, category_id, flow_type)
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE daily_category_rollup (
+                user_id         INTEGER NOT NULL,
+                category_id     INTEGER NOT NULL,
+                day             DATE    NOT NULL,
+                flow_type       TEXT    NOT NULL,
+                total_amount    REAL    NOT NULL DEFAULT 0,
+                txn_count       INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, day, category_id, flow_type)
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE budget_alerts (
+                alert_id        INTEGER PRIMARY KEY AUTOINCREMENT,
+                budget_id       INTEGER NOT NULL UNIQUE,
+                user_id         INTEGER NOT NULL,
+                category_id     INTEGER NOT NULL,
+                period_start    DATE    NOT NULL,
+                budget_amount   REAL    NOT NULL,
+                alert_threshold REAL    NOT NULL,
+                spent_amount    REAL    NOT NULL,
+                triggered_at    DATETIME DEFAULT CURRENT_TIMESTAMP,
+                acknowledged    BOOLEAN NOT NULL DEFAULT 0
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE goals (
+                goal_id            INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id            INTEGER NOT NULL,
+                goal_name          TEXT NOT NULL,
+                target_amount      REAL NOT NULL,
+                current_amount     REAL NOT NULL DEFAULT 0,
+                deadline           DATE,
+                priority           TEXT NOT NULL DEFAULT 'MEDIUM',
+                goal_type          TEXT NOT NULL,
+                is_active          BOOLEAN NOT NULL DEFAULT 1,
+                linked_account_id  INTEGER,
+                linked_category_id INTEGER
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE holdings (
+                holding_id    INTEGER PRIMARY KEY,
+                user_id       INTEGER NOT NULL,
+                account_id    INTEGER NOT NULL,
+                product_name  TEXT,
+                asset_type    TEXT    NOT NULL,
+                quantity      REAL    NOT NULL,
+                unit_cost     REAL    NOT NULL
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE holding_prices (
+                holding_id    INTEGER NOT NULL,
+                price_date    DATE    NOT NULL,
+                close_price   REAL    NOT NULL,
+                PRIMARY KEY (holding_id, price_date)
+            )
+        """))
+
+        conn.execute(text("""
+            CREATE TABLE holding_latest_price (
+                holding_id    INTEGER PRIMARY KEY,
+                price_date    DATE    NOT NULL,
+                close_price   REAL    NOT NULL
+            )
+        """))
+
+        conn.execute(text("INSERT INTO accounts VALUES (1, 1, '储蓄卡', 5000), (2, 1, '信用卡', -1200)"))
+        conn.execute(text("INSERT INTO categories (name, flow_type) VALUES ('food', 'Spending'), ('salary', 'Income')"))
+        conn.execute(text("""
+            INSERT INTO transactions (user_id, account_id, category_id, txn_date, flow_type, amount, description)
+            VALUES (1, 1, 1, :d, 'Spending', 300, '聚餐'),
+                   (1, 1, 2, :d, 'Income', 8000, '工资')
+        """), {"d": today.replace(day=1)})
+        conn.execute(text("""
+            INSERT INTO budgets (user_id, category_id, period_start, budget_amount)
+            VALUES (1, 1, :m, 1000)
+        """), {"m": today.replace(day=1)})
+        conn.execute(text("INSERT INTO holdings VALUES (1, 1, 1, '沪深300ETF', 'ETF', 100, 4.0)"))
+        conn.execute(text("""
+            INSERT INTO holding_prices VALUES (1, '2024-01-14', 4.2), (1, '2024-01-15', 5.0)
+        """))
+        rollup.rebuild(conn)
+        rebuild_latest_prices(conn)
+    return engine
+
+
+def _dashboard(engine, **config):
+    app = create_app({'TESTING': True, 'DB_ENGINE': engine, 'DASHBOARD_CACHE': False, **config})
+    with app.test_client() as c:
+        rv = c.get('/api/dashboard')
+    assert rv.status_code == 200
+    return rv.get_json()["data"]
+
+
+def test_dashboard_sections(engine):
+    """各区块数据正确合并"""
+    data = _dashboard(engine)
+    assert data["totalBalance"] == 3800
+    assert data["monthlyIncome"] == 8000
+    assert data["monthlyExpenses"] == 300
+    assert data["savingsRate"] == 96.25
+    assert data["budgetProgress"] == [
+        {"category": "food", "budgeted": 1000.0, "spent": 300.0, "percentage": 30.0}
+    ]
+    assert len(data["recentTransactions"]) == 2
+    assert data["investmentSummary"][0]["currentPrice"] == 5.0
+    assert data["investmentSummary"][0]["return"] == 25.0
+
+
+def test_dashboard_serial_matches_concurrent(engine):
+    """DASHBOARD_CONCURRENT = False 时串行执行，结果与并发模式一致"""
+    assert _dashboard(engine, DASHBOARD_CONCURRENT=False) == _dashboard(engine, DASHBOARD_MAX_WORKERS=2)
+
+
+class FakeRedis:
+    """测试用的 redis 风格本地替身"""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value
+
+    def incr(self, key):
+        self.store[key] = int(self.store.get(key, 0)) + 1
+        return self.store[key]
+
+
+@pytest.mark.parametrize("config", [{}, {"CACHE_CLIENT": FakeRedis()}], ids=["local", "shared"])
+def test_dashboard_cache_invalidated_by_writes(engine, config):
+    """结果按用户缓存；直接改库不可见，经写接口写入后版本号递增，立即返回新数据"""
+    app = create_app({'TESTING': True, 'DB_ENGINE': engine, **config})
+    with app.test_client() as c:
+        first = c.get('/api/dashboard').get_json()["data"]
+
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE accounts SET current_balance = 0"))
+        assert c.get('/api/dashboard').get_json()["data"] == first
+
+        rv = c.post('/api/transactions', json={
+            "amount": -200, "type": "expense", "category": "food",
+            "date": date.today().isoformat()
+        })
+        assert rv.status_code == 201
+        data = c.get('/api/dashboard').get_json()["data"]
+        assert data["totalBalance"] == 0
+        assert data["monthlyExpenses"] == 500
+        assert data["budgetProgress"][0]["spent"] == 500
+
+        c.put('/api/budget', json={"categories": [{"category": "food", "budgeted": 2000}]})
+        assert c.get('/api/dashboard').get_json()["data"]["budgetProgress"][0]["budgeted"] == 2000
+
+
+def test_local_cache_lru_and_ttl():
+    cache = LocalCache(maxsize=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    assert cache.get("a") == 1          # a 变为最近使用
+    cache.set("c", 3, ttl=60)           # 淘汰最久未用的 b
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    cache.set("d", 4, ttl=0)
+    assert cache.get("d") is None       # 已过期
+
+    # 版本号不参与淘汰
+    assert cache.incr("v") == 1
+    for i in range(5):
+        cache.set(f"k{i}", i, ttl=60)
+    assert cache.counter("v") == 1
+
+
+def test_dashboard_sections_param(engine):
+    """?sections= 只返回（并只查询）指定区块"""
+    app = create_app({'TESTING': True, 'DB_ENGINE': engine})
+    with app.test_client() as c:
+        data = c.get('/api/dashboard?sections=recentTransactions').get_json()["data"]
+        assert list(data) == ["recentTransactions"]
+
+        data = c.get('/api/dashboard?sections=balance,monthly').get_json()["data"]
+        assert data == {
+            "totalBalance": 3800, "monthlyIncome": 8000,
+            "monthlyExpenses": 300, "savingsRate": 96.25
+        }
+
+        # 未选中的区块不执行查询：删掉其依赖的表也不影响
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE holding_latest_price"))
+        rv = c.get('/api/dashboard?sections=budgetProgress,recentTransactions')
+        assert rv.status_code == 200
+        assert set(rv.get_json()["data"]) == {"budgetProgress", "recentTransactions"}
+
+        rv = c.get('/api/dashboard?sections=balance,nope')
+        assert rv.status_code == 400
+        assert "nope" in rv.get_json()["error"]
+
+
+def test_dashboard_includes_unpriced_holdings(engine):
+    """没有价格的持仓按成本价计入投资概览，与 /api/investments 口径一致"""
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO holdings VALUES (2, 1, 1, '新基金', 'FUND', 10, 3.0)"))
+    summary = _dashboard(engine)["investmentSummary"]
+    assert [h["id"] for h in summary] == [1, 2]
+    assert summary[1]["currentPrice"] == 3.0
+    assert summary[1]["currentValue"] == 30.0
+    assert summary[1]["return"] == 0
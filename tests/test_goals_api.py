@@ -29,7 +29,49 @@ def client(tmp_path):
                 deadline DATE,
                 priority VARCHAR(20) NOT NULL,
                 goal_type VARCHAR(50) NOT NULL,
-                is_active BOOLEAN NOT NULL DEFAULT TRUE
+                is_active BOOLEAN NOT NULL DEFAULT TRUE,
+                linked_account_id BIGINT,
+                linked_category_id BIGINT
+            )
+        """))
+        
+        conn.execute(text("""
+            CREATE TABLE accounts (
+                account_id BIGINT PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                account_name VARCHAR(60) NOT NULL
+            )
+        """))
+        
+        conn.execute(text("""
+            CREATE TABLE categories (
+                category_id BIGINT PRIMARY KEY,
+                name VARCHAR(40) NOT NULL,
+                flow_type VARCHAR(20) NOT NULL
+            )
+        """))
+        
+        conn.execute(text("""
+            CREATE TABLE transactions (
+                transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id BIGINT NOT NULL,
+                account_id BIGINT NOT NULL,
+                category_id BIGINT NOT NULL,
+                txn_date DATE NOT NULL,
+                flow_type VARCHAR(20) NOT NULL,
+                amount DECIMAL(12,2) NOT NULL
+            )
+        """))
+        
+        conn.execute(text("""
+            CREATE TABLE monthly_category_rollup (
+                user_id         INTEGER NOT NULL,
+                category_id     INTEGER NOT NULL,
+                month           DATE    NOT NULL,
+                flow_type       TEXT    NOT NULL,
+                total_amount    REAL    NOT NULL DEFAULT 0,
+                txn_count       INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, month, category_id, flow_type)
             )
         """))
         
@@ -277,4 +319,166 @@ def test_delete_goal_not_found(client):
     
     data = response.get_json()
     assert data['success'] is False
-    assert '目标不存在' in data['error'] 
\ No newline at end of file
+    assert '目标不存在' in data['error']
+
+
+def _seed_monthly_savings(client, income, spending, months=12):
+    """在月度汇总表中写入过去 months 个完整月份的收入与支出"""
+    engine = client.application.config['DB_ENGINE']
+    first = date.today().replace(day=1)
+    with engine.begin() as conn:
+        for i in range(1, months + 1):
+            index = first.year * 12 + first.month - 1 - i
+            month = date(index // 12, index % 12 + 1, 1)
+            conn.execute(text("""
+                INSERT OR REPLACE INTO monthly_category_rollup
+                  (user_id, category_id, month, flow_type, total_amount, txn_count)
+                VALUES (1, 1, :m, 'Income', :income, 1), (1, 2, :m, 'Spending', :spending, 1)
+            """), {"m": month, "income": income, "spending": spending})
+
+
+def test_get_goals_projection(client):
+    """测试目标达成概率预测：月储蓄足够时全部达成，不足时全部无法达成"""
+    _seed_monthly_savings(client, income=25000, spending=5000)
+    response = client.get('/api/goals?projection=true&paths=500')
+    assert response.status_code == 200
+
+    data = response.get_json()['data']
+    assert data['statistics']['monthlySavings'] == {"months": 12, "mean": 20000.0, "std": 0.0}
+    for goal in data['goals']:
+        assert goal['projection']['probability'] == 1.0
+        assert goal['projection']['monthsRemaining'] > 0
+        assert goal['projection']['medianAmount'] >= goal['targetAmount']
+
+    # 普通模式不附加预测
+    plain = client.get('/api/goals').get_json()['data']
+    assert 'projection' not in plain['goals'][0]
+    assert 'monthlySavings' not in plain['statistics']
+
+
+def test_get_goals_projection_cached_until_version_bump(client):
+    """测试预测结果按用户数据版本号缓存"""
+    from backend.utils.cache import bump_user_version
+
+    _seed_monthly_savings(client, income=6000, spending=5000)
+    first = client.get('/api/goals?projection=true&paths=500').get_json()['data']
+    assert all(g['projection']['probability'] == 0.0 for g in first['goals'])
+
+    # 直接改库不会使缓存失效
+    _seed_monthly_savings(client, income=25000, spending=5000)
+    cached = client.get('/api/goals?projection=true&paths=500').get_json()['data']
+    assert cached == first
+
+    with client.application.app_context():
+        bump_user_version(1)
+    fresh = client.get('/api/goals?projection=true&paths=500').get_json()['data']
+    assert all(g['projection']['probability'] == 1.0 for g in fresh['goals'])
+
+
+def test_get_goals_projection_without_history(client):
+    """测试历史不足时概率为空，以及非法的 paths 参数"""
+    data = client.get('/api/goals?projection=true').get_json()['data']
+    assert data['statistics']['monthlySavings']['months'] == 0
+    assert all(g['projection']['probability'] is None for g in data['goals'])
+
+    response = client.get('/api/goals?projection=true&paths=abc')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_simulate_goals_in_chunks(monkeypatch):
+    """测试分批模拟：批大小不影响结果，50 年期限、最多路径数也只占用有限内存"""
+    import tracemalloc
+    import numpy as np
+    from backend.modules.goals import projection
+
+    today = date(2026, 1, 15)
+    goals = [
+        {'targetAmount': 1e6, 'currentAmount': 0, 'deadline': date(2075, 12, 1), 'isActive': True},
+        {'targetAmount': 5e4, 'currentAmount': 0, 'deadline': date(2029, 1, 1), 'isActive': True},
+        {'targetAmount': 8e4, 'currentAmount': 1e4, 'deadline': date(2029, 1, 1), 'isActive': True},
+    ]
+    savings = np.array([1000.0, 2000.0, -500.0, 3000.0, 800.0])
+
+    whole = projection.simulate_goals(goals, savings, today, paths=2000, seed=7)
+    monkeypatch.setattr(projection, 'SIMULATION_CHUNK_CELLS', 1000)
+    assert projection.simulate_goals(goals, savings, today, paths=2000, seed=7) == whole
+
+    monkeypatch.undo()
+    tracemalloc.start()
+    projection.simulate_goals(goals, savings, today, paths=100000, seed=7)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert peak < 200 * 1024 * 1024
+
+
+def _seed_link_data(client):
+    """账户 1（用户 1）、账户 2（其他用户）、储蓄分类 1，以及几笔历史交易"""
+    engine = client.application.config['DB_ENGINE']
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO accounts VALUES (1, 1, '储蓄卡'), (2, 2, '他人账户')"))
+        conn.execute(text("INSERT INTO categories VALUES (1, '储蓄', 'Spending'), (2, '工资', 'Income')"))
+        conn.execute(text("""
+            INSERT INTO transactions (user_id, account_id, category_id, txn_date, flow_type, amount) VALUES
+              (1, 1, 2, '2025-01-05', 'Income',   8000),
+              (1, 1, 1, '2025-01-06', 'Spending', 3000),
+              (1, 1, 1, '2025-02-06', 'Spending', 2000),
+              (1, 1, 1, '2025-02-20', 'Income',    500)
+        """))
+
+
+def test_link_goal_seeds_progress(client):
+    """测试关联账户 / 分类时按历史交易计算初始进度，取消关联后保留金额"""
+    _seed_link_data(client)
+
+    # 账户：流入 8000 + 500，流出 3000 + 2000
+    response = client.put('/api/goals/2/link', json={"accountId": 1})
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['linkedAccountId'] == 1
+    assert data['currentAmount'] == 3500
+
+    # 储蓄分类：转入 3000 + 2000，取出 500
+    response = client.put('/api/goals/3/link', json={"categoryId": 1})
+    assert response.get_json()['data']['currentAmount'] == 4500
+
+    goals = {g['id']: g for g in client.get('/api/goals').get_json()['data']['goals']}
+    assert goals['2']['currentAmount'] == 3500
+    assert goals['2']['linkedAccountId'] == 1
+    assert goals['3']['linkedCategoryId'] == 1
+
+    # 关联目标不能手动更新进度
+    response = client.put('/api/goals/2/progress', json={"currentAmount": 100})
+    assert response.status_code == 400
+
+    # 取消关联
+    response = client.put('/api/goals/2/link', json={"accountId": None})
+    assert response.get_json()['data'] == {
+        "id": 2, "linkedAccountId": None, "linkedCategoryId": None, "currentAmount": 3500
+    }
+
+
+def test_link_goal_validation(client):
+    """测试关联参数校验"""
+    _seed_link_data(client)
+    assert client.put('/api/goals/1/link', json={"accountId": 1, "categoryId": 1}).status_code == 400
+    assert client.put('/api/goals/1/link', json={"accountId": 2}).status_code == 400
+    assert client.put('/api/goals/1/link', json={"categoryId": 99}).status_code == 400
+    assert client.put('/api/goals/999/link', json={"accountId": 1}).status_code == 404
+
+
+def test_create_linked_goal(client):
+    """测试创建时直接关联账户"""
+    _seed_link_data(client)
+    response = client.post('/api/goals', json={
+        "name": "应急金账户",
+        "targetAmount": 10000,
+        "deadline": "2030-12-31T00:00:00Z",
+        "priority": "high",
+        "type": "emergency",
+        "linkedAccountId": 1
+    })
+    assert response.status_code == 201
+    goal = next(g for g in client.get('/api/goals').get_json()['data']['goals'] if g['name'] == '应急金账户')
+    assert goal['currentAmount'] == 3500
+    assert goal['linkedAccountId'] == 1
@@ -1,5 +1,6 @@
 import pytest
 from backend.app import create_app
+from backend.modules.investments.valuation import rebuild_latest_prices
 from backend.utils.db import create_test_engine
 from sqlalchemy import text
 
@@ -32,6 +33,7 @@ def client(tmp_path):
                 holding_id BIGINT PRIMARY KEY,
                 user_id BIGINT NOT NULL,
                 account_id BIGINT NOT NULL,
+                product_code VARCHAR(30),
                 product_name VARCHAR(80),
                 asset_type VARCHAR(20) NOT NULL,
                 quantity DECIMAL(18,6) NOT NULL,
@@ -48,6 +50,14 @@ def client(tmp_path):
             )
         """))
         
+        conn.execute(text("""
+            CREATE TABLE holding_latest_price (
+                holding_id BIGINT PRIMARY KEY,
+                price_date DATE NOT NULL,
+                close_price DECIMAL(12,4) NOT NULL
+            )
+        """))
+        
         # 插入测试数据
         conn.execute(text("INSERT INTO users (user_id, username) VALUES (1, 'testuser')"))
         conn.execute(text("INSERT INTO accounts (account_id, user_id, account_name, account_type) VALUES (1, 1, '投资账户', 'Investment')"))
@@ -73,6 +83,7 @@ def client(tmp_path):
             INSERT INTO holding_prices (holding_id, price_date, close_price)
             VALUES (2, '2024-01-15', 2.08)
         """))
+        rebuild_latest_prices(conn)
     
     # 3) 创建 Flask 应用
     app = create_app({'DB_ENGINE': engine})
@@ -184,4 +195,245 @@ def test_create_investment_invalid_data(client):
                           json=investment_data,
                           content_type='application/json')
     
-    assert response.status_code == 500  # 应该返回500错误 
\ No newline at end of file
+    assert response.status_code == 500  # 应该返回500错误 
+def test_record_prices_advances_latest_only_forward(client):
+    """写入价格时同步推进最新价；补录的旧价格不会覆盖更新的报价"""
+    from backend.modules.investments.valuation import record_prices, value_holdings
+
+    engine = client.application.config['DB_ENGINE']
+    with engine.begin() as conn:
+        record_prices(conn, [
+            {"holding_id": 1, "price_date": "2024-01-16", "close_price": 28.0},
+            {"holding_id": 2, "price_date": "2024-01-10", "close_price": 1.5},
+        ])
+        conn.execute(text("""
+            INSERT INTO holdings (holding_id, user_id, account_id, product_name, asset_type, quantity, unit_cost)
+            VALUES (3, 1, 1, '未定价基金', 'FUND', 10, 3.0)
+        """))
+        holdings = {h["holding_id"]: h for h in value_holdings(conn, 1)}
+
+    assert holdings[1]["price"] == 28.0
+    assert str(holdings[1]["price_date"]) == "2024-01-16"
+    assert holdings[2]["price"] == 2.08          # 1/10 早于 1/15，最新价不变
+    # 无价格的持仓按成本价计入
+    assert holdings[3]["priced"] is False
+    assert holdings[3]["market_value"] == 30.0
+
+    response = client.get('/api/investments')
+    summary = response.get_json()['data']['summary']
+    assert summary['totalValue'] == 28000 + 9000 * 2.08 + 30
+
+def test_get_investment_history(client):
+    """组合价值序列：缺失日期向前填充，区间开始前的最后价格作为起点"""
+    engine = client.application.config['DB_ENGINE']
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO holding_prices (holding_id, price_date, close_price) VALUES
+              (1, '2024-01-17', 30.0),
+              (2, '2024-01-18', 2.5)
+        """))
+
+    response = client.get('/api/investments/history?from=2024-01-16&to=2024-01-19')
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['invested'] == 1000 * 25.0 + 9000 * 2.0
+    series = data['series']
+    assert [p['date'] for p in series] == ['2024-01-16', '2024-01-17', '2024-01-18', '2024-01-19']
+    # 1/16 无价格：沿用 1/15 的 27.1 和 2.08
+    assert [p['value'] for p in series] == [45820.0, 48720.0, 52500.0, 52500.0]
+    assert series[0]['return'] == 0
+    assert series[1]['return'] == round((48720 / 45820 - 1) * 100, 4)
+    assert series[-1]['cumulativeReturn'] == round((52500 / 45820 - 1) * 100, 4)
+
+    # 按周取每周最后一天（周一至周日），首周仅包含区间内的日期
+    response = client.get('/api/investments/history?from=2024-01-10&to=2024-01-31&interval=week')
+    dates = [p['date'] for p in response.get_json()['data']['series']]
+    assert dates == ['2024-01-14', '2024-01-21', '2024-01-28', '2024-01-31']
+    # 首个价格之前按成本价估值
+    assert response.get_json()['data']['series'][0]['value'] == data['invested']
+
+    assert client.get('/api/investments/history?interval=hour').status_code == 400
+    assert client.get('/api/investments/history?from=2024-02-01&to=2024-01-01').status_code == 400
+
+def test_get_investment_risk(client):
+    """风险指标：波动率、最大回撤、夏普比率、相关系数矩阵，按价格日期缓存"""
+    from backend.modules.investments.valuation import record_prices
+
+    engine = client.application.config['DB_ENGINE']
+    # 沪深300ETF 交替涨跌 +10% / -10%，债券基金每日 +1%
+    etf, bond = [27.1], [2.08]
+    for _ in range(6):
+        etf.append(etf[-1] * (1.1 if len(etf) % 2 else 0.9))
+        bond.append(bond[-1] * 1.01)
+    with engine.begin() as conn:
+        record_prices(conn, [
+            {"holding_id": hid, "price_date": f"2024-01-{15 + i}", "close_price": p}
+            for hid, series in ((1, etf), (2, bond))
+            for i, p in enumerate(series)
+        ])
+
+    response = client.get('/api/investments/risk?from=2024-01-15&to=2024-01-21')
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['tradingDays'] == 7
+
+    etf_risk, bond_risk = data['holdings']
+    assert etf_risk['volatility'] > 1 and etf_risk['riskLevel'] == 'high'
+    assert etf_risk['maxDrawdown'] == round(0.9 * 0.99 ** 2 - 1, 4)  # 峰值后 ×0.9×1.1×0.9×1.1×0.9
+    assert bond_risk['volatility'] == 0 and bond_risk['maxDrawdown'] == 0
+    assert bond_risk['sharpe'] is None  # 波动为 0 时夏普无定义
+    assert data['correlation']['ids'] == [1, 2]
+    assert data['correlation']['matrix'][0][0] == 1.0
+    assert data['portfolio']['volatility'] > 0
+
+    # 价格未变：直接命中缓存
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM holding_prices WHERE price_date > '2024-01-15'"))
+    assert client.get('/api/investments/risk?from=2024-01-15&to=2024-01-21').get_json()['data'] == data
+
+    # 写入新价格（最新价格日期变化）后重新计算
+    with engine.begin() as conn:
+        record_prices(conn, [{"holding_id": 1, "price_date": "2024-01-22", "close_price": 30}])
+    assert client.get('/api/investments/risk?from=2024-01-15&to=2024-01-21').get_json()['data']['tradingDays'] == 1
+
+def test_import_prices_stream(client):
+    """流式导入价格：按 holding_id 或 product_code 定位持仓，upsert 不清空历史，同步推进最新价"""
+    engine = client.application.config['DB_ENGINE']
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE holdings SET product_code = '510300' WHERE holding_id = 1"))
+
+    body = (
+        "holding_id,product_code,date,close\n"
+        "1,,2024-01-16,27.5\n"
+        ",510300,2024-01-17,28.0\n"
+        "2,,2024-01-15,2.10\n"        # 覆盖已有的同日价格
+        "2,,2024-01-12,1.90\n"        # 补录更早的价格，不影响最新价
+        "9,,2024-01-16,1.0\n"         # 不存在的持仓
+        "1,,bad-date,1.0\n"
+    )
+    response = client.post('/api/investments/prices?chunkSize=2', data=body, content_type='text/csv')
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['upserted'] == 4
+    assert data['failed'] == 2
+    assert sorted(e['row'] for e in data['errors']) == [5, 6]
+
+    with engine.connect() as conn:
+        prices = conn.execute(text(
+            "SELECT holding_id, price_date, close_price FROM holding_prices ORDER BY holding_id, price_date"
+        )).all()
+        latest = dict(conn.execute(text(
+            "SELECT holding_id, close_price FROM holding_latest_price"
+        )).all())
+    assert [tuple(p) for p in prices] == [
+        (1, '2024-01-15', 27.1), (1, '2024-01-16', 27.5), (1, '2024-01-17', 28.0),
+        (2, '2024-01-12', 1.9), (2, '2024-01-15', 2.1),
+    ]
+    assert latest == {1: 28.0, 2: 2.1}
+
+    etf = next(p for p in client.get('/api/investments').get_json()['data']['portfolio'] if p['id'] == '1')
+    assert etf['currentPrice'] == 28.0
+
+    assert client.post('/api/investments/prices', data='x', content_type='text/plain').status_code == 415
+    assert client.post('/api/investments/prices?chunkSize=abc', data=body, content_type='text/csv').status_code == 400
+
+
+def test_import_prices_cli(client, tmp_path):
+    """flask investments import-prices FILE"""
+    path = tmp_path / 'quotes.ndjson'
+    path.write_text(
+        '{"holding_id": 1, "date": "2024-01-18", "close": 29}\n'
+        '{"holding_id": 2, "date": "2024-01-18", "close": 2.2}\n'
+    )
+    result = client.application.test_cli_runner().invoke(args=['investments', 'import-prices', str(path)])
+    assert result.exit_code == 0, result.output
+    assert '2 upserted, 0 failed' in result.output
+
+    engine = client.application.config['DB_ENGINE']
+    with engine.connect() as conn:
+        assert conn.execute(text(
+            "SELECT close_price FROM holding_latest_price WHERE holding_id = 1"
+        )).scalar() == 29
+
+def test_import_prices_numeric_fields(client):
+    """NDJSON 中数字形式的基金代码可以解析，数字日期逐行报错"""
+    engine = client.application.config['DB_ENGINE']
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE holdings SET product_code = '510300' WHERE holding_id = 1"))
+
+    body = (
+        '{"product_code": 510300, "date": "2024-01-19", "close": 30}\n'
+        '{"product_code": 510300, "date": 20240120, "close": 31}\n'
+    )
+    response = client.post('/api/investments/prices', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['upserted'] == 1
+    assert [e['row'] for e in data['errors']] == [2]
+
+    with engine.connect() as conn:
+        assert conn.execute(text(
+            "SELECT close_price FROM holding_latest_price WHERE holding_id = 1"
+        )).scalar() == 30
+
+def _seed_price_walk(engine, days=40):
+    """两个持仓的价格走势：ETF 高波动高收益，债券基金低波动"""
+    from datetime import date, timedelta
+    from backend.modules.investments.valuation import record_prices
+
+    etf, bond, rows = 27.1, 2.08, []
+    for i in range(days):
+        d = (date(2024, 1, 16) + timedelta(days=i)).isoformat()
+        etf *= 1.06 if i % 2 else 0.96
+        bond *= 1.002 if i % 3 else 0.999
+        rows += [
+            {"holding_id": 1, "price_date": d, "close_price": round(etf, 4)},
+            {"holding_id": 2, "price_date": d, "close_price": round(bond, 4)},
+        ]
+    with engine.begin() as conn:
+        record_prices(conn, rows)
+
+
+def test_get_rebalance_plan(client):
+    """蒙特卡洛有效前沿与调仓建议"""
+    client.application.config['REBALANCE_WORKERS'] = 0
+    _seed_price_walk(client.application.config['DB_ENGINE'])
+
+    url = '/api/investments/rebalance?from=2024-01-15&to=2024-02-29&samples=5000&seed=7'
+    data = client.get(url).get_json()['data']
+    frontier = data['frontier']
+    assert len(frontier) > 1
+    vols = [p['volatility'] for p in frontier]
+    rets = [p['expectedReturn'] for p in frontier]
+    assert vols == sorted(vols) and rets == sorted(rets)
+    # 默认目标为当前组合波动率
+    assert data['target']['requestedVolatility'] == data['current']['volatility']
+    assert data['target']['volatility'] <= data['current']['volatility']
+    assert data['target']['expectedReturn'] >= data['current']['expectedReturn'] - 1e-4
+
+    trades = data['trades']
+    assert abs(sum(t['targetWeight'] for t in trades) - 1) < 1e-3
+    assert abs(sum(t['tradeValue'] for t in trades)) < 0.05
+    assert client.get(url).get_json()['data'] == data  # 固定 seed 结果可复现
+
+    # 目标波动率极低：几乎全部配置到低波动的债券基金
+    data = client.get(url + '&targetVolatility=0').get_json()['data']
+    bond = next(t for t in data['trades'] if t['id'] == 2)
+    assert bond['targetWeight'] > 0.9 and bond['action'] == 'buy'
+
+    assert client.get('/api/investments/rebalance?samples=0').status_code == 400
+    # 价格不足
+    assert client.get('/api/investments/rebalance?from=2023-01-01&to=2023-02-01').status_code == 400
+
+
+def test_rebalance_on_process_pool(client):
+    """REBALANCE_WORKERS > 0 时模拟在进程池中执行"""
+    client.application.config['REBALANCE_WORKERS'] = 2
+    _seed_price_walk(client.application.config['DB_ENGINE'])
+    try:
+        response = client.get('/api/investments/rebalance?from=2024-01-15&to=2024-02-29&samples=2000&seed=1')
+        assert response.status_code == 200
+        assert len(response.get_json()['data']['frontier']) > 1
+        assert 'rebalance_pool' in client.application.extensions
+    finally:
+        client.application.extensions.pop('rebalance_pool').shutdown()
@@ -1,5 +1,6 @@
 import pytest
 from backend.app import create_app
+from backend.modules.transactions import rollup
 from backend.utils.db import create_test_engine
 from sqlalchemy import text
 
@@ -37,6 +38,29 @@ def client(tmp_path):
             )
         """))
         
+        conn.execute(text("""
+            CREATE TABLE monthly_category_rollup (
+                user_id BIGINT NOT NULL,
+                category_id BIGINT NOT NULL,
+                month DATE NOT NULL,
+                flow_type VARCHAR(20) NOT NULL,
+                total_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+                txn_count INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, month, category_id, flow_type)
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE daily_category_rollup (
+                user_id BIGINT NOT NULL,
+                category_id BIGINT NOT NULL,
+                day DATE NOT NULL,
+                flow_type VARCHAR(20) NOT NULL,
+                total_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+                txn_count INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, day, category_id, flow_type)
+            )
+        """))
+        
         # 插入测试数据
         conn.execute(text("INSERT INTO users (user_id, username) VALUES (1, 'testuser')"))
         
@@ -72,6 +96,9 @@ def client(tmp_path):
             INSERT INTO transactions (transaction_id, user_id, category_id, txn_date, flow_type, amount)
             VALUES (5, 1, 4, '2024-02-20', 'Spending', 3000)
         """))
+        
+        # 直接写库绕过了交易写路径，需要重建月度汇总
+        rollup.rebuild(conn)
     
     # 3) 创建 Flask 应用
     app = create_app({'DB_ENGINE': engine})
@@ -201,4 +228,210 @@ def test_tax_rate_calculation():
     assert calculate_tax_rate(100000) == 10  # 10%
     assert calculate_tax_rate(200000) == 20  # 20%
     assert calculate_tax_rate(500000) == 30  # 30%
-    assert calculate_tax_rate(1000000) == 45 # 45% 
\ No newline at end of file
+    assert calculate_tax_rate(1000000) == 45 # 45%
+
+
+def test_get_tax_data_for_year(client):
+    """测试按指定年份计算（半开区间，不含相邻年份）"""
+    engine = client.application.config['DB_ENGINE']
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO transactions (transaction_id, user_id, category_id, txn_date, flow_type, amount)
+            VALUES (6, 1, 1, '2023-12-31', 'Income', 9999), (7, 1, 4, '2025-01-01', 'Spending', 777)
+        """))
+        rollup.rebuild(conn)
+
+    data = client.get('/api/tax?year=2024').get_json()['data']
+    assert data['year'] == 2024
+    assert data['annualIncome'] == 80000
+    assert data['paidTax'] == 5000
+
+    assert client.get('/api/tax?year=abc').status_code == 400
+
+
+def test_get_tax_history(client):
+    """测试多年收入 / 已缴税款历史，及按数据版本号缓存"""
+    from datetime import date
+    from backend.utils.cache import bump_user_version
+
+    current_year = date.today().year
+    response = client.get(f'/api/tax/history?years={current_year - 2022}')
+    assert response.status_code == 200
+    years = response.get_json()['data']['years']
+    assert [y['year'] for y in years] == list(range(2023, current_year + 1))
+    assert years[0] == {'year': 2023, 'income': 0, 'paidTax': 0}
+    assert years[1] == {'year': 2024, 'income': 80000, 'paidTax': 5000}
+
+    # 直接改库不会使缓存失效，递增数据版本号后重新汇总
+    engine = client.application.config['DB_ENGINE']
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO transactions (transaction_id, user_id, category_id, txn_date, flow_type, amount)
+            VALUES (6, 1, 3, '2024-06-01', 'Spending', 1000)
+        """))
+        rollup.rebuild(conn)
+    url = f'/api/tax/history?years={current_year - 2022}'
+    assert client.get(url).get_json()['data']['years'][1]['paidTax'] == 5000
+    with client.application.app_context():
+        bump_user_version(1)
+    assert client.get(url).get_json()['data']['years'][1]['paidTax'] == 6000
+
+    assert client.get('/api/tax/history?years=0').status_code == 400
+
+
+def test_bracket_table_quick_deductions():
+    """测试速算扣除数由税率表累计得出，且与逐档累加的税额一致"""
+    from backend.modules.tax.brackets import ANNUAL_BRACKETS, MONTHLY_BRACKETS
+
+    assert list(ANNUAL_BRACKETS.quick_deductions) == [0, 2520, 16920, 31920, 52920, 85920, 181920]
+    assert list(MONTHLY_BRACKETS.quick_deductions) == [0, 210, 1410, 2660, 4410, 7160, 15160]
+
+    def by_brackets(amount):
+        bounds = [0] + list(ANNUAL_BRACKETS.thresholds) + [float('inf')]
+        return sum(
+            max(0, min(amount, hi) - lo) * rate
+            for lo, hi, rate in zip(bounds, bounds[1:], ANNUAL_BRACKETS.rates)
+        )
+
+    amounts = [0, 36000, 36001, 144000, 250000, 420000, 700000, 960000, 2000000]
+    for amount, tax in zip(amounts, ANNUAL_BRACKETS.tax(amounts)):
+        assert round(tax, 2) == round(by_brackets(amount), 2)
+
+
+def test_tax_scenarios(client):
+    """测试批量试算"""
+    response = client.post('/api/tax/scenarios', json={"scenarios": [
+        {"income": 200000, "deductions": 60000, "contributions": 12000},
+        {"income": 30000},
+        {"income": 200000, "deductions": 60000, "bonus": 36001},
+    ]})
+    assert response.status_code == 200
+    results = response.get_json()['data']['results']
+    assert len(results) == 3
+
+    # 128000 × 10% - 2520
+    assert results[0]['taxableIncome'] == 128000
+    assert results[0]['tax'] == 10280
+    assert results[0]['marginalRate'] == 10
+    assert results[0]['afterTaxIncome'] == 200000 - 10280
+    assert results[1]['tax'] == 900
+    # 年终奖单独计税：36001 / 12 落入 10% 档，扣除 210
+    assert results[2]['bonusTax'] == 3390.1
+    assert results[2]['tax'] == round(140000 * 0.1 - 2520 + 3390.1, 2)
+
+
+def test_tax_scenarios_many(client):
+    """测试大批量情景一次计算，且与单个计算结果一致"""
+    from backend.modules.tax.brackets import ANNUAL_BRACKETS
+
+    incomes = [i * 150 for i in range(10000)]
+    response = client.post('/api/tax/scenarios', json={
+        "scenarios": [{"income": income, "deductions": 60000} for income in incomes]
+    })
+    results = response.get_json()['data']['results']
+    assert len(results) == 10000
+    for income, result in zip(incomes[::997], results[::997]):
+        assert result['tax'] == round(float(ANNUAL_BRACKETS.tax(max(income - 60000, 0))), 2)
+
+
+def test_tax_scenarios_validation(client):
+    """测试试算参数校验"""
+    assert client.post('/api/tax/scenarios', json={}).status_code == 400
+    assert client.post('/api/tax/scenarios', json={"scenarios": [{"deductions": 1}]}).status_code == 400
+    response = client.post('/api/tax/scenarios', json={"scenarios": [{"income": 1}, {"income": "abc"}]})
+    assert response.status_code == 400
+    assert '第 1 个情景' in response.get_json()['error']
+    assert client.post('/api/tax/scenarios', json={"scenarios": [{"income": -5}]}).status_code == 400
+
+
+def test_builtin_rules_reproduce_defaults(client):
+    """测试内置规则文件给出原有的抵扣项目与建议"""
+    data = client.get('/api/tax?year=2024').get_json()['data']
+    assert data['rulesVersion'] == 1
+    assert data['deductions'] == [
+        {"name": "住房贷款利息", "amount": 12000, "status": "available"},
+        {"name": "子女教育", "amount": 8000, "status": "available"},
+        {"name": "赡养老人", "amount": 6000, "status": "available"},
+        {"name": "继续教育", "amount": 4000, "status": "pending"},
+        {"name": "大病医疗", "amount": 15000, "status": "unavailable"},
+    ]
+
+    from backend.modules.tax.rules import DEFAULT_RULES_PATH, load_rule_set
+    recommendations = load_rule_set(DEFAULT_RULES_PATH).evaluate_recommendations({
+        "annual_income": 200000, "taxable_income": 174000, "total_deductions": 26000, "difference": 6000
+    })
+    assert [r['title'] for r in recommendations] == ["慈善捐赠", "投资损失抵扣", "年终奖优化"]
+    assert recommendations[0]['savings'] == 750
+    assert recommendations[0]['description'] == "通过慈善捐赠获得税前扣除，建议捐赠金额 ¥5000，可节省税款 ¥750"
+
+
+def test_rules_from_file_use_category_totals(client, tmp_path):
+    """测试从配置的规则文件读取，按分类年度合计求值，文件修改后自动重新编译"""
+    import json, os
+
+    rules_file = tmp_path / "rules.json"
+    def write_rules(version, cap):
+        rules_file.write_text(json.dumps({
+            "version": version,
+            "deductions": [{
+                "name": "奖金专项",
+                "amount": f"min({cap}, income['奖金'] * 0.1)",
+                "when": "spending['个人所得税'] > 0",
+                "status": "available",
+                "otherwise": "unavailable"
+            }],
+            "recommendations": [{
+                "title": "已缴税款",
+                "when": "paid_tax > 0",
+                "let": {"share": "paid_tax / annual_income * 100"},
+                "description": "已缴税款占收入 {share:.1f}%",
+                "savings": "0",
+                "priority": "low"
+            }]
+        }, ensure_ascii=False), encoding='utf-8')
+
+    write_rules(1, 3000)
+    client.application.config['TAX_RULES_PATH'] = str(rules_file)
+    data = client.get('/api/tax?year=2024').get_json()['data']
+    assert data['rulesVersion'] == 1
+    assert data['deductions'] == [{"name": "奖金专项", "amount": 3000, "status": "available"}]
+    assert data['recommendations'][0]['description'] == "已缴税款占收入 6.2%"
+
+    write_rules(2, 4000)
+    stat = os.stat(rules_file)
+    os.utime(rules_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    data = client.get('/api/tax?year=2024').get_json()['data']
+    assert data['rulesVersion'] == 2
+    assert data['deductions'][0]['amount'] == 4000
+
+    # 改坏的文件不会影响线上请求，继续使用上一版
+    rules_file.write_text('{"version": 3, "deductions": [{"name": "x", "amount": "open(1)"}]}')
+    os.utime(rules_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+    assert client.get('/api/tax?year=2024').get_json()['data']['rulesVersion'] == 2
+
+
+def test_rule_expressions_are_restricted():
+    """测试规则表达式与模板只允许白名单语法"""
+    from backend.modules.tax.rules import RuleError, RuleSet
+
+    for expr in ["__import__('os')", "income.__class__", "open('x')", "[1, 2]", "spending[0]", "lambda: 1"]:
+        with pytest.raises(RuleError):
+            RuleSet({"deductions": [{"name": "x", "amount": expr}]})
+    with pytest.raises(RuleError):
+        RuleSet({"recommendations": [{"title": "x", "description": "{income.__class__}"}]})
+    with pytest.raises(RuleError):
+        RuleSet({"deductions": [{"name": "x", "amount": "1", "status": "maybe"}]})
+
+
+def test_check_rules_command(client, tmp_path):
+    """测试规则文件校验命令"""
+    runner = client.application.test_cli_runner()
+    result = runner.invoke(args=["tax", "check-rules"])
+    assert result.exit_code == 0
+    assert "版本 1" in result.output
+
+    bad = tmp_path / "bad.json"
+    bad.write_text('{"deductions": [{"name": "x", "amount": "1 +"}]}')
+    result = runner.invoke(args=["tax", "check-rules", str(bad)])
+    assert result.exit_code != 0
+    assert "语法错误" in result.output
@@ -1,5 +1,6 @@
 # tests/test_transactions_api.py
 
+import json
 import pytest
 from pathlib import Path
 from sqlalchemy import create_engine, text
@@ -27,12 +28,76 @@ def client(tmp_path):
               account_id INTEGER NOT NULL,
               category_id INTEGER NOT NULL,
               txn_date DATE NOT NULL,
+              txn_name TEXT,
+              merchant_name TEXT,
               flow_type TEXT NOT NULL,
               amount REAL NOT NULL,
               description TEXT,
               created_at DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         """))
+        conn.execute(text("""
+            CREATE TABLE monthly_category_rollup (
+              user_id INTEGER NOT NULL,
+              category_id INTEGER NOT NULL,
+              month DATE NOT NULL,
+              flow_type TEXT NOT NULL,
+              total_amount REAL NOT NULL DEFAULT 0,
+              txn_count INTEGER NOT NULL DEFAULT 0,
+              PRIMARY KEY (user_id, month, category_id, flow_type)
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE daily_category_rollup (
+              user_id INTEGER NOT NULL,
+              category_id INTEGER NOT NULL,
+              day DATE NOT NULL,
+              flow_type TEXT NOT NULL,
+              total_amount REAL NOT NULL DEFAULT 0,
+              txn_count INTEGER NOT NULL DEFAULT 0,
+              PRIMARY KEY (user_id, day, category_id, flow_type)
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE budgets (
+              budget_id INTEGER PRIMARY KEY AUTOINCREMENT,
+              user_id INTEGER NOT NULL,
+              category_id INTEGER NOT NULL,
+              period_start DATE NOT NULL,
+              budget_amount REAL NOT NULL,
+              alert_threshold REAL DEFAULT 1.0,
+              UNIQUE (user_id, category_id, period_start)
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE budget_alerts (
+              alert_id INTEGER PRIMARY KEY AUTOINCREMENT,
+              budget_id INTEGER NOT NULL UNIQUE,
+              user_id INTEGER NOT NULL,
+              category_id INTEGER NOT NULL,
+              period_start DATE NOT NULL,
+              budget_amount REAL NOT NULL,
+              alert_threshold REAL NOT NULL,
+              spent_amount REAL NOT NULL,
+              triggered_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+              acknowledged BOOLEAN NOT NULL DEFAULT 0
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE goals (
+              goal_id INTEGER PRIMARY KEY AUTOINCREMENT,
+              user_id INTEGER NOT NULL,
+              goal_name TEXT NOT NULL,
+              target_amount REAL NOT NULL,
+              current_amount REAL NOT NULL DEFAULT 0,
+              deadline DATE,
+              priority TEXT NOT NULL DEFAULT 'MEDIUM',
+              goal_type TEXT NOT NULL,
+              is_active BOOLEAN NOT NULL DEFAULT 1,
+              linked_account_id INTEGER,
+              linked_category_id INTEGER
+            )
+        """))
 
     # 3) 插入样例类别
     with engine.begin() as conn:
@@ -106,3 +171,415 @@ def test_crud_transactions(client):
     # 6) 确认已删除
     rv6 = client.get("/api/transactions")
     assert rv6.get_json()["data"]["transactions"] == []
+
+def test_cursor_pagination(client):
+    """游标分页：逐页翻到底，结果不重不漏且按日期倒序"""
+    for day in (1, 2, 2, 3, 4):
+        client.post("/api/transactions", json={
+            "amount": 10 * day, "type": "expense", "category": "food",
+            "description": f"d{day}", "date": f"2025-07-0{day}"
+        })
+
+    rv = client.get("/api/transactions?cursor=&limit=2&includeTotal=true")
+    assert rv.status_code == 200
+    page = rv.get_json()["data"]
+    assert page["pagination"]["total"] == 5
+    assert page["pagination"]["hasMore"] is True
+
+    seen = [t["id"] for t in page["transactions"]]
+    cursor = page["pagination"]["nextCursor"]
+    while cursor:
+        page = client.get(f"/api/transactions?cursor={cursor}&limit=2").get_json()["data"]
+        assert "total" not in page["pagination"]
+        seen += [t["id"] for t in page["transactions"]]
+        cursor = page["pagination"]["nextCursor"]
+
+    assert len(seen) == len(set(seen)) == 5
+    rows = client.get("/api/transactions?limit=10").get_json()["data"]["transactions"]
+    assert [t["id"] for t in rows] == seen
+
+    rv_bad = client.get("/api/transactions?cursor=not-a-cursor")
+    assert rv_bad.status_code == 400
+    for limit in ("0", "-1", "501", "abc"):
+        assert client.get(f"/api/transactions?cursor=&limit={limit}").status_code == 400
+
+def test_bulk_import_csv_and_ndjson(client):
+    """批量导入：合法行全部写入，坏行逐行报告且不影响其它行"""
+    csv_body = (
+        "amount,type,category,description,date\n"
+        "-12.5,expense,food,午饭,2025-07-01\n"
+        "3000,income,salary,工资,2025-07-02\n"
+        "abc,expense,food,金额错误,2025-07-03\n"
+        "-8,expense,unknown,未知分类,2025-07-04\n"
+    )
+    rv = client.post("/api/transactions/bulk?chunkSize=2", data=csv_body,
+                     content_type="text/csv")
+    assert rv.status_code == 200
+    result = rv.get_json()["data"]
+    assert result["inserted"] == 2
+    assert result["failed"] == 2
+    assert sorted(e["row"] for e in result["errors"]) == [3, 4]
+
+    ndjson_body = (
+        '{"amount": -20, "type": "expense", "category": "food", "date": "2025-07-05"}\n'
+        'not json\n'
+        '\n'
+        '{"amount": 50, "type": "income", "category": "salary", "date": "2025-07-06"}\n'
+    )
+    rv2 = client.post("/api/transactions/bulk", data=ndjson_body,
+                      content_type="application/x-ndjson")
+    result2 = rv2.get_json()["data"]
+    assert result2["inserted"] == 2
+    assert [e["row"] for e in result2["errors"]] == [2]
+
+    lst = client.get("/api/transactions?limit=50").get_json()["data"]["transactions"]
+    assert len(lst) == 4
+    assert {t["amount"] for t in lst} == {-12.5, 3000, -20, 50}
+
+    rv3 = client.post("/api/transactions/bulk", data="x", content_type="text/plain")
+    assert rv3.status_code == 415
+
+    rv4 = client.post("/api/transactions/bulk?chunkSize=abc", data=csv_body, content_type="text/csv")
+    assert rv4.status_code == 400
+
+def test_bulk_import_non_string_fields(client):
+    """NDJSON 中数字类型的分类 / 日期逐行报错，不中断导入"""
+    body = (
+        '{"amount": -20, "type": "expense", "category": 5, "date": "2025-07-05"}\n'
+        '{"amount": -20, "type": "expense", "category": "food", "date": 20250705}\n'
+        '{"amount": -20, "type": 1, "category": "food", "date": "2025-07-05", "description": 42}\n'
+    )
+    rv = client.post("/api/transactions/bulk", data=body, content_type="application/x-ndjson")
+    assert rv.status_code == 200
+    result = rv.get_json()["data"]
+    assert result["inserted"] == 1
+    assert {e["row"]: e["error"] for e in result["errors"]} == {
+        1: "未知分类: 5", 2: "日期格式错误: 20250705"
+    }
+    row = client.get("/api/transactions").get_json()["data"]["transactions"][0]
+    assert (row["type"], row["description"]) == ("expense", "42")
+
+def test_bulk_import_retries_failed_chunk_row_by_row(client):
+    """非有限金额逐行报错；整批写入失败时逐行重试，只有坏行记为失败"""
+    engine = client.application.config["DB_ENGINE"]
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TRIGGER reject_boom BEFORE INSERT ON transactions
+            WHEN NEW.description = 'boom'
+            BEGIN SELECT RAISE(ABORT, 'boom'); END
+        """))
+    body = (
+        "amount,type,category,description,date\n"
+        "nan,expense,food,,2025-07-01\n"
+        "inf,expense,food,,2025-07-01\n"
+        "-1,expense,food,ok,2025-07-01\n"
+        "-2,expense,food,boom,2025-07-01\n"
+        "-3,expense,food,ok,2025-07-01\n"
+    )
+    rv = client.post("/api/transactions/bulk", data=body, content_type="text/csv")
+    result = rv.get_json()["data"]
+    assert result["inserted"] == 2
+    assert sorted(e["row"] for e in result["errors"]) == [1, 2, 4]
+    assert _rollup(client) == {(1, "2025-07-01", "Spending"): (4, 2)}
+
+def _seed_for_export(client):
+    body = "".join(
+        f'{{"amount": {-i}, "type": "expense", "category": "food", "description": "第{i}笔", "date": "2025-0{1 + i % 3}-1{i % 10}"}}\n'
+        for i in range(1, 8)
+    ) + '{"amount": 900, "type": "income", "category": "salary", "date": "2025-03-01"}\n'
+    client.post("/api/transactions/bulk", data=body, content_type="application/x-ndjson")
+
+def test_export_csv_and_ndjson(client):
+    """流式导出：CSV / NDJSON 内容完整，并支持与列表接口相同的筛选"""
+    _seed_for_export(client)
+    client.application.config["EXPORT_CHUNK_SIZE"] = 3
+
+    rv = client.get("/api/transactions/export?format=csv")
+    assert rv.status_code == 200
+    assert rv.mimetype == "text/csv"
+    lines = rv.get_data(as_text=True).strip().splitlines()
+    assert lines[0] == "id,date,type,category,amount,description"
+    assert len(lines) == 1 + 8
+
+    rv2 = client.get("/api/transactions/export?format=ndjson&type=income")
+    rows = [json.loads(line) for line in rv2.get_data(as_text=True).splitlines()]
+    assert rows == [{"id": 8, "date": "2025-03-01", "type": "income", "category": "salary",
+                     "amount": 900, "description": None}]
+
+    rv3 = client.get("/api/transactions/export?format=xlsx")
+    assert rv3.status_code == 400
+
+def test_export_parquet(client):
+    """parquet 导出可被 pyarrow 正常读回"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    import io
+    _seed_for_export(client)
+    client.application.config["EXPORT_CHUNK_SIZE"] = 3
+
+    rv = client.get("/api/transactions/export?format=parquet&category=food")
+    table = pq.read_table(io.BytesIO(rv.get_data()))
+    assert table.num_rows == 7
+    assert sorted(table.column("amount").to_pylist()) == [-7, -6, -5, -4, -3, -2, -1]
+
+def test_transaction_calendar(client):
+    """交易日历：按天汇总收入、支出和笔数，只统计所选月份"""
+    body = (
+        '{"amount": -20, "type": "expense", "category": "food", "date": "2025-07-01"}\n'
+        '{"amount": -5.5, "type": "expense", "category": "food", "date": "2025-07-01"}\n'
+        '{"amount": 3000, "type": "income", "category": "salary", "date": "2025-07-15"}\n'
+        '{"amount": -99, "type": "expense", "category": "food", "date": "2025-08-01"}\n'
+    )
+    client.post("/api/transactions/bulk", data=body, content_type="application/x-ndjson")
+
+    rv = client.get("/api/transactions/calendar?month=2025-07")
+    assert rv.status_code == 200
+    data = rv.get_json()["data"]
+    assert data["month"] == "2025-07"
+    assert data["days"] == [
+        {"date": "2025-07-01", "income": 0, "expense": 25.5, "count": 2},
+        {"date": "2025-07-15", "income": 3000, "expense": 0, "count": 1},
+    ]
+    assert data["totals"] == {"income": 3000, "expense": 25.5, "count": 3}
+
+    assert client.get("/api/transactions/calendar?month=2025-13").status_code == 400
+
+def test_category_cache_picks_up_new_category(client):
+    """分类缓存：加载后新增的分类在未命中时会被重新加载识别"""
+    from backend.utils import categories
+
+    with client.application.app_context():
+        cache = categories.get_category_cache()
+        assert cache.id_for("food") is not None
+        assert cache.id_for("travel") is None
+
+    engine = client.application.config["DB_ENGINE"]
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO categories(name, flow_type) VALUES ('travel', 'Spending')"))
+
+    categories.MISS_RELOAD_INTERVAL, saved = 0, categories.MISS_RELOAD_INTERVAL
+    try:
+        rv = client.post("/api/transactions", json={
+            "amount": -80, "type": "expense", "category": "travel", "date": "2025-07-01"
+        })
+    finally:
+        categories.MISS_RELOAD_INTERVAL = saved
+    assert rv.status_code == 201
+
+    rv2 = client.post("/api/transactions", json={
+        "amount": -1, "type": "expense", "category": "nope", "date": "2025-07-01"
+    })
+    assert rv2.status_code == 400
+
+def test_search_transactions(client):
+    """全文检索：q 参数匹配名称/商户/描述，可与其它筛选和分页模式组合"""
+    client.post("/api/transactions", json={
+        "amount": -30, "type": "expense", "category": "food",
+        "description": "午饭 Uber Eats 外卖", "date": "2025-07-01"
+    })
+    engine = client.application.config["DB_ENGINE"]
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO transactions
+              (user_id, account_id, category_id, txn_date, txn_name, merchant_name, flow_type, amount)
+            VALUES
+              (1, 1, 1, '2025-07-02', '打车', 'UBER BV', 'Spending', 45),
+              (1, 1, 1, '2025-07-03', '咖啡', 'Starbucks', 'Spending', 38)
+        """))
+
+    lst = client.get("/api/transactions?q=uber").get_json()["data"]
+    assert {t["amount"] for t in lst["transactions"]} == {-30, -45}
+    assert lst["pagination"]["total"] == 2
+
+    # 检索建立后的写入（含修改、删除）同步进索引
+    rows = client.get("/api/transactions?q=Starbucks&cursor=").get_json()["data"]["transactions"]
+    assert len(rows) == 1
+    client.put(f"/api/transactions/{rows[0]['id']}", json={"description": "uber 接驳"})
+    assert len(client.get("/api/transactions?q=uber").get_json()["data"]["transactions"]) == 3
+    client.delete(f"/api/transactions/{rows[0]['id']}")
+    assert len(client.get("/api/transactions?q=uber").get_json()["data"]["transactions"]) == 2
+
+    # 多个关键词需同时命中；短关键词退回 LIKE
+    assert len(client.get("/api/transactions?q=uber 外卖").get_json()["data"]["transactions"]) == 1
+    assert len(client.get("/api/transactions?q=打车").get_json()["data"]["transactions"]) == 1
+    assert client.get("/api/transactions?q=lyft").get_json()["data"]["transactions"] == []
+
+def _rollup(client):
+    engine = client.application.config["DB_ENGINE"]
+    with engine.connect() as conn:
+        return {
+            (r.category_id, r.month, r.flow_type): (r.total_amount, r.txn_count)
+            for r in conn.execute(text("SELECT * FROM monthly_category_rollup WHERE txn_count != 0"))
+        }
+
+def test_write_path_reads_lock_rows_on_mysql():
+    """MySQL 下写事务读取修改前的行时带 FOR UPDATE，SQLite 不加"""
+    from types import SimpleNamespace
+    from backend.modules.transactions import controller
+
+    for dialect, expected in (("mysql", True), ("sqlite", False)):
+        statements = []
+        conn = SimpleNamespace(
+            dialect=SimpleNamespace(name=dialect),
+            execute=lambda stmt, params: statements.append(str(stmt)) or SimpleNamespace(mappings=lambda: []),
+        )
+        controller._fetch_rows(conn, [1])
+        controller._fetch_matching_rows(conn, ["t.user_id = :uid"], {"uid": 1})
+        assert all(("FOR UPDATE" in sql) is expected for sql in statements)
+
+def test_monthly_rollup_follows_writes(client):
+    """月度分类汇总：新增、批量导入、修改、删除都在同一事务内增量维护，结果与全量重建一致"""
+    from backend.modules.transactions import rollup
+
+    rv = client.post("/api/transactions", json={
+        "amount": -100, "type": "expense", "category": "food", "date": "2025-07-20"
+    })
+    tx_id = rv.get_json()["data"]["id"]
+    client.post("/api/transactions/bulk", content_type="application/x-ndjson", data=(
+        '{"amount": -50, "type": "expense", "category": "food", "date": "2025-07-01"}\n'
+        '{"amount": 8000, "type": "income", "category": "salary", "date": "2025-07-05"}\n'
+    ))
+    assert _rollup(client) == {
+        (1, "2025-07-01", "Spending"): (150, 2),
+        (2, "2025-07-01", "Income"): (8000, 1),
+    }
+
+    # 改金额并挪到下个月
+    client.put(f"/api/transactions/{tx_id}", json={"amount": -30, "date": "2025-08-02"})
+    assert _rollup(client) == {
+        (1, "2025-07-01", "Spending"): (50, 1),
+        (1, "2025-08-01", "Spending"): (30, 1),
+        (2, "2025-07-01", "Income"): (8000, 1),
+    }
+
+    client.delete(f"/api/transactions/{tx_id}")
+    incremental = _rollup(client)
+    assert incremental == {
+        (1, "2025-07-01", "Spending"): (50, 1),
+        (2, "2025-07-01", "Income"): (8000, 1),
+    }
+
+    with client.application.config["DB_ENGINE"].begin() as conn:
+        rollup.rebuild(conn)
+    assert _rollup(client) == incremental
+
+def test_rebuild_rollup_command(client):
+    """flask transactions rebuild-rollup 回填直接写库的交易"""
+    engine = client.application.config["DB_ENGINE"]
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO transactions (user_id, account_id, category_id, txn_date, flow_type, amount)
+            VALUES (1, 1, 1, '2025-06-03', 'Spending', 12), (1, 1, 1, '2025-06-09', 'Spending', 8)
+        """))
+    result = client.application.test_cli_runner().invoke(args=["transactions", "rebuild-rollup"])
+    assert result.exit_code == 0, result.output
+    assert _rollup(client) == {(1, "2025-06-01", "Spending"): (20, 2)}
+
+def test_batch_mutations(client):
+    """批量修改/删除：按 id 列表或筛选条件，单事务执行并同步汇总表"""
+    client.post("/api/transactions/bulk", content_type="application/x-ndjson", data="".join(
+        f'{{"amount": -{i}, "type": "expense", "category": "food", "date": "2025-07-0{i}"}}\n'
+        for i in range(1, 7)
+    ))
+    ids = sorted(t["id"] for t in client.get("/api/transactions").get_json()["data"]["transactions"])
+
+    rv = client.post("/api/transactions/batch", json={
+        "updates": [
+            {"id": ids[0], "category": "salary", "type": "income"},
+            {"id": ids[1], "category": "salary", "type": "income"},
+            {"id": ids[2], "description": "改过"},
+        ],
+        "deletes": [ids[5], 999]
+    })
+    assert rv.status_code == 200
+    assert rv.get_json()["data"] == {"matched": 4, "updated": 3, "deleted": 1}
+    assert _rollup(client) == {
+        (1, "2025-07-01", "Spending"): (3 + 4 + 5, 3),
+        (2, "2025-07-01", "Income"): (1 + 2, 2),
+    }
+
+    # 按条件：7 月 4 日之后的支出全部删除
+    rv2 = client.post("/api/transactions/batch", json={
+        "filter": {"type": "expense", "startDate": "2025-07-04"}, "delete": True
+    })
+    assert rv2.get_json()["data"]["deleted"] == 2
+    lst = client.get("/api/transactions").get_json()["data"]["transactions"]
+    assert sorted(t["amount"] for t in lst) == [-3, 1, 2]
+
+    # 按条件修改
+    rv3 = client.post("/api/transactions/batch", json={
+        "filter": {"category": "salary"}, "patch": {"description": "奖金"}
+    })
+    assert rv3.get_json()["data"]["updated"] == 2
+
+    # 未知分类整体拒绝，不做任何修改
+    rv4 = client.post("/api/transactions/batch", json={
+        "updates": [{"id": ids[2], "amount": 1}, {"id": ids[3], "category": "nope"}]
+    })
+    assert rv4.status_code == 400
+    assert _rollup(client) == {
+        (1, "2025-07-01", "Spending"): (3, 1),
+        (2, "2025-07-01", "Income"): (3, 2),
+    }
+
+    # 结构或字段类型不合法时返回 400
+    for body in (
+        {"filter": "oops", "delete": True},
+        {"filter": {}, "delete": True},
+        {"filter": {"unknown": "x", "q": "  "}, "delete": True},
+        {"filter": {"category": ["food"]}, "delete": True},
+        {"filter": {"category": "salary"}, "patch": {"description": ["a"]}},
+        {"updates": [{"id": ids[2], "amount": "1"}]},
+        {"updates": ["oops"]},
+        {"updates": [{"id": "x", "description": "a"}]},
+        {"deletes": [[1]]},
+        ["oops"],
+    ):
+        assert client.post("/api/transactions/batch", json=body).status_code == 400
+    assert _rollup(client) == {
+        (1, "2025-07-01", "Spending"): (3, 1),
+        (2, "2025-07-01", "Income"): (3, 2),
+    }
+
+def _goal_amounts(client):
+    engine = client.application.config["DB_ENGINE"]
+    with engine.connect() as conn:
+        return dict(conn.execute(text(
+            "SELECT goal_name, current_amount FROM goals ORDER BY goal_id"
+        )).all())
+
+def test_linked_goals_follow_writes(client):
+    """关联账户 / 分类的目标进度随交易的增删改按增量更新"""
+    engine = client.application.config["DB_ENGINE"]
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO goals (user_id, goal_name, target_amount, current_amount, goal_type,
+                               linked_account_id, linked_category_id)
+            VALUES (1, 'account', 10000, 100, 'savings', 1, NULL),
+                   (1, 'category', 10000, 100, 'savings', NULL, 1),
+                   (1, 'manual', 10000, 100, 'savings', NULL, NULL)
+        """))
+
+    # 支出 120（food 分类，账户 1）
+    tx_id = client.post("/api/transactions", json={
+        "amount": -120, "type": "expense", "category": "food", "date": "2025-07-20"
+    }).get_json()["data"]["id"]
+    assert _goal_amounts(client) == {"account": -20, "category": 220, "manual": 100}
+
+    # 改为收入 300：旧行撤销、新行计入
+    client.put(f"/api/transactions/{tx_id}", json={"amount": 300, "type": "income"})
+    assert _goal_amounts(client) == {"account": 400, "category": -200, "manual": 100}
+
+    # 批量导入也走同一写路径
+    client.post("/api/transactions/bulk", data="date,amount,type,category\n2025-07-21,50,expense,food\n",
+                content_type="text/csv")
+    assert _goal_amounts(client) == {"account": 350, "category": -150, "manual": 100}
+
+    client.delete(f"/api/transactions/{tx_id}")
+    assert _goal_amounts(client) == {"account": 50, "category": 150, "manual": 100}
+
+    # 直接改库后可用命令按交易重算
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE goals SET current_amount = 0"))
+    result = client.application.test_cli_runner().invoke(args=["goals", "rebuild-progress"])
+    assert result.exit_code == 0
+    assert _goal_amounts(client) == {"account": -50, "category": 50, "manual": 0}